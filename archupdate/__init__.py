@@ -0,0 +1 @@
+"""Qt-free engine shared by the GUI and the headless entry points"""
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import calendar
+import tarfile
+
+from .config import PACMAN_LOG, CONFIG_DIR
+from .resolver import find_sync_dir
+
+ANALYTICS_FILE = os.path.join(CONFIG_DIR, "pacman_log_stats.json")
+# 2: full upgrades only pair with the transaction right after them
+ANALYTICS_VERSION = 3
+
+# Transaction durations kept individually for charting; older ones only
+# survive in the count/total/max summary
+RECENT_DURATIONS = 200
+
+# 'YYYY-MM-DDTHH:MM' + zone -> epoch of that minute
+_minute_cache = {}
+
+
+def parse_log_timestamp(stamp):
+    """Epoch seconds of a pacman.log timestamp, None if it cannot be parsed
+
+    Handles '2024-01-15T10:23:45+0100' and the old '2019-01-01 10:00' format.
+    Parsing by slicing with a per-minute cache keeps a full scan of a large
+    log far cheaper than strptime.
+    """
+    minute_key = stamp[:16] + stamp[19:]
+    base = _minute_cache.get(minute_key)
+    if base is None:
+        try:
+            fields = (int(stamp[0:4]), int(stamp[5:7]), int(stamp[8:10]),
+                      int(stamp[11:13]), int(stamp[14:16]))
+            zone = stamp[19:]
+            if len(zone) == 5 and zone[0] in "+-":
+                offset = int(zone[1:3]) * 3600 + int(zone[3:5]) * 60
+                base = calendar.timegm(fields + (0, 0, 0, 0)) - (offset if zone[0] == "+" else -offset)
+            else:
+                # Old logs are in local time without a zone
+                base = int(time.mktime(fields + (0, 0, 0, -1)))
+        except (ValueError, OverflowError):
+            return None
+        if len(_minute_cache) > 50000:
+            _minute_cache.clear()
+        _minute_cache[minute_key] = base
+    seconds = stamp[17:19]
+    return base + int(seconds) if len(stamp) >= 19 and seconds.isdigit() else base
+
+
+def repository_index(sync_dir=None):
+    """Map package names to their repo from the sync DB member names only"""
+    sync_dir = sync_dir or find_sync_dir()
+    index = {}
+    try:
+        db_names = sorted(f for f in os.listdir(sync_dir) if f.endswith(".db"))
+    except OSError:
+        return index
+    for db_name in db_names:
+        repo = db_name[:-len(".db")]
+        try:
+            with tarfile.open(os.path.join(sync_dir, db_name), "r:*") as tar:
+                for member in tar:
+                    entry_dir = member.name.split('/', 1)[0]
+                    index.setdefault(entry_dir.rsplit('-', 2)[0], repo)
+        except (tarfile.TarError, OSError):
+            continue
+    return index
+
+
+class LogAnalytics:
+    """Compact aggregates of pacman.log, updated incrementally
+
+    The log is streamed once; afterwards only the bytes appended since the
+    stored offset are read. A changed inode or a shrunk file (rotation)
+    starts a fresh scan.
+    """
+
+    def __init__(self, path=None, log_path=None):
+        self.path = path or ANALYTICS_FILE
+        self.log_path = log_path or PACMAN_LOG
+        self.reset()
+        self.load()
+
+    def reset(self):
+        self.log_state = {'inode': None, 'offset': 0}
+        # 'starting full system upgrade' seen and no other line since
+        self.upgrade_start = None
+        # Start of the running transaction when it is a full upgrade
+        self.upgrade_transaction = None
+        # name -> [upgrades, installs, removals, first_upgrade, last_upgrade]
+        self.packages = {}
+        # 'YYYY-MM' -> [transactions, full_upgrades, packages_upgraded]
+        self.months = {}
+        self.durations = {'count': 0, 'total': 0.0, 'max': 0.0, 'recent': []}
+        self.repo_churn = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != ANALYTICS_VERSION:
+            return
+        self.log_state = data['log']
+        self.upgrade_start = data.get('upgrade_start')
+        self.upgrade_transaction = data.get('upgrade_transaction')
+        self.packages = data['packages']
+        self.months = data['months']
+        self.durations = data['durations']
+        self.repo_churn = data.get('repo_churn', {})
+
+    def save(self):
+        data = {
+            'version': ANALYTICS_VERSION,
+            'log': self.log_state,
+            'upgrade_start': self.upgrade_start,
+            'upgrade_transaction': self.upgrade_transaction,
+            'packages': self.packages,
+            'months': self.months,
+            'durations': self.durations,
+            'repo_churn': self.repo_churn
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def update(self, sync_dir=None):
+        """Consume new log lines, return how many were read"""
+        try:
+            st = os.stat(self.log_path)
+        except OSError:
+            return 0
+        if st.st_ino != self.log_state['inode'] or st.st_size < self.log_state['offset']:
+            self.reset()
+            self.log_state['inode'] = st.st_ino
+        if st.st_size == self.log_state['offset']:
+            return 0
+
+        count = 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.log_state['offset'])
+            offset = self.log_state['offset']
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    # Line still being written, pick it up next time
+                    break
+                offset += len(raw)
+                count += 1
+                self.consume_line(raw.decode('utf-8', 'replace'))
+            self.log_state['offset'] = offset
+
+        if count:
+            self.update_repo_churn(sync_dir)
+        return count
+
+    def consume_line(self, line):
+        if "[ALPM]" not in line and "[PACMAN]" not in line:
+            return
+        close = line.find(']')
+        if close < 0:
+            return
+        timestamp = parse_log_timestamp(line[1:close])
+        if timestamp is None:
+            return
+        message = line[close + 1:].strip()
+
+        if message.startswith("[ALPM] upgraded "):
+            name = message[16:].split(' ', 1)[0]
+            stats = self.packages.setdefault(name, [0, 0, 0, timestamp, timestamp])
+            stats[0] += 1
+            stats[4] = timestamp
+            self.month(timestamp)[2] += 1
+        elif message.startswith("[ALPM] installed "):
+            name = message[17:].split(' ', 1)[0]
+            self.packages.setdefault(name, [0, 0, 0, timestamp, timestamp])[1] += 1
+        elif message.startswith("[ALPM] removed "):
+            name = message[15:].split(' ', 1)[0]
+            self.packages.setdefault(name, [0, 0, 0, timestamp, timestamp])[2] += 1
+        elif message.startswith("[PACMAN] Running "):
+            # A new command; whatever the previous one left open is over, including a -Syu
+            # with nothing to do, which logs no transaction. Pre-transaction hook lines
+            # ("[ALPM] running '...hook'...") come between the two and leave it armed.
+            self.upgrade_start = None
+            self.upgrade_transaction = None
+        elif message == "[PACMAN] starting full system upgrade":
+            self.upgrade_start = timestamp
+        elif message == "[ALPM] transaction started":
+            self.upgrade_transaction, self.upgrade_start = self.upgrade_start, None
+        elif message == "[ALPM] transaction completed":
+            month = self.month(timestamp)
+            month[0] += 1
+            if self.upgrade_transaction is not None:
+                month[1] += 1
+                self.add_duration(self.upgrade_transaction, timestamp - self.upgrade_transaction)
+                self.upgrade_transaction = None
+
+    def month(self, timestamp):
+        key = time.strftime("%Y-%m", time.localtime(timestamp))
+        return self.months.setdefault(key, [0, 0, 0])
+
+    def add_duration(self, started, duration):
+        durations = self.durations
+        durations['count'] += 1
+        durations['total'] += duration
+        durations['max'] = max(durations['max'], duration)
+        durations['recent'].append([started, duration])
+        if len(durations['recent']) > RECENT_DURATIONS:
+            del durations['recent'][:-RECENT_DURATIONS]
+
+    def update_repo_churn(self, sync_dir=None):
+        """Upgrades per repository, packages no longer in a sync DB count as 'foreign'"""
+        index = repository_index(sync_dir)
+        churn = {}
+        for name, stats in self.packages.items():
+            repo = index.get(name, "foreign")
+            churn[repo] = churn.get(repo, 0) + stats[0]
+        self.repo_churn = churn
+
+    # --- Queries used by the GUI ---
+    def top_packages(self, limit=20):
+        """[(name, upgrades, average days between upgrades)] most upgraded first"""
+        ranked = sorted(self.packages.items(), key=lambda item: item[1][0], reverse=True)
+        result = []
+        for name, (upgrades, _, _, first, last) in ranked[:limit]:
+            interval = (last - first) / 86400 / (upgrades - 1) if upgrades > 1 else None
+            result.append((name, upgrades, interval))
+        return result
+
+    def monthly(self, limit=24):
+        """[(month, transactions, full_upgrades, packages_upgraded)] oldest first"""
+        keys = sorted(self.months)[-limit:]
+        return [(key, *self.months[key]) for key in keys]
+
+    def average_duration(self):
+        count = self.durations['count']
+        return self.durations['total'] / count if count else None
+
+
+def load_analytics(sync_dir=None):
+    """Load the stored aggregates, fold in new log lines and persist them"""
+    analytics = LogAnalytics()
+    if analytics.update(sync_dir):
+        analytics.save()
+    return analytics
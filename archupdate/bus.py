@@ -0,0 +1,289 @@
+import os
+import select
+import socket
+import struct
+from collections import deque, namedtuple
+
+SYSTEM_BUS_SOCKET = "/run/dbus/system_bus_socket"
+
+# Unpolled signals beyond this are dropped oldest first
+SIGNAL_QUEUE_SIZE = 256
+
+Signal = namedtuple("Signal", ["sender", "path", "interface", "member", "args"])
+
+# D-Bus message types and header field codes
+_METHOD_CALL, _METHOD_RETURN, _ERROR, _SIGNAL = 1, 2, 3, 4
+_FIELD_PATH, _FIELD_INTERFACE, _FIELD_MEMBER, _FIELD_ERROR_NAME = 1, 2, 3, 4
+_FIELD_REPLY_SERIAL, _FIELD_DESTINATION, _FIELD_SENDER, _FIELD_SIGNATURE = 5, 6, 7, 8
+
+_ALIGNMENT = {'y': 1, 'b': 4, 'n': 2, 'q': 2, 'i': 4, 'u': 4, 'x': 8, 't': 8, 'd': 8,
+              's': 4, 'o': 4, 'g': 1, 'v': 1, 'a': 4, '(': 8, '{': 8, 'h': 4}
+_FIXED = {'y': 'B', 'b': 'I', 'n': 'h', 'q': 'H', 'i': 'i', 'u': 'I', 'x': 'q', 't': 'Q',
+          'd': 'd', 'h': 'I'}
+
+
+class DBusError(Exception):
+    pass
+
+
+def _type_end(sig, i):
+    """Index just past the complete type starting at sig[i]"""
+    if sig[i] == 'a':
+        return _type_end(sig, i + 1)
+    if sig[i] in '({':
+        close = ')' if sig[i] == '(' else '}'
+        i += 1
+        while sig[i] != close:
+            i = _type_end(sig, i)
+    return i + 1
+
+
+def split_signature(sig):
+    types, i = [], 0
+    while i < len(sig):
+        end = _type_end(sig, i)
+        types.append(sig[i:end])
+        i = end
+    return types
+
+
+class _Writer:
+    """Marshal values for a signature; variants are given as (signature, value)"""
+
+    def __init__(self, order):
+        self.order = order
+        self.buf = bytearray()
+
+    def align(self, n):
+        self.buf.extend(b'\0' * (-len(self.buf) % n))
+
+    def pack(self, fmt, value):
+        self.buf.extend(struct.pack(self.order + fmt, value))
+
+    def write(self, sig, value):
+        code = sig[0]
+        self.align(_ALIGNMENT[code])
+        if code in _FIXED:
+            self.pack(_FIXED[code], value)
+        elif code in 'so':
+            data = value.encode('utf-8')
+            self.pack('I', len(data))
+            self.buf.extend(data + b'\0')
+        elif code == 'g':
+            data = value.encode('ascii')
+            self.pack('B', len(data))
+            self.buf.extend(data + b'\0')
+        elif code == 'v':
+            self.write('g', value[0])
+            self.write(value[0], value[1])
+        elif code == 'a':
+            length_at = len(self.buf)
+            self.pack('I', 0)
+            elem = sig[1:]
+            self.align(_ALIGNMENT[elem[0]])
+            start = len(self.buf)
+            for item in (value.items() if elem[0] == '{' else value):
+                self.write(elem, item)
+            struct.pack_into(self.order + 'I', self.buf, length_at, len(self.buf) - start)
+        else:
+            for field_sig, field in zip(split_signature(sig[1:-1]), value):
+                self.write(field_sig, field)
+
+
+class _Reader:
+    def __init__(self, buf, order, pos=0):
+        self.buf = buf
+        self.order = order
+        self.pos = pos
+
+    def align(self, n):
+        self.pos += -self.pos % n
+
+    def unpack(self, fmt):
+        value, = struct.unpack_from(self.order + fmt, self.buf, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return value
+
+    def read(self, sig):
+        code = sig[0]
+        self.align(_ALIGNMENT[code])
+        if code in _FIXED:
+            return self.unpack(_FIXED[code])
+        if code in 'sog':
+            length = self.unpack('B' if code == 'g' else 'I')
+            value = bytes(self.buf[self.pos:self.pos + length]).decode('utf-8', 'replace')
+            self.pos += length + 1
+            return value
+        if code == 'v':
+            return self.read(self.read('g'))
+        if code == 'a':
+            end = self.unpack('I')
+            elem = sig[1:]
+            self.align(_ALIGNMENT[elem[0]])
+            end += self.pos
+            items = []
+            while self.pos < end:
+                items.append(self.read(elem))
+            return dict(items) if elem[0] == '{' else items
+        return tuple(self.read(field_sig) for field_sig in split_signature(sig[1:-1]))
+
+
+def _parse_address(address):
+    """Socket address of a D-Bus address string: path, or bytes for abstract sockets"""
+    for entry in address.split(';'):
+        transport, _, params = entry.partition(':')
+        if transport != "unix":
+            continue
+        options = dict(p.split('=', 1) for p in params.split(',') if '=' in p)
+        if "path" in options:
+            return options["path"]
+        if "abstract" in options:
+            return b"\0" + options["abstract"].encode()
+    return None
+
+
+def session_bus_address():
+    address = _parse_address(os.environ.get("DBUS_SESSION_BUS_ADDRESS", ""))
+    if address is None:
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+        if runtime_dir and os.path.exists(os.path.join(runtime_dir, "bus")):
+            return os.path.join(runtime_dir, "bus")
+    return address
+
+
+def system_bus_address():
+    return _parse_address(os.environ.get("DBUS_SYSTEM_BUS_ADDRESS", "")) or SYSTEM_BUS_SOCKET
+
+
+class Bus:
+    """Minimal blocking D-Bus client speaking the wire protocol on one socket
+
+    Supports method calls and receiving signals, which is all notifications
+    and scheduling need; this keeps the engine free of Qt and of bindings
+    that may not be installed. Signals arriving while waiting for a reply
+    are queued for ``poll_signals``.
+    """
+
+    def __init__(self, address, timeout=2.0):
+        if address is None:
+            raise DBusError("No bus address")
+        self.order = '<' if struct.pack('=I', 1)[0] == 1 else '>'
+        self.serial = 0
+        self.signals = deque(maxlen=SIGNAL_QUEUE_SIZE)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(address)
+            self._authenticate()
+            self.call("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus", "Hello")
+        except (OSError, DBusError):
+            self.sock.close()
+            raise
+
+    @classmethod
+    def session(cls, timeout=2.0):
+        return cls(session_bus_address(), timeout)
+
+    @classmethod
+    def system(cls, timeout=2.0):
+        return cls(system_bus_address(), timeout)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+
+    def _authenticate(self):
+        uid = str(os.getuid()).encode().hex()
+        self.sock.sendall(b"\0AUTH EXTERNAL " + uid.encode() + b"\r\n")
+        reply = b""
+        while not reply.endswith(b"\r\n"):
+            chunk = self.sock.recv(256)
+            if not chunk:
+                raise DBusError("Connection closed during authentication")
+            reply += chunk
+        if not reply.startswith(b"OK "):
+            raise DBusError(f"Authentication rejected: {reply.strip().decode(errors='replace')}")
+        self.sock.sendall(b"BEGIN\r\n")
+
+    def _recv_exactly(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise DBusError("Connection closed by the bus")
+            data.extend(chunk)
+        return data
+
+    def _read_message(self):
+        head = self._recv_exactly(16)
+        order = '<' if head[0:1] == b'l' else '>'
+        body_length, _, fields_length = struct.unpack_from(order + 'III', head, 4)
+        header_end = 16 + fields_length
+        rest = self._recv_exactly(header_end + (-header_end % 8) - 16 + body_length)
+        buf = head + rest
+        reader = _Reader(buf, order, 12)
+        fields = dict(reader.read('a(yv)'))
+        reader.align(8)
+        body = []
+        signature = fields.get(_FIELD_SIGNATURE, "")
+        for sig in split_signature(signature):
+            body.append(reader.read(sig))
+        if head[1] == _SIGNAL:
+            self.signals.append(Signal(fields.get(_FIELD_SENDER), fields.get(_FIELD_PATH),
+                                       fields.get(_FIELD_INTERFACE), fields.get(_FIELD_MEMBER), body))
+        return head[1], fields, body
+
+    def send(self, msg_type, fields, signature="", args=()):
+        """Marshal and send one message, return its serial"""
+        self.serial += 1
+        body = _Writer(self.order)
+        for sig, value in zip(split_signature(signature), args):
+            body.write(sig, value)
+        if signature:
+            fields = fields + [(_FIELD_SIGNATURE, ('g', signature))]
+        message = _Writer(self.order)
+        message.buf.extend(b'l' if self.order == '<' else b'B')
+        message.pack('B', msg_type)
+        message.pack('B', 0)
+        message.pack('B', 1)
+        message.pack('I', len(body.buf))
+        message.pack('I', self.serial)
+        message.write('a(yv)', fields)
+        message.align(8)
+        self.sock.sendall(bytes(message.buf + body.buf))
+        return self.serial
+
+    def call(self, destination, path, interface, member, signature="", args=()):
+        """Call a method and wait for its reply, return the reply body as a list"""
+        serial = self.send(_METHOD_CALL, [
+            (_FIELD_PATH, ('o', path)), (_FIELD_INTERFACE, ('s', interface)),
+            (_FIELD_MEMBER, ('s', member)), (_FIELD_DESTINATION, ('s', destination))
+        ], signature, args)
+        while True:
+            msg_type, reply_fields, reply_body = self._read_message()
+            if reply_fields.get(_FIELD_REPLY_SERIAL) != serial:
+                continue
+            if msg_type == _ERROR:
+                detail = reply_body[0] if reply_body else ""
+                raise DBusError(f"{reply_fields.get(_FIELD_ERROR_NAME)}: {detail}")
+            return reply_body
+
+    def emit(self, path, interface, member, signature="", args=()):
+        self.send(_SIGNAL, [(_FIELD_PATH, ('o', path)), (_FIELD_INTERFACE, ('s', interface)),
+                            (_FIELD_MEMBER, ('s', member))], signature, args)
+
+    def add_match(self, **rule):
+        """Subscribe to signals, e.g. add_match(interface=..., member=...)"""
+        match = ",".join(f"{key}='{value}'" for key, value in rule.items())
+        self.call("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+                  "AddMatch", "s", ("type='signal'," + match,))
+
+    def poll_signals(self):
+        """Return the signals received so far without blocking"""
+        while select.select([self.sock], [], [], 0)[0]:
+            self._read_message()
+        signals = list(self.signals)
+        self.signals.clear()
+        return signals
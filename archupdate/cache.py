@@ -0,0 +1,327 @@
+"""One-pass analysis of pacman's package cache
+
+Walks every CacheDir with os.scandir, groups package files by name,
+version and arch, and finds what can go:
+
+    duplicates  -- the same package more than once (other compression, other cache dir)
+    old         -- versions older than the newest KEEP_VERSIONS, as paccache -rk would remove
+    signatures  -- .sig files whose package is gone
+    partial     -- .part files and download-* directories of interrupted downloads
+
+Sizes are hardlink aware: a file only frees space when every link to
+its inode is removed, and disk usage counts each inode once.
+"""
+import os
+import re
+import sys
+import stat
+import time
+import argparse
+import functools
+from collections import namedtuple
+
+from .config import PACMAN_CONF, PACMAN_CACHE_DIR, PKEXEC_CMD
+from .formatting import format_size
+from .jobs import run_command, command_failed
+
+# Versions of each package kept, as the Clean Cache button's paccache -rk1
+KEEP_VERSIONS = 1
+# Preferred copy when a package is cached with several compressions
+_EXTENSION_ORDER = {"zst": 0, "xz": 1, "gz": 2, "bz2": 3, "lz4": 4, "lzo": 5, "lrz": 6, "Z": 7, "": 8}
+# name-pkgver-pkgrel-arch.pkg.tar[.ext]; pkgver and pkgrel contain no '-'
+_PACKAGE_RE = re.compile(r"^(?P<name>.+)-(?P<version>[^-]+-[^-]+)-(?P<arch>[^-]+)\.pkg\.tar(?:\.(?P<ext>\w+))?$")
+# Alternating digit, letter and separator runs compared by vercmp
+_SEGMENT_RE = re.compile(r"\d+|[a-zA-Z]+|[^a-zA-Z\d]+")
+CATEGORIES = ("duplicates", "old", "signatures", "partial")
+CATEGORY_LABELS = {
+    "duplicates": "Duplicate package files",
+    "old": "Old package versions",
+    "signatures": "Orphaned signatures",
+    "partial": "Partial downloads",
+}
+
+CacheFile = namedtuple("CacheFile", ["path", "size", "disk", "inode", "links"])
+CacheFile.__doc__ = """One file (or download-* directory) found in the cache
+
+size  -- apparent size in bytes
+disk  -- bytes allocated on disk
+inode -- (st_dev, st_ino), shared by hardlinks
+links -- st_nlink
+"""
+
+CacheReport = namedtuple("CacheReport", ["directories", "files", "packages", "size", "disk", "hardlinked",
+                                         "removable", "reclaimable", "elapsed"])
+CacheReport.__doc__ = """Result of analyze_cache()
+
+directories -- cache directories walked
+files       -- number of files seen
+packages    -- distinct name/version/arch groups
+size        -- apparent bytes, each inode counted once
+disk        -- allocated bytes, each inode counted once
+hardlinked  -- allocated bytes of files with more than one link
+removable   -- {category: [CacheFile]}
+reclaimable -- {category: bytes freed by removing that category alone}
+elapsed     -- seconds the analysis took
+"""
+
+
+def cache_dirs(pacman_conf=PACMAN_CONF):
+    """CacheDir entries of pacman.conf's [options], PACMAN_CACHE_DIR when there are none"""
+    dirs, section = [], None
+    try:
+        with open(pacman_conf, 'r') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line.startswith('[') and line.endswith(']'):
+                    section = line[1:-1].strip()
+                    continue
+                key, _, value = line.partition('=')
+                if section == "options" and key.strip() == "CacheDir":
+                    dirs.extend(value.split())
+    except OSError:
+        pass
+    return dirs or [PACMAN_CACHE_DIR]
+
+
+def _split_version(version):
+    """'1:2.3-4' -> ('1', '2.3', '4')"""
+    epoch, _, rest = version.rpartition(':') if ':' in version else ("0", "", version)
+    ver, _, rel = rest.rpartition('-') if '-' in rest else (rest, "", "")
+    return epoch or "0", ver, rel
+
+
+def _rpmvercmp(a, b):
+    """alpm's rpmvercmp: compare alternating digit and letter segments"""
+    if a == b:
+        return 0
+    segments_a = _SEGMENT_RE.findall(a)
+    segments_b = _SEGMENT_RE.findall(b)
+    i = j = 0
+    while i < len(segments_a) and j < len(segments_b):
+        x, y = segments_a[i], segments_b[j]
+        x_sep, y_sep = not x[0].isalnum(), not y[0].isalnum()
+        if x_sep or y_sep:
+            if x_sep and y_sep:
+                # Separators only matter by count, which the index walk already compares
+                if len(x) != len(y):
+                    return 1 if len(x) > len(y) else -1
+                i, j = i + 1, j + 1
+                continue
+            # A separator against a segment: the side with the separator goes on, so is newer
+            return 1 if x_sep else -1
+        x_digit, y_digit = x.isdigit(), y.isdigit()
+        if x_digit != y_digit:
+            # Numeric segments are newer than alphabetic ones
+            return 1 if x_digit else -1
+        if x_digit:
+            x, y = x.lstrip('0'), y.lstrip('0')
+            if len(x) != len(y):
+                return 1 if len(x) > len(y) else -1
+        if x != y:
+            return 1 if x > y else -1
+        i, j = i + 1, j + 1
+    rest_a, rest_b = segments_a[i:], segments_b[j:]
+    if not rest_a and not rest_b:
+        return 0
+    # '1.0' < '1.0.1', but '1.0a' < '1.0'
+    if rest_a:
+        return -1 if rest_a[0][0].isalpha() else 1
+    return 1 if rest_b[0][0].isalpha() else -1
+
+
+def vercmp(a, b):
+    """pacman's vercmp for 'epoch:pkgver-pkgrel' strings: -1, 0 or 1"""
+    epoch_a, ver_a, rel_a = _split_version(a)
+    epoch_b, ver_b, rel_b = _split_version(b)
+    result = _rpmvercmp(epoch_a, epoch_b) or _rpmvercmp(ver_a, ver_b)
+    if result == 0 and rel_a and rel_b:
+        result = _rpmvercmp(rel_a, rel_b)
+    return result
+
+
+def parse_package_file(file_name):
+    """(name, version, arch, extension) of a package file name, or None"""
+    match = _PACKAGE_RE.match(file_name)
+    if not match:
+        return None
+    return match.group("name"), match.group("version"), match.group("arch"), match.group("ext") or ""
+
+
+def _cache_file(path, st):
+    return CacheFile(path, st.st_size, st.st_blocks * 512, (st.st_dev, st.st_ino), st.st_nlink)
+
+
+def _directory_size(path):
+    """CacheFile for a download-* directory, sized by what is inside
+
+    pacman 7 makes the directory 0700 for its download user; an unreadable
+    one is still listed, removal runs as root, but its size counts as 0.
+    """
+    st = os.stat(path)
+    size = disk = 0
+    try:
+        entries = os.scandir(path)
+    except PermissionError:
+        return CacheFile(path, 0, 0, (st.st_dev, st.st_ino), 1)
+    with entries:
+        for entry in entries:
+            try:
+                entry_stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            size += entry_stat.st_size
+            disk += entry_stat.st_blocks * 512
+    return CacheFile(path, size, disk, (st.st_dev, st.st_ino), 1)
+
+
+def reclaimable_bytes(files):
+    """Bytes freed by removing files: an inode counts once, and only when all its links go"""
+    by_inode = {}
+    for cache_file in files:
+        by_inode.setdefault(cache_file.inode, []).append(cache_file)
+    freed = 0
+    for links in by_inode.values():
+        if len({cache_file.path for cache_file in links}) >= links[0].links:
+            freed += links[0].disk
+    return freed
+
+
+def analyze_cache(directories=None, keep=KEEP_VERSIONS, clock=time.perf_counter):
+    """CacheReport of the cache directories (pacman.conf's CacheDir by default), in one scandir pass"""
+    started = clock()
+    directories = directories or cache_dirs()
+    # (name, arch) -> {version: [(directory rank, extension, CacheFile)]}
+    packages = {}
+    signatures = []
+    package_paths = set()
+    partial = []
+    inodes = {}
+    hardlinked = set()
+    files = 0
+
+    for rank, directory in enumerate(directories):
+        try:
+            scanner = os.scandir(directory)
+        except OSError:
+            continue
+        with scanner as entries:
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                name = entry.name
+                if stat.S_ISDIR(st.st_mode):
+                    if name.startswith("download-"):
+                        try:
+                            partial.append(_directory_size(entry.path))
+                        except OSError:
+                            pass
+                    continue
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                files += 1
+                cache_file = _cache_file(entry.path, st)
+                inodes.setdefault(cache_file.inode, cache_file)
+                if st.st_nlink > 1:
+                    hardlinked.add(cache_file.inode)
+                if name.endswith(".part"):
+                    partial.append(cache_file)
+                elif name.endswith(".sig"):
+                    signatures.append(cache_file)
+                else:
+                    parsed = parse_package_file(name)
+                    if parsed is None:
+                        continue
+                    package_name, version, arch, extension = parsed
+                    package_paths.add(entry.path)
+                    packages.setdefault((package_name, arch), {}).setdefault(version, []).append(
+                        (rank, _EXTENSION_ORDER.get(extension, len(_EXTENSION_ORDER)), -st.st_mtime, cache_file)
+                    )
+
+    signature_of = {cache_file.path[:-4]: cache_file for cache_file in signatures}
+    removable = {category: [] for category in CATEGORIES}
+    group_count = 0
+
+    def remove(category, cache_file):
+        removable[category].append(cache_file)
+        signature = signature_of.pop(cache_file.path, None)
+        if signature is not None:
+            removable[category].append(signature)
+
+    for versions in packages.values():
+        group_count += len(versions)
+        ordered = list(versions)
+        if len(ordered) > keep:
+            ordered.sort(key=functools.cmp_to_key(vercmp), reverse=True)
+        for index, version in enumerate(ordered):
+            copies = sorted(versions[version], key=lambda copy: copy[:3])
+            if index >= keep:
+                for copy in copies:
+                    remove("old", copy[3])
+                continue
+            kept = copies[0][3]
+            for copy in copies[1:]:
+                remove("duplicates", copy[3])
+            # The kept copy's signature stays with it
+            signature_of.pop(kept.path, None)
+
+    removable["signatures"] = [signature for path, signature in signature_of.items() if path not in package_paths]
+    removable["partial"] = partial
+
+    return CacheReport(
+        directories=list(directories),
+        files=files,
+        packages=group_count,
+        size=sum(cache_file.size for cache_file in inodes.values()),
+        disk=sum(cache_file.disk for cache_file in inodes.values()),
+        hardlinked=sum(inodes[inode].disk for inode in hardlinked),
+        removable=removable,
+        reclaimable={category: reclaimable_bytes(removable[category]) for category in CATEGORIES},
+        elapsed=clock() - started,
+    )
+
+
+def describe_report(report):
+    """Log lines: totals, then one line per category with something to remove"""
+    lines = [f"Package cache: {report.files} files, {report.packages} package versions, "
+             f"{format_size(report.disk)} on disk ({format_size(report.hardlinked)} hardlinked), "
+             f"analyzed in {report.elapsed * 1000:.0f} ms"]
+    for category in CATEGORIES:
+        if report.removable[category]:
+            lines.append(f"  {CATEGORY_LABELS[category]}: {len(report.removable[category])}, "
+                         f"{format_size(report.reclaimable[category])} reclaimable")
+    return lines
+
+
+def removal_command(paths):
+    """(argv, stdin) removing paths as root; the list goes through stdin, not argv"""
+    return [PKEXEC_CMD, 'xargs', '-0', 'rm', '-rf', '--'], "\0".join(paths)
+
+
+def remove_files(paths, timeout=120, cancel=None):
+    """Remove paths as root; return an error message or None"""
+    if not paths:
+        return None
+    argv, stdin = removal_command(paths)
+    return command_failed(run_command(argv, timeout, cancel, stdin))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m archupdate.cache", description="Analyze the pacman package cache")
+    parser.add_argument("directories", nargs="*", help="cache directories (default: CacheDir of pacman.conf)")
+    parser.add_argument("--keep", type=int, default=KEEP_VERSIONS, help=f"versions to keep (default {KEEP_VERSIONS})")
+    parser.add_argument("--list", action="store_true", help="print every removable path")
+    args = parser.parse_args(argv)
+
+    report = analyze_cache(args.directories or None, args.keep)
+    print("\n".join(describe_report(report)))
+    if args.list:
+        for category in CATEGORIES:
+            for cache_file in report.removable[category]:
+                print(f"{category}\t{cache_file.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Stopping checks and updates at points where that is safe
+
+Killing checkupdates, a download or an AUR build loses nothing. Killing
+pacman while it commits the transaction can leave a half-updated system:
+even SIGINT makes pacman interrupt the commit between two packages. So
+the GUI defers the cancel once the transaction has begun, judged by the
+phase pacman printed and, just before signalling, by pacman's log.
+"""
+import os
+import glob
+import shutil
+import signal
+import subprocess
+import time
+
+from .config import SUDO_CMD, PACMAN_CACHE_DIR, DB_LOCK_FILE, CHECKUPDATES_DB, PACMAN_LOG
+
+# TransactionTimer phases in which pacman has not touched the system yet
+SAFE_PHASES = (None, "sync", "resolve", "download", "verify")
+# Seconds a process tree gets to exit before SIGKILL
+KILL_GRACE = 3.0
+
+
+class Cancelled(Exception):
+    """Raised by background work that noticed a cancel request"""
+
+
+def _read_stat(pid):
+    """(parent pid, name, state) from /proc/pid/stat"""
+    with open(f"/proc/{pid}/stat", 'r') as f:
+        data = f.read()
+    # The name is in parentheses and may itself contain spaces or ')'
+    name = data[data.index('(') + 1:data.rindex(')')]
+    fields = data[data.rindex(')') + 2:].split()
+    return int(fields[1]), name, fields[0]
+
+
+def _processes():
+    """{pid: (parent pid, name, state)} of everything in /proc"""
+    processes = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                processes[int(entry)] = _read_stat(entry)
+            except (OSError, ValueError, IndexError):
+                continue
+    return processes
+
+
+def process_tree(pid):
+    """[(pid, name)] of pid and all its descendants, deepest first
+
+    sudo and yay start grandchildren that signalling pid alone misses.
+    """
+    processes = _processes()
+    children = {}
+    for child, (parent, _, _) in processes.items():
+        children.setdefault(parent, []).append(child)
+    order, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        order.append(current)
+        stack.extend(children.get(current, ()))
+    return [(current, processes[current][1]) for current in reversed(order) if current in processes]
+
+
+def running(names):
+    """True when a live process with one of these names exists"""
+    return any(name in names and state != 'Z' for _, name, state in _processes().values())
+
+
+def installing(pid):
+    """True when pacman runs below pid, e.g. yay installing what it built"""
+    return any(name == "pacman" for _, name in process_tree(pid))
+
+
+def log_offset(path=PACMAN_LOG):
+    """Current end of pacman's log, where transaction_started() starts reading"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def transaction_started(offset, path=PACMAN_LOG):
+    """True when pacman logged 'transaction started' after offset
+
+    pacman's stdout reaches the GUI through a pipe and lags behind, while
+    the log line is written before the first package is touched.
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return any(b"[ALPM] transaction started" in line for line in f)
+    except OSError:
+        return False
+
+
+def _alive(pid):
+    try:
+        return _read_stat(pid)[2] != 'Z'
+    except (OSError, ValueError, IndexError):
+        return False
+
+
+def signal_processes(pids, sig):
+    """Send sig to pids; root processes under sudo get it through sudo -n kill"""
+    denied = []
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            denied.append(pid)
+    if denied:
+        try:
+            subprocess.run([SUDO_CMD, '-n', 'kill', f'-{sig.name[3:]}'] + [str(pid) for pid in denied],
+                           capture_output=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"Failed to signal processes {denied}: {e}")
+
+
+def kill_tree(pid, sig=signal.SIGTERM, grace=KILL_GRACE, escalate=True):
+    """Signal pid's whole tree, deepest first; return the pids still alive after grace
+
+    With escalate, survivors get SIGKILL. pacman is stopped with SIGINT
+    and no escalation, so it removes its lock itself; that is only safe
+    before its transaction begins.
+    """
+    tree = [current for current, _ in process_tree(pid)]
+    signal_processes(tree, sig)
+    deadline = time.monotonic() + grace
+    alive = tree
+    while alive and time.monotonic() < deadline:
+        time.sleep(0.1)
+        alive = [current for current in alive if _alive(current)]
+    if alive and escalate:
+        signal_processes(alive, signal.SIGKILL)
+        time.sleep(0.1)
+        alive = [current for current in alive if _alive(current)]
+    return alive
+
+
+def cleanup_interrupted_transaction(cache_dir=PACMAN_CACHE_DIR, lock_file=DB_LOCK_FILE):
+    """Remove partial downloads and a stale database lock after pacman was stopped
+
+    Returns the removed paths. The lock stays while any pacman still runs.
+    """
+    leftovers = glob.glob(os.path.join(cache_dir, "*.part")) + glob.glob(os.path.join(cache_dir, "download-*"))
+    if os.path.exists(lock_file) and not running({"pacman"}):
+        leftovers.append(lock_file)
+    if not leftovers:
+        return []
+    try:
+        result = subprocess.run([SUDO_CMD, '-n', 'rm', '-rf', '--'] + leftovers, capture_output=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Failed to clean up after pacman: {e}")
+        return []
+    return leftovers if result.returncode == 0 else []
+
+
+def cleanup_interrupted_check(db_path=CHECKUPDATES_DB):
+    """Remove what a stopped checkupdates or database sync leaves in the private database copy"""
+    sync_dir = os.path.join(db_path, "sync")
+    leftovers = glob.glob(os.path.join(sync_dir, "*.part")) + glob.glob(os.path.join(sync_dir, "download-*"))
+    lock_file = os.path.join(db_path, "db.lck")
+    if os.path.exists(lock_file) and not running({"pacman", "fakeroot"}):
+        leftovers.append(lock_file)
+    removed = []
+    for path in leftovers:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            removed.append(path)
+        except OSError as e:
+            print(f"Failed to remove {path}: {e}")
+    return removed
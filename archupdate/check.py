@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import subprocess
+from collections import namedtuple
+
+from .config import CHECKUPDATES_CMD, YAY_CMD, LAST_CHECK_FILE
+from .ignore import get_ignore_list
+from .sync import sync_databases, sync_complete
+
+CHECK_TIMEOUT = 300
+
+CheckResult = namedtuple("CheckResult", ["checked", "pacman", "aur", "ignored", "errors", "sync"],
+                         defaults=(None,))
+CheckResult.__doc__ = """Outcome of one update check
+
+checked -- epoch seconds when the check finished
+pacman  -- pending official 'name old -> new' lines, ignored ones removed
+aur     -- pending AUR lines, ignored ones removed
+ignored -- pending lines dropped by the ignore list
+errors  -- {source: message} for checks that failed
+sync    -- SyncReport of the database refresh as a dict, None if checkupdates synced itself
+"""
+
+
+def parse_update_lines(text):
+    """Non-empty 'name old -> new' lines of checkupdates/yay output"""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def check_failed(source, exit_code):
+    """checkupdates exits 2 and yay -Qua 1 when there is nothing to update"""
+    return exit_code not in (0, 2 if source == "pacman" else 1)
+
+
+def run_check(source, timeout=CHECK_TIMEOUT, nosync=False):
+    """Run checkupdates ('pacman') or yay -Qua ('aur'), return (lines, error)
+
+    With nosync checkupdates reads the databases sync_databases() refreshed.
+    """
+    cmd = [CHECKUPDATES_CMD] if source == "pacman" else [YAY_CMD, "-Qua"]
+    if source == "pacman" and nosync:
+        cmd.append("--nosync")
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return [], str(e)
+    if check_failed(source, result.returncode):
+        return [], result.stderr.strip() or f"{cmd[0]} exited with code {result.returncode}"
+    return parse_update_lines(result.stdout), None
+
+
+def check_updates(include_aur=True, profile=None):
+    """Check official and AUR updates and apply the ignore list
+
+    Stages are timed into profile (a RunProfile) when one is given.
+    """
+    stage = profile.begin if profile else lambda name: None
+    done = profile.end if profile else lambda name: None
+
+    stage("database sync")
+    try:
+        report = sync_databases()
+    except OSError as e:
+        print(f"Failed to sync databases: {e}")
+        report = None
+    done("database sync")
+    stage("checkupdates")
+    pacman, pacman_error = run_check("pacman", nosync=report is not None and sync_complete(report))
+    done("checkupdates")
+    aur, aur_error = [], None
+    if include_aur and os.path.exists(YAY_CMD):
+        stage("yay -Qua")
+        aur, aur_error = run_check("aur")
+        done("yay -Qua")
+
+    ignored = []
+    ignore_list = get_ignore_list()
+    if ignore_list:
+        kept_pacman, kept_aur = ignore_list.filter(pacman), ignore_list.filter(aur)
+        ignored = [line for line in pacman if line not in kept_pacman]
+        ignored += [line for line in aur if line not in kept_aur]
+        pacman, aur = kept_pacman, kept_aur
+
+    errors = {}
+    if pacman_error:
+        errors["pacman"] = pacman_error
+    if aur_error:
+        errors["aur"] = aur_error
+    return CheckResult(time.time(), pacman, aur, ignored, errors, report._asdict() if report else None)
+
+
+def save_check_result(result, path=None):
+    """Cache the latest check for the GUI and later headless runs"""
+    path = path or LAST_CHECK_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(result._asdict(), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_check_result(path=None):
+    """Latest cached CheckResult, or None"""
+    try:
+        with open(path or LAST_CHECK_FILE, 'r') as f:
+            data = json.load(f)
+        # Results cached before a field existed fall back to its default
+        return CheckResult(**{field: data[field] for field in CheckResult._fields if field in data})
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
@@ -0,0 +1,280 @@
+"""Headless entry points: one-shot checks, a check daemon and history output
+
+Nothing here imports Qt, so these modes start quickly and run on machines
+without a display (cron, systemd timers, servers).
+"""
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+from .check import check_updates, save_check_result
+from .history import HistoryStore, package_record
+from .formatting import format_duration
+from .profile import RunProfile, save_profile, load_profiles
+from .peers import PEER_PORT
+
+# Exit codes of --check, mirroring checkupdates
+EXIT_UPDATES = 0
+EXIT_ERROR = 1
+EXIT_NO_UPDATES = 2
+
+
+def result_to_json(result):
+    data = result._asdict()
+    data["pacman"] = [package_record(line, "pacman") for line in result.pacman]
+    data["aur"] = [package_record(line, "aur") for line in result.aur]
+    data["count"] = len(result.pacman) + len(result.aur)
+    return data
+
+
+def check_news(result):
+    """Refresh the Arch news and return the items about pending official packages"""
+    from .news import fetch_news, relevant_news
+    from .resolver import parse_pending_line
+    items, error = fetch_news()
+    if error:
+        print(f"Failed to refresh Arch news: {error}", file=sys.stderr)
+    return relevant_news([parse_pending_line(line)[0] for line in result.pacman], items)
+
+
+def print_news(matches):
+    for match in matches:
+        marker = "MANUAL INTERVENTION" if match.intervention else "News"
+        print(f"{marker} ({', '.join(match.packages)}): {match.item.title}")
+        print(f"  {match.item.link}")
+
+
+def print_result(result):
+    if result.sync:
+        from .sync import SyncReport, describe_sync
+        print(f"Databases: {describe_sync(SyncReport(**result.sync))}")
+    for title, lines in (("Official packages", result.pacman), ("AUR packages", result.aur)):
+        if lines:
+            print(f"{title} ({len(lines)}):")
+            for line in lines:
+                print(f"  {line}")
+    if result.ignored:
+        print(f"Ignored ({len(result.ignored)}): {', '.join(line.split()[0] for line in result.ignored)}")
+    for source, error in result.errors.items():
+        print(f"Failed to check {source} updates: {error}", file=sys.stderr)
+    if not result.pacman and not result.aur and not result.errors:
+        print("System is up to date!")
+
+
+def run_check(args):
+    profile = RunProfile("check")
+    result = check_updates(include_aur=not args.no_aur, profile=profile)
+    try:
+        save_profile(profile.finish("Failed" if "pacman" in result.errors else "Success"))
+    except OSError as e:
+        print(f"Failed to save timing profile: {e}", file=sys.stderr)
+    try:
+        save_check_result(result)
+    except OSError as e:
+        print(f"Failed to cache check result: {e}", file=sys.stderr)
+
+    news = check_news(result) if result.pacman and not args.no_news else []
+    if args.json:
+        data = result_to_json(result)
+        data["news"] = [dict(match.item._asdict(), packages=match.packages, intervention=match.intervention)
+                        for match in news]
+        json.dump(data, sys.stdout, indent=2)
+        print()
+    else:
+        print_result(result)
+        print_news(news)
+
+    if args.notify and (result.pacman or result.aur):
+        from .notify import DesktopNotifications, URGENCY_NORMAL, URGENCY_CRITICAL
+        body = f"{len(result.pacman) + len(result.aur)} updates available!"
+        interventions = [match for match in news if match.intervention]
+        if interventions:
+            body += f" Manual intervention required: {interventions[0].item.title}"
+        DesktopNotifications().notify("Arch Update", body, URGENCY_CRITICAL if interventions else URGENCY_NORMAL)
+
+    if "pacman" in result.errors:
+        return EXIT_ERROR
+    return EXIT_UPDATES if result.pacman or result.aur else EXIT_NO_UPDATES
+
+
+def run_daemon(args):
+    """Check every --interval hours; notify when the pending set changes
+
+    Checks wait for connectivity, run shortly after a resume if one was
+    missed during suspend, and back off exponentially after failures.
+    """
+    import select
+    from .notify import DesktopNotifications
+    from .schedule import CheckScheduler, SystemEvents
+    notifications = DesktopNotifications()
+    events = SystemEvents()
+    scheduler = CheckScheduler(args.interval * 3600, next_due=time.time())
+    online = events.connectivity()
+    if online is not None:
+        scheduler.set_online(online)
+    notification_id = 0
+    last_pending = None
+    try:
+        while True:
+            delay = scheduler.delay()
+            if delay != 0 and events.bus is not None:
+                # A delay of None (offline or suspended) waits for the next event
+                select.select([events], [], [], delay)
+            elif delay != 0:
+                # Without the system bus nothing reports suspend or connectivity
+                scheduler.set_online(True)
+                scheduler.sleeping = False
+                time.sleep(scheduler.delay())
+            for event, value in events.apply(scheduler):
+                if not args.json:
+                    print(f"{time.strftime('%Y-%m-%d %H:%M:%S')}: {event} {'yes' if value else 'no'}", flush=True)
+            if scheduler.delay() != 0:
+                continue
+
+            profile = RunProfile("check")
+            result = check_updates(include_aur=not args.no_aur, profile=profile)
+            if "pacman" in result.errors:
+                scheduler.check_failed()
+            else:
+                scheduler.check_succeeded()
+            try:
+                save_profile(profile.finish("Failed" if "pacman" in result.errors else "Success"))
+            except OSError as e:
+                print(f"Failed to save timing profile: {e}", file=sys.stderr)
+            try:
+                save_check_result(result)
+            except OSError as e:
+                print(f"Failed to cache check result: {e}", file=sys.stderr)
+
+            pending = set(result.pacman) | set(result.aur)
+            if args.json:
+                print(json.dumps(result_to_json(result)), flush=True)
+            else:
+                stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(result.checked))
+                errors = "".join(f", {source} check failed: {error}" for source, error in result.errors.items())
+                print(f"{stamp}: {len(pending)} updates available{errors}", flush=True)
+
+            if pending and pending != last_pending and not args.no_notify:
+                notification_id = notifications.notify(
+                    "Arch Update", f"{len(pending)} updates available!", replaces_id=notification_id
+                ) or 0
+            if not result.errors:
+                last_pending = pending
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        notifications.close()
+        events.close()
+
+
+def run_history(args):
+    store = HistoryStore()
+    sessions = store.sessions(limit=args.history)
+    if args.json:
+        json.dump([dict(session, packages=[dict(p) for p in store.session_packages(session['id'])])
+                   for session in sessions], sys.stdout, indent=2)
+        print()
+        return 0
+    for session in sessions:
+        duration = format_duration(session['duration']) if session['duration'] else "-"
+        print(f"{session['date']}  {session['type']:<17} {session['status']:<8} "
+              f"{session['package_count']:>4} packages  {duration}")
+    return 0
+
+
+def run_hook_times(args):
+    store = HistoryStore()
+    rows = store.timing_statistics("hook", sessions=args.hook_times or None)
+    if args.json:
+        json.dump([dict(row) for row in rows], sys.stdout, indent=2)
+        print()
+        return 0
+    if not rows:
+        print("No hook timings recorded yet")
+    for row in rows:
+        print(f"{format_duration(row['total']):>8} total  {format_duration(row['average']):>7} avg  "
+              f"{format_duration(row['longest']):>7} max  {row['runs']:>3} runs  {row['name']} ({row['phase']})")
+    return 0
+
+
+def run_profiles(args):
+    """Recent timing profiles, one line per run, to spot latency regressions"""
+    profiles = load_profiles(limit=args.profiles)
+    if args.json:
+        json.dump([profile.to_dict() for profile in profiles], sys.stdout, indent=2)
+        print()
+        return 0
+    if not profiles:
+        print("No timing profiles recorded yet")
+    for profile in profiles:
+        stages = ", ".join(f"{name} {format_duration(seconds)}" for name, seconds in profile.stage_totals().items())
+        print(f"{datetime.fromtimestamp(profile.started):%Y-%m-%d %H:%M}  {profile.kind:<6} "
+              f"{profile.status or '-':<8} {format_duration(profile.duration):>7}  {stages}")
+    return 0
+
+
+def run_timer(args):
+    from .timer import install_timer, remove_timer, unit_paths, TIMER_NAME
+    if args.remove_timer:
+        return 0 if remove_timer() else 1
+    if not install_timer(args.install_timer):
+        return 1
+    print(f"Installed {', '.join(unit_paths())}")
+    print(f"Next runs: systemctl --user list-timers {TIMER_NAME}.timer")
+    return 0
+
+
+def run_serve_cache(args):
+    from .peers import serve_cache
+    return serve_cache(args.serve_cache, args.bind, args.cache_dir, verbose=True)
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Arch Update without the GUI")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--check", action="store_true",
+                      help="check for updates once; exits 0 if updates are pending, 2 if none, 1 on error")
+    mode.add_argument("--daemon", action="store_true",
+                      help="check periodically and send a desktop notification when updates change")
+    mode.add_argument("--history", type=int, nargs="?", const=20, metavar="N",
+                      help="show the N most recent update sessions (default 20)")
+    mode.add_argument("--hook-times", type=int, nargs="?", const=0, metavar="N",
+                      help="time spent per pacman hook over the last N update sessions (default all)")
+    mode.add_argument("--profiles", type=int, nargs="?", const=20, metavar="N",
+                      help="stage timings of the N most recent checks and updates (default 20)")
+    mode.add_argument("--install-timer", type=int, nargs="?", const=6, metavar="HOURS",
+                      help="schedule --check with a systemd user timer every HOURS (default 6)")
+    mode.add_argument("--remove-timer", action="store_true", help="remove the systemd user timer")
+    mode.add_argument("--serve-cache", type=int, nargs="?", const=PEER_PORT, metavar="PORT",
+                      help=f"serve the package cache to LAN peers over HTTP on PORT (default {PEER_PORT})")
+    parser.add_argument("--json", action="store_true", help="machine readable output")
+    parser.add_argument("--no-aur", action="store_true", help="skip the AUR check")
+    parser.add_argument("--no-news", action="store_true", help="do not look for Arch news about pending updates")
+    parser.add_argument("--notify", action="store_true", help="notify when updates are found (--check)")
+    parser.add_argument("--no-notify", action="store_true", help="never notify (--daemon)")
+    parser.add_argument("--interval", type=float, default=6, metavar="HOURS",
+                        help="hours between checks in daemon mode (default 6)")
+    parser.add_argument("--bind", default="", metavar="ADDRESS",
+                        help="address to serve the cache on (--serve-cache, default all interfaces)")
+    parser.add_argument("--cache-dir", action="append", metavar="DIR",
+                        help="cache directory to serve, repeatable (--serve-cache, default CacheDir of pacman.conf)")
+    return parser
+
+
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+    if args.check:
+        return run_check(args)
+    if args.daemon:
+        return run_daemon(args)
+    if args.serve_cache is not None:
+        return run_serve_cache(args)
+    if args.install_timer is not None or args.remove_timer:
+        return run_timer(args)
+    if args.hook_times is not None:
+        return run_hook_times(args)
+    if args.profiles is not None:
+        return run_profiles(args)
+    return run_history(args)
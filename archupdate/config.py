@@ -0,0 +1,59 @@
+import os
+
+# --- Configuration ---
+PACMAN_LOG = "/var/log/pacman.log"
+CHECKUPDATES_CMD = "/usr/bin/checkupdates"
+YAY_CMD = "/usr/bin/yay"
+PACMAN_CMD = "/usr/bin/pacman"
+PKEXEC_CMD = "/usr/bin/pkexec"
+SUDO_CMD = "/usr/bin/sudo"
+ZENITY_CMD = "/usr/bin/zenity"
+TERMINAL_CMD = "foot"
+TERMINAL_EXEC_FLAG = "-e"
+
+# Pacman databases
+PACMAN_CONF = "/etc/pacman.conf"
+MIRRORLIST = "/etc/pacman.d/mirrorlist"
+PACMAN_DB_DIR = "/var/lib/pacman"
+SYNC_DB_DIR = os.path.join(PACMAN_DB_DIR, "sync")
+LOCAL_DB_DIR = os.path.join(PACMAN_DB_DIR, "local")
+DB_LOCK_FILE = os.path.join(PACMAN_DB_DIR, "db.lck")
+PACMAN_CACHE_DIR = "/var/cache/pacman/pkg"
+
+# checkupdates keeps its own copy of the sync databases; it is fresher than
+# SYNC_DB_DIR right after a check, so the resolver prefers it
+CHECKUPDATES_DB = os.environ.get(
+    "CHECKUPDATES_DB",
+    os.path.join(os.environ.get("TMPDIR", "/tmp"), f"checkup-db-{os.getuid()}")
+)
+
+# Add new configuration
+CONFIG_DIR = os.path.expanduser("~/.config/MyOrg")
+UPDATE_HISTORY_FILE = os.path.join(CONFIG_DIR, "update_history.json")
+UPDATE_HISTORY_DB = os.path.join(CONFIG_DIR, "update_history.db")
+IGNORED_PACKAGES_FILE = os.path.join(CONFIG_DIR, "ignored_packages.json")
+LAST_CHECK_FILE = os.path.join(CONFIG_DIR, "last_check.json")
+NEWS_CACHE_FILE = os.path.join(CONFIG_DIR, "news_cache.json")
+# Stage state of the running update, left behind when it is interrupted (archupdate/pipeline.py)
+PIPELINE_STATE_FILE = os.path.join(CONFIG_DIR, "update_pipeline.json")
+
+# Arch news feed; point it at a local file to test without network
+NEWS_URL = os.environ.get("ARCH_NEWS_URL", "https://archlinux.org/feeds/news/")
+
+# Filesystem root the pre-update snapshot is taken of; point it at a mounted
+# loopback btrfs image to try the btrfs backend without touching /
+SNAPSHOT_ROOT = os.environ.get("ARCH_UPDATE_SNAPSHOT_ROOT", "/")
+
+# Replay recorded transcripts instead of running sudo/pacman/yay (see archupdate/replay.py);
+# speed 1 keeps the original timing, 0 replays as fast as possible
+REPLAY_DIR = os.environ.get("ARCH_UPDATE_REPLAY")
+REPLAY_SPEED = float(os.environ.get("ARCH_UPDATE_REPLAY_SPEED", "1") or 1)
+
+# LAN hosts serving their package cache (python -m archupdate --serve-cache), tried
+# before the mirrors; space separated URLs such as http://builder.lan:7878
+CACHE_PEERS = os.environ.get("ARCH_UPDATE_PEERS", "").split()
+
+# Fleet mode (archupdate/fleet.py): hosts by rollout stage, and the ssh to reach
+# them with; ARCH_UPDATE_SSH can name a stand-in that runs commands locally
+FLEET_INVENTORY = os.path.join(CONFIG_DIR, "fleet_hosts")
+SSH_CMD = os.environ.get("ARCH_UPDATE_SSH", "ssh")
@@ -0,0 +1,401 @@
+"""Check and update many hosts over SSH
+
+The inventory names one host per entry, grouped into rollout stages:
+
+    # updated first; the next stage starts only when this one succeeded, and
+    # later stages may install only the versions this one installed
+    [canary]
+    web1.lan
+    admin@db1.lan:2222
+    [rest]
+    web2.lan web3.lan
+
+Each host gets one pooled SSH connection (ControlMaster) that all its
+commands share, and at most FLEET_WORKERS hosts are busy at once. Hosts
+need checkupdates (pacman-contrib) and, to be updated, passwordless sudo
+for pacman. ARCH_UPDATE_SSH replaces ssh, for example with a stand-in that
+runs the commands locally or in containers.
+
+    python -m archupdate.fleet check
+    python -m archupdate.fleet update --stage canary --yes
+"""
+import sys
+import json
+import time
+import shlex
+import shutil
+import argparse
+import tempfile
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .config import FLEET_INVENTORY, SSH_CMD
+from .check import check_failed, parse_update_lines
+from .resolver import parse_pending_line
+from .formatting import format_duration
+
+FLEET_WORKERS = 8
+CONNECT_TIMEOUT = 10
+# Seconds an idle pooled connection stays open
+CONTROL_PERSIST = 120
+CHECK_TIMEOUT = 300
+UPDATE_TIMEOUT = 3600
+DEFAULT_STAGE = "default"
+# Non-interactive, so a host without passwordless sudo fails instead of hanging
+UPDATE_COMMAND = "sudo -n pacman -Syu --noconfirm"
+
+Host = namedtuple("Host", ["name", "destination", "port", "stage"])
+Host.__doc__ = """One inventory entry
+
+name        -- the entry as written, used in reports
+destination -- [user@]host handed to ssh
+port        -- SSH port, None for ssh's default
+stage       -- rollout stage the host belongs to
+"""
+
+HostResult = namedtuple("HostResult", ["host", "pending", "aur", "error", "duration"])
+HostResult.__doc__ = """Outcome of checking one host
+
+pending  -- pending official 'name old -> new' lines
+aur      -- pending AUR lines, empty unless AUR checks were asked for
+error    -- message if the host could not be checked
+duration -- seconds the check took, connection included
+"""
+
+UpdateResult = namedtuple("UpdateResult", ["host", "returncode", "output", "error", "installed", "duration"])
+UpdateResult.__doc__ = """Outcome of updating one host
+
+returncode -- exit code of the remote pacman, None if it never ran
+output     -- the last lines pacman printed, or the packages that held the host back
+error      -- message if the update failed
+installed  -- {package: version} the update upgraded, read back with pacman -Q
+"""
+
+FleetPackage = namedtuple("FleetPackage", ["name", "version", "hosts"])
+FleetPackage.__doc__ = """One pending package version across the fleet
+
+hosts -- {host name: installed version}
+"""
+
+RolloutReport = namedtuple("RolloutReport", ["results", "completed", "halted", "validated"])
+RolloutReport.__doc__ = """Outcome of a staged update
+
+results   -- [UpdateResult] in the order the hosts finished
+completed -- stages whose hosts were all updated within the failure budget
+halted    -- the stage that exceeded it, None if the rollout ran through
+validated -- {package: {version}} the first stage installed, which later stages were held to
+"""
+
+
+def parse_host(entry, stage=DEFAULT_STAGE):
+    """'admin@db1.lan:2222' -> Host; IPv6 addresses go in brackets, '[::1]:22'"""
+    destination, port = entry, None
+    if entry.startswith('[') or '@[' in entry:
+        user, _, rest = entry.rpartition('@')
+        address, _, tail = rest[1:].partition(']')
+        destination = f"{user}@{address}" if user else address
+        port = tail[1:] if tail.startswith(':') else None
+    elif entry.count(':') == 1:
+        destination, port = entry.split(':')
+    return Host(entry, destination, int(port) if port else None, stage)
+
+
+def parse_inventory(text):
+    """[Host] in file order; entries before the first [stage] line are in DEFAULT_STAGE"""
+    hosts, seen, stage = [], set(), DEFAULT_STAGE
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith('[') and line.endswith(']') and ' ' not in line and ':' not in line:
+            stage = line[1:-1].strip() or DEFAULT_STAGE
+            continue
+        for entry in line.split():
+            if entry not in seen:
+                seen.add(entry)
+                hosts.append(parse_host(entry, stage))
+    return hosts
+
+
+def load_inventory(path=FLEET_INVENTORY):
+    try:
+        with open(path, 'r') as f:
+            return parse_inventory(f.read())
+    except OSError:
+        return []
+
+
+def stages(hosts):
+    """{stage: [Host]} in the order the stages first appear"""
+    grouped = {}
+    for host in hosts:
+        grouped.setdefault(host.stage, []).append(host)
+    return grouped
+
+
+class SSHPool:
+    """ssh invocations that share one master connection per host"""
+
+    def __init__(self, ssh=None, connect_timeout=CONNECT_TIMEOUT, persist=CONTROL_PERSIST):
+        self.ssh = ssh or SSH_CMD
+        self.connect_timeout = connect_timeout
+        self.persist = persist
+        # %C hashes the connection, so the socket path stays short whatever the host name
+        self.control_dir = tempfile.mkdtemp(prefix="arch-update-ssh-")
+
+    def argv(self, host, command):
+        argv = [self.ssh, '-o', 'ControlMaster=auto', '-o', f'ControlPath={self.control_dir}/%C',
+                '-o', f'ControlPersist={self.persist}', '-o', 'BatchMode=yes',
+                '-o', f'ConnectTimeout={self.connect_timeout}']
+        if host.port:
+            argv += ['-p', str(host.port)]
+        return argv + [host.destination, '--', command]
+
+    def run(self, host, command, timeout):
+        """(exit code, stdout, stderr); exit code None when ssh could not run or timed out"""
+        try:
+            result = subprocess.run(self.argv(host, command), capture_output=True, text=True, timeout=timeout,
+                                    stdin=subprocess.DEVNULL)
+        except subprocess.TimeoutExpired:
+            return None, "", f"timed out after {format_duration(timeout)}"
+        except OSError as e:
+            return None, "", str(e)
+        return result.returncode, result.stdout, result.stderr
+
+    def close(self, hosts=()):
+        """Stop the master connections and remove their sockets"""
+        for host in hosts:
+            argv = self.argv(host, "true")
+            try:
+                subprocess.run(argv[:1] + ['-O', 'exit'] + argv[1:-2], capture_output=True, timeout=5,
+                               stdin=subprocess.DEVNULL)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+
+
+def _remote_error(returncode, stderr, program):
+    if returncode is None:
+        return stderr
+    # ssh itself exits 255 when it cannot connect, with the reason on stderr
+    message = stderr.strip().splitlines()[-1] if stderr.strip() else ""
+    return message or f"{program} exited with code {returncode}"
+
+
+def check_host(pool, host, include_aur=False, timeout=CHECK_TIMEOUT):
+    started = time.monotonic()
+    returncode, stdout, stderr = pool.run(host, "checkupdates", timeout)
+    if returncode is None or check_failed("pacman", returncode):
+        return HostResult(host, [], [], _remote_error(returncode, stderr, "checkupdates"), time.monotonic() - started)
+    aur = []
+    if include_aur:
+        aur_code, aur_out, _ = pool.run(host, "yay -Qua", timeout)
+        # A host without yay just has no AUR updates to report
+        if aur_code is not None and not check_failed("aur", aur_code):
+            aur = parse_update_lines(aur_out)
+    return HostResult(host, parse_update_lines(stdout), aur, None, time.monotonic() - started)
+
+
+def _run_hosts(work, hosts, workers, on_result, cancel):
+    """work(host) for every host, at most workers at a time, in completion order"""
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(lambda host=host: None if cancel is not None and cancel.is_set() else work(host))
+                   for host in hosts]
+        for future in as_completed(futures):
+            result = future.result()
+            if result is None:
+                continue
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+def check_fleet(hosts, pool, workers=FLEET_WORKERS, include_aur=False, on_result=None, cancel=None):
+    """[HostResult] in inventory order; on_result(result) is called as each host finishes
+
+    Setting the cancel Event skips the hosts not started yet.
+    """
+    results = _run_hosts(lambda host: check_host(pool, host, include_aur), hosts, workers, on_result, cancel)
+    order = {host.name: index for index, host in enumerate(hosts)}
+    return sorted(results, key=lambda result: order[result.host.name])
+
+
+def aggregate_pending(results):
+    """[FleetPackage] deduplicated by package and new version, most widespread first"""
+    packages = {}
+    for result in results:
+        for line in result.pending + result.aur:
+            name, version = parse_pending_line(line)
+            parts = line.split()
+            installed = parts[1] if len(parts) >= 4 else ""
+            packages.setdefault((name, version), {})[result.host.name] = installed
+    return sorted((FleetPackage(name, version, hosts) for (name, version), hosts in packages.items()),
+                  key=lambda package: (-len(package.hosts), package.name, package.version))
+
+
+def version_drift(packages, validated):
+    """'name version' for (name, version) pairs whose version the first stage did not install
+
+    Packages the first stage does not have are not held back; nothing validated them either way.
+    """
+    return [f"{name} {version}" for name, version in packages
+            if name in validated and version not in validated[name]]
+
+
+def _drift_error(drift, what):
+    shown = ", ".join(drift[:3]) + (f" and {len(drift) - 3} more" if len(drift) > 3 else "")
+    return f"{what} versions the first stage did not install: {shown}"
+
+
+def update_host(pool, host, command=UPDATE_COMMAND, timeout=UPDATE_TIMEOUT, output_lines=20, validated=None):
+    """Upgrade one host; with validated ({package: {version}}) only to versions listed there
+
+    checkupdates first resolves what -Syu would install, so a host whose mirrors moved on past
+    the validated versions fails without being touched. The upgraded versions are read back
+    afterwards, which also catches a mirror that synced in between.
+    """
+    started = time.monotonic()
+    returncode, stdout, stderr = pool.run(host, "checkupdates", CHECK_TIMEOUT)
+    if returncode is None or check_failed("pacman", returncode):
+        return UpdateResult(host, None, "", _remote_error(returncode, stderr, "checkupdates"), {},
+                            time.monotonic() - started)
+    pending = [parse_pending_line(line) for line in parse_update_lines(stdout)]
+    if not pending:
+        return UpdateResult(host, None, "Nothing to update", None, {}, time.monotonic() - started)
+    if validated is not None:
+        drift = version_drift(pending, validated)
+        if drift:
+            return UpdateResult(host, None, "\n".join(drift), _drift_error(drift, "Repositories offer"), {},
+                                time.monotonic() - started)
+
+    returncode, stdout, stderr = pool.run(host, command, timeout)
+    output = "\n".join((stdout + stderr).strip().splitlines()[-output_lines:])
+    if returncode != 0:
+        return UpdateResult(host, returncode, output, _remote_error(returncode, stderr, "pacman"), {},
+                            time.monotonic() - started)
+    # pacman -Q exits 1 for a package the upgrade replaced, but still lists the others
+    _, query, _ = pool.run(host, "pacman -Q " + " ".join(shlex.quote(name) for name, _ in pending), CHECK_TIMEOUT)
+    installed = dict(line.split()[:2] for line in query.splitlines() if len(line.split()) >= 2)
+    error = None
+    if validated is not None:
+        drift = version_drift(installed.items(), validated)
+        if drift:
+            error = _drift_error(drift, "Installed")
+    return UpdateResult(host, returncode, output, error, installed, time.monotonic() - started)
+
+
+def rollout(hosts, pool, workers=FLEET_WORKERS, max_failures=0, command=UPDATE_COMMAND, on_result=None,
+            on_stage=None, cancel=None, validated=None):
+    """Update hosts stage by stage; a stage with more than max_failures failed hosts halts the rollout
+
+    The versions the first stage installs are the ones later stages may install; a later host
+    whose -Syu would resolve to anything newer fails instead. Pass validated ({package:
+    {version}}) to hold every stage, the first included, to versions validated earlier.
+    on_stage(stage, hosts) is called before each stage starts.
+    """
+    results, completed = [], []
+    for stage, stage_hosts in stages(hosts).items():
+        if cancel is not None and cancel.is_set():
+            return RolloutReport(results, completed, stage, validated or {})
+        if on_stage:
+            on_stage(stage, stage_hosts)
+        stage_results = _run_hosts(lambda host: update_host(pool, host, command, validated=validated), stage_hosts,
+                                   workers, on_result, cancel)
+        results.extend(stage_results)
+        failures = sum(1 for result in stage_results if result.error)
+        skipped = len(stage_hosts) - len(stage_results)
+        if failures > max_failures or skipped:
+            return RolloutReport(results, completed, stage, validated or {})
+        if validated is None:
+            validated = {}
+            for result in stage_results:
+                if not result.error:
+                    for name, version in result.installed.items():
+                        validated.setdefault(name, set()).add(version)
+        completed.append(stage)
+    return RolloutReport(results, completed, None, validated or {})
+
+
+def describe_check(results):
+    """'3 of 4 hosts checked, 57 updates (21 distinct), 1 failed'"""
+    checked = [result for result in results if not result.error]
+    updates = sum(len(result.pending) + len(result.aur) for result in checked)
+    text = (f"{len(checked)} of {len(results)} hosts checked, {updates} updates "
+            f"({len(aggregate_pending(checked))} distinct)")
+    if len(checked) < len(results):
+        text += f", {len(results) - len(checked)} failed"
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m archupdate.fleet", description="Check and update hosts over SSH")
+    parser.add_argument("--inventory", default=FLEET_INVENTORY, help=f"host inventory (default {FLEET_INVENTORY})")
+    parser.add_argument("--workers", type=int, default=FLEET_WORKERS,
+                        help=f"hosts handled at once (default {FLEET_WORKERS})")
+    commands = parser.add_subparsers(dest="action", required=True)
+    check = commands.add_parser("check", help="check every host and list the pending updates")
+    check.add_argument("--aur", action="store_true", help="also run yay -Qua")
+    check.add_argument("--json", action="store_true", help="machine readable output")
+    update = commands.add_parser("update", help="update the hosts stage by stage")
+    update.add_argument("--stage", action="append", help="only these stages, repeatable (default all)")
+    update.add_argument("--max-failures", type=int, default=0, help="failed hosts a stage may have (default 0)")
+    update.add_argument("--yes", action="store_true", help="really update; without it the plan is printed")
+    args = parser.parse_args(argv)
+
+    hosts = load_inventory(args.inventory)
+    if not hosts:
+        print(f"No hosts in {args.inventory}")
+        return 1
+    pool = SSHPool()
+    try:
+        if args.action == "check":
+            def print_result(result):
+                if not args.json:
+                    status = result.error or f"{len(result.pending) + len(result.aur)} updates"
+                    print(f"{result.host.name:<30} {result.duration:6.1f}s  {status}", flush=True)
+
+            results = check_fleet(hosts, pool, args.workers, args.aur, on_result=print_result)
+            packages = aggregate_pending(results)
+            if args.json:
+                json.dump({
+                    "hosts": {result.host.name: {"stage": result.host.stage, "pending": result.pending,
+                                                 "aur": result.aur, "error": result.error} for result in results},
+                    "packages": [package._asdict() for package in packages],
+                }, sys.stdout, indent=2)
+                print()
+            else:
+                for package in packages:
+                    print(f"  {package.name} {package.version}  ({len(package.hosts)} hosts)")
+                print(describe_check(results))
+            return 1 if any(result.error for result in results) else 0
+
+        if args.stage:
+            hosts = [host for host in hosts if host.stage in args.stage]
+        plan = stages(hosts)
+        if not args.yes:
+            for stage, stage_hosts in plan.items():
+                print(f"{stage}: {' '.join(host.name for host in stage_hosts)}")
+            print("Add --yes to update these hosts in this order")
+            return 0
+        report = rollout(hosts, pool, args.workers, args.max_failures,
+                         on_stage=lambda stage, stage_hosts: print(f"Stage {stage} ({len(stage_hosts)} hosts)",
+                                                                    flush=True),
+                         on_result=lambda result: print(f"  {result.host.name}: "
+                                                        f"{result.error or 'updated'} "
+                                                        f"({format_duration(result.duration)})", flush=True))
+        if report.halted:
+            print(f"Halted at stage {report.halted}")
+            for result in report.results:
+                if result.error and result.returncode is None and result.output:
+                    print(f"  {result.host.name} held back by: {' '.join(result.output.splitlines())}")
+            return 1
+        return 0
+    finally:
+        pool.close(hosts)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
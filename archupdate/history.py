@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import sqlite3
+from datetime import datetime
+
+from .config import UPDATE_HISTORY_DB, UPDATE_HISTORY_FILE
+
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    started REAL,
+    finished REAL,
+    duration REAL,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    package_count INTEGER NOT NULL DEFAULT 0,
+    download_size INTEGER,
+    installed_size INTEGER,
+    snapshot_backend TEXT,
+    snapshot_id TEXT,
+    snapshot_duration REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions(date);
+
+CREATE TABLE IF NOT EXISTS packages (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    name TEXT NOT NULL,
+    old_version TEXT,
+    new_version TEXT,
+    source TEXT,
+    download_size INTEGER,
+    installed_size INTEGER,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS packages_name ON packages(name, session_id);
+CREATE INDEX IF NOT EXISTS packages_session ON packages(session_id);
+
+CREATE TABLE IF NOT EXISTS timings (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    phase TEXT,
+    name TEXT NOT NULL,
+    start REAL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS timings_name ON timings(kind, name);
+CREATE INDEX IF NOT EXISTS timings_session ON timings(session_id);
+"""
+
+
+# Columns added to existing databases, by the version that introduced them
+MIGRATIONS = {
+    3: ["ALTER TABLE sessions ADD COLUMN snapshot_backend TEXT",
+        "ALTER TABLE sessions ADD COLUMN snapshot_id TEXT",
+        "ALTER TABLE sessions ADD COLUMN snapshot_duration REAL"],
+}
+
+
+def package_record(pkg_line, source="pacman", download_size=None, installed_size=None, duration=None):
+    """Build a package dict for record_session from a 'name old -> new' line"""
+    parts = pkg_line.split()
+    return {
+        'name': parts[0] if parts else pkg_line,
+        'old_version': parts[1] if len(parts) > 1 else None,
+        'new_version': parts[-1] if len(parts) > 2 else None,
+        'source': source,
+        'download_size': download_size,
+        'installed_size': installed_size,
+        'duration': duration
+    }
+
+
+class HistoryStore:
+    """Append-only SQLite store of update sessions and their packages
+
+    Every session is written in a single transaction and never rewritten;
+    the package table is indexed by name so the last change of a package is
+    one index lookup regardless of how many years of history are kept.
+    """
+
+    def __init__(self, path=None, legacy_file=None):
+        self.path = path or UPDATE_HISTORY_DB
+        self.legacy_file = legacy_file or UPDATE_HISTORY_FILE
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._migrate()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _migrate(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self._conn:
+            if version >= 1:
+                for target in sorted(MIGRATIONS):
+                    if version < target:
+                        for statement in MIGRATIONS[target]:
+                            self._conn.execute(statement)
+            self._conn.executescript(SCHEMA)
+            if version < 1:
+                self._import_legacy_json()
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _import_legacy_json(self):
+        """Carry over entries from the old update_history.json"""
+        try:
+            with open(self.legacy_file, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for entry in entries:
+            self._conn.execute(
+                "INSERT INTO sessions (date, type, status, package_count) VALUES (?, ?, ?, ?)",
+                (entry.get('date', ''), entry.get('type', ''), entry.get('status', ''),
+                 entry.get('package_count', 0))
+            )
+
+    def record_session(self, update_type, status, packages=(), started=None, finished=None, timings=(),
+                       snapshot=None):
+        """Append one session with its package dicts and TransactionTimer records, return the session id
+
+        ``snapshot`` is the Snapshot taken before the update, if any.
+        """
+        packages = list(packages)
+        finished = finished or time.time()
+        duration = finished - started if started else None
+        download_size = sum(p.get('download_size') or 0 for p in packages) or None
+        installed_size = sum(p.get('installed_size') or 0 for p in packages) or None
+
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO sessions (date, started, finished, duration, type, status, package_count, "
+                "download_size, installed_size, snapshot_backend, snapshot_id, snapshot_duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (datetime.fromtimestamp(finished).strftime('%Y-%m-%d %H:%M:%S'), started, finished,
+                 duration, update_type, status, len(packages), download_size, installed_size,
+                 snapshot.backend if snapshot else None, snapshot.id if snapshot else None,
+                 snapshot.duration if snapshot else None)
+            )
+            session_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO packages (session_id, name, old_version, new_version, source, "
+                "download_size, installed_size, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(session_id, p['name'], p.get('old_version'), p.get('new_version'), p.get('source'),
+                  p.get('download_size'), p.get('installed_size'), p.get('duration'))
+                 for p in packages]
+            )
+            self.conn.executemany(
+                "INSERT INTO timings (session_id, seq, kind, phase, name, start, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(session_id, seq, t['kind'], t.get('phase'), t['name'], t.get('start'), t.get('duration'))
+                 for seq, t in enumerate(timings)]
+            )
+        return session_id
+
+    def sessions(self, limit=100, before_id=None, date_from=None, date_to=None,
+                 status=None, package=None):
+        """Most recent sessions first, filtered in SQL
+
+        Pages are keyed on the session id (``before_id``) rather than an
+        OFFSET, so fetching a later page costs the same as the first one.
+        ``date_from``/``date_to`` are inclusive 'YYYY-MM-DD' days and
+        ``package`` matches package names by prefix.
+        """
+        clauses, params = [], []
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("date <= ?")
+            params.append(date_to + " 23:59:59")
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if package:
+            # Range instead of LIKE so the packages_name index is used
+            clauses.append("id IN (SELECT session_id FROM packages WHERE name >= ? AND name < ?)")
+            params.extend([package, package + "\uffff"])
+
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self.conn.execute(
+            f"SELECT * FROM sessions {where}ORDER BY id DESC LIMIT ?", params + [limit]
+        ).fetchall()
+
+    def session_packages(self, session_id):
+        return self.conn.execute(
+            "SELECT * FROM packages WHERE session_id = ? ORDER BY name", (session_id,)
+        ).fetchall()
+
+    def last_change(self, name):
+        """Latest recorded change of a package joined with its session, or None"""
+        return self.conn.execute(
+            "SELECT p.*, s.date, s.status FROM packages p JOIN sessions s ON s.id = p.session_id "
+            "WHERE p.name = ? ORDER BY p.session_id DESC LIMIT 1", (name,)
+        ).fetchone()
+
+    def last_snapshot(self):
+        """Most recent session that has a snapshot, or None"""
+        return self.conn.execute(
+            "SELECT * FROM sessions WHERE snapshot_id IS NOT NULL ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+
+    def forget_snapshots(self, backend, snapshot_ids):
+        """Drop deleted snapshots from their sessions, so nothing offers to restore them"""
+        if not snapshot_ids:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE sessions SET snapshot_id = NULL WHERE snapshot_backend = ? AND snapshot_id = ?",
+                [(backend, snapshot_id) for snapshot_id in snapshot_ids]
+            )
+
+    def snapshot_durations(self, backend, limit=5):
+        """Seconds the last snapshots of backend took to create, newest first"""
+        return [row[0] for row in self.conn.execute(
+            "SELECT snapshot_duration FROM sessions WHERE snapshot_backend = ? AND snapshot_duration IS NOT NULL "
+            "ORDER BY id DESC LIMIT ?", (backend, limit)
+        )]
+
+    def session_timings(self, session_id):
+        return self.conn.execute(
+            "SELECT * FROM timings WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+
+    def timing_statistics(self, kind="hook", sessions=None):
+        """Per name: runs, average, longest and total seconds, slowest total first
+
+        ``sessions`` limits the aggregate to the most recent N sessions.
+        """
+        where, params = "WHERE kind = ? AND duration IS NOT NULL", [kind]
+        if sessions:
+            where += " AND session_id IN (SELECT id FROM sessions ORDER BY id DESC LIMIT ?)"
+            params.append(sessions)
+        return self.conn.execute(
+            "SELECT name, phase, COUNT(*) AS runs, AVG(duration) AS average, MAX(duration) AS longest, "
+            f"SUM(duration) AS total FROM timings {where} GROUP BY phase, name ORDER BY total DESC", params
+        ).fetchall()
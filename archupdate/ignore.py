@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import fnmatch
+
+from .config import IGNORED_PACKAGES_FILE, PACMAN_CONF, LOCAL_DB_DIR
+
+_GLOB_CHARS = set("*?[")
+
+# (ignored file, pacman.conf) -> (stat key, IgnoreList)
+_cache = {}
+
+
+def load_ignored_packages():
+    """Load ignored packages list"""
+    try:
+        if os.path.exists(IGNORED_PACKAGES_FILE):
+            with open(IGNORED_PACKAGES_FILE, 'r') as f:
+                return json.load(f)
+    except:
+        pass
+    return []
+
+def save_ignored_packages(packages):
+    """Save ignored packages list"""
+    try:
+        with open(IGNORED_PACKAGES_FILE, 'w') as f:
+            json.dump(packages, f, indent=2)
+    except Exception as e:
+        print(f"Failed to save ignored packages: {e}")
+
+
+def parse_pacman_conf_ignores(path=PACMAN_CONF):
+    """Return (IgnorePkg patterns, IgnoreGroup names) from the [options] section"""
+    patterns, groups = [], []
+    section = None
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                if line.startswith('[') and line.endswith(']'):
+                    section = line[1:-1]
+                    continue
+                if section != "options" or '=' not in line:
+                    continue
+                key, value = (part.strip() for part in line.split('=', 1))
+                if key == "IgnorePkg":
+                    patterns.extend(value.split())
+                elif key == "IgnoreGroup":
+                    groups.extend(value.split())
+    except OSError:
+        pass
+    return patterns, groups
+
+
+def installed_groups(name, version, local_db=LOCAL_DB_DIR):
+    """Groups of an installed package, read straight from its local DB entry"""
+    try:
+        with open(os.path.join(local_db, f"{name}-{version}", "desc"), 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return ()
+    try:
+        start = lines.index("%GROUPS%") + 1
+    except ValueError:
+        return ()
+    groups = []
+    for line in lines[start:]:
+        if not line:
+            break
+        groups.append(line)
+    return groups
+
+
+class IgnoreList:
+    """Exact names in a set, glob patterns compiled into a single regex"""
+
+    def __init__(self, patterns=(), groups=()):
+        self.names = set()
+        self.globs = []
+        for pattern in patterns:
+            if _GLOB_CHARS.intersection(pattern):
+                self.globs.append(pattern)
+            else:
+                self.names.add(pattern)
+        self.glob_re = None
+        if self.globs:
+            self.glob_re = re.compile("|".join(fnmatch.translate(g) for g in self.globs))
+        self.groups = frozenset(groups)
+
+    def __bool__(self):
+        return bool(self.names or self.globs or self.groups)
+
+    def matches(self, name, groups=()):
+        if name in self.names:
+            return True
+        if self.glob_re is not None and self.glob_re.match(name):
+            return True
+        return bool(self.groups) and not self.groups.isdisjoint(groups)
+
+    def filter(self, pkg_lines, local_db=LOCAL_DB_DIR):
+        """Drop ignored entries from 'name old -> new' pending lines"""
+        kept = []
+        for pkg_line in pkg_lines:
+            parts = pkg_line.split()
+            if not parts:
+                continue
+            groups = ()
+            if self.groups and len(parts) > 1:
+                groups = installed_groups(parts[0], parts[1], local_db)
+            if not self.matches(parts[0], groups):
+                kept.append(pkg_line)
+        return kept
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def get_ignore_list(ignored_file=None, pacman_conf=PACMAN_CONF):
+    """Cached IgnoreList of the user's list plus pacman.conf, rebuilt when either file changes"""
+    ignored_file = ignored_file or IGNORED_PACKAGES_FILE
+    cache_key = (ignored_file, pacman_conf)
+    stat_key = (_stat_key(ignored_file), _stat_key(pacman_conf))
+
+    cached = _cache.get(cache_key)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
+
+    patterns = []
+    try:
+        with open(ignored_file, 'r') as f:
+            patterns.extend(json.load(f))
+    except (OSError, ValueError):
+        pass
+    conf_patterns, conf_groups = parse_pacman_conf_ignores(pacman_conf)
+    patterns.extend(conf_patterns)
+
+    ignore = IgnoreList(patterns, conf_groups)
+    _cache[cache_key] = (stat_key, ignore)
+    return ignore
@@ -0,0 +1,85 @@
+"""Structured results for background jobs and the external commands they run
+
+The GUI runs all of its background work as jobs (JobRunner in
+update_gui.py); this module holds the Qt-free parts: the result types and
+run_command(), which every external command goes through so that each
+one has a timeout and can be cancelled.
+"""
+import time
+import subprocess
+from collections import namedtuple
+
+from .cancel import kill_tree
+from .formatting import format_duration
+
+# Seconds between two looks at the cancel Event while a command runs
+CANCEL_POLL = 0.1
+
+JobResult = namedtuple("JobResult", ["name", "value", "error", "cancelled", "timed_out", "duration"])
+JobResult.__doc__ = """Outcome of one background job
+
+name      -- what was submitted, for logs and profiles
+value     -- what the job returned, None when it failed
+error     -- message of the exception it raised, 'cancelled' or the timeout
+cancelled -- the job was cancelled before it finished
+timed_out -- the job ran past its timeout
+duration  -- seconds from submission to the result
+"""
+
+CommandResult = namedtuple("CommandResult", ["argv", "returncode", "stdout", "stderr", "error", "duration"])
+CommandResult.__doc__ = """Outcome of run_command()
+
+returncode -- exit code, None when the command did not start or was stopped
+stdout     -- its output (text)
+stderr     -- its error output
+error      -- why there is no exit code: start failure, timeout or 'cancelled'
+duration   -- seconds the command ran
+"""
+
+
+def command_failed(result):
+    """Message for a command that did not start, was stopped or exited non-zero; None on success"""
+    if result.error:
+        return result.error
+    if result.returncode != 0:
+        return result.stderr.strip() or f"{result.argv[0]} exited with code {result.returncode}"
+    return None
+
+
+def run_command(argv, timeout=None, cancel=None, input=None, poll=CANCEL_POLL):
+    """Run argv to completion in the calling thread and return a CommandResult
+
+    Never raises for the command's own failures. When timeout passes or
+    the cancel Event is set, the command and everything it started are
+    killed and error says which of the two happened.
+    """
+    started = time.monotonic()
+    try:
+        process = subprocess.Popen(argv, stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError as e:
+        return CommandResult(list(argv), None, "", "", str(e), 0.0)
+
+    deadline = started + timeout if timeout else None
+    error = None
+    while True:
+        wait = poll if cancel is not None else None
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+            wait = remaining if wait is None else min(wait, remaining)
+        try:
+            stdout, stderr = process.communicate(input, timeout=wait)
+            break
+        except subprocess.TimeoutExpired:
+            # communicate() keeps what was read so far; the input was already sent
+            input = None
+        if cancel is not None and cancel.is_set():
+            error = "cancelled"
+        elif deadline is not None and time.monotonic() >= deadline:
+            error = f"timed out after {format_duration(timeout)}"
+        if error:
+            kill_tree(process.pid)
+            stdout, stderr = process.communicate()
+            break
+    return CommandResult(list(argv), None if error else process.returncode, stdout or "", stderr or "", error,
+                         time.monotonic() - started)
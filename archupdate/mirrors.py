@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import tempfile
+import subprocess
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import MIRRORLIST, PACMAN_CONF, PKEXEC_CMD, CONFIG_DIR
+
+MIRROR_CACHE_FILE = os.path.join(CONFIG_DIR, "mirror_benchmark.json")
+MIRROR_CACHE_TTL = 24 * 60 * 60
+
+PROBE_REPO = "core"
+PROBE_TIMEOUT = 5
+PROBE_WORKERS = 8
+# Enough of core.db to measure throughput without fetching it all
+MAX_PROBE_BYTES = 512 * 1024
+# Ranking estimates how long a download of this size would take
+REFERENCE_BYTES = 2 * 1024 * 1024
+
+MirrorResult = namedtuple("MirrorResult", ["server", "ttfb", "throughput", "size", "error"])
+MirrorResult.__doc__ = """One mirror probe
+
+server     -- Server line value as in the mirrorlist ($repo/$arch unexpanded)
+ttfb       -- seconds until the first body byte, None on error
+throughput -- bytes per second after the first byte, None on error
+size       -- bytes read
+error      -- message if the probe failed
+"""
+
+
+def estimated_time(result):
+    """Seconds to fetch REFERENCE_BYTES from a mirror, None for failed probes"""
+    if result.error or not result.throughput:
+        return None
+    return result.ttfb + REFERENCE_BYTES / result.throughput
+
+
+def pacman_architecture(path=PACMAN_CONF):
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                key, _, value = line.split('#', 1)[0].partition('=')
+                if key.strip() == "Architecture" and value.split():
+                    arch = value.split()[0]
+                    if arch != "auto":
+                        return arch
+    except OSError:
+        pass
+    return os.uname().machine
+
+
+def parse_mirrorlist(text):
+    """Server URLs of the active (uncommented) Server lines, in order"""
+    servers = []
+    for line in text.splitlines():
+        key, _, value = line.split('#', 1)[0].partition('=')
+        if key.strip() == "Server" and value.strip():
+            servers.append(value.strip())
+    return servers
+
+
+def probe_url(server, arch=None, repo=PROBE_REPO):
+    url = server.replace("$repo", repo).replace("$arch", arch or pacman_architecture())
+    return f"{url.rstrip('/')}/{repo}.db"
+
+
+def probe_mirror(server, arch=None, timeout=PROBE_TIMEOUT):
+    """Measure time to first byte and throughput of the repo DB on one mirror"""
+    request = urllib.request.Request(probe_url(server, arch), headers={"User-Agent": "arch-update-gui"})
+    size = 0
+    try:
+        started = time.monotonic()
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            chunk = response.read(16 * 1024)
+            first_byte = time.monotonic()
+            if not chunk:
+                return MirrorResult(server, None, None, 0, "Empty response")
+            size = len(chunk)
+            while size < MAX_PROBE_BYTES:
+                chunk = response.read(64 * 1024)
+                if not chunk:
+                    break
+                size += len(chunk)
+            finished = time.monotonic()
+    except (OSError, ValueError) as e:
+        # URLError, HTTPError and socket timeouts are all OSErrors
+        return MirrorResult(server, None, None, size, str(getattr(e, "reason", e)))
+    ttfb = first_byte - started
+    # Tiny files finish within one read; fall back to the whole transfer time
+    transfer = finished - first_byte if finished - first_byte > 0.001 else finished - started
+    return MirrorResult(server, ttfb, size / max(transfer, 0.001), size, None)
+
+
+def benchmark_mirrors(servers, arch=None, workers=PROBE_WORKERS, timeout=PROBE_TIMEOUT):
+    """Probe mirrors concurrently, return results fastest first and failures last"""
+    arch = arch or pacman_architecture()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda server: probe_mirror(server, arch, timeout), servers))
+    return rank_results(results)
+
+
+def rank_results(results):
+    return sorted(results, key=lambda r: (estimated_time(r) is None, estimated_time(r) or 0))
+
+
+def save_benchmark(results, path=None):
+    path = path or MIRROR_CACHE_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'time': time.time(), 'results': [r._asdict() for r in results]}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_benchmark(servers=None, max_age=MIRROR_CACHE_TTL, path=None):
+    """(timestamp, results) of a cached benchmark, None if stale or for other servers"""
+    try:
+        with open(path or MIRROR_CACHE_FILE, 'r') as f:
+            data = json.load(f)
+        results = [MirrorResult(**entry) for entry in data['results']]
+        stamp = data['time']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if time.time() - stamp > max_age:
+        return None
+    if servers is not None and set(servers) != {r.server for r in results}:
+        return None
+    return stamp, results
+
+
+def reorder_mirrorlist(text, ranked_servers):
+    """Rewrite the active Server lines in ranked order, keeping every other line"""
+    order = iter(list(ranked_servers) + [s for s in parse_mirrorlist(text) if s not in ranked_servers])
+    lines = [f"# Ranked by Arch Update on {time.strftime('%Y-%m-%d %H:%M')}"]
+    for line in text.splitlines():
+        if line.startswith("# Ranked by Arch Update on "):
+            continue
+        key, _, value = line.split('#', 1)[0].partition('=')
+        if key.strip() == "Server" and value.strip():
+            line = f"Server = {next(order)}"
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def write_mirrorlist(text, path=MIRRORLIST):
+    """Install a new mirrorlist through pkexec, keeping a .bak copy; return an error or None"""
+    fd, tmp_path = tempfile.mkstemp(prefix="mirrorlist.", dir=tempfile.gettempdir())
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        result = subprocess.run(
+            [PKEXEC_CMD, 'install', '-m', '644', '--backup=simple', '--suffix=.bak', tmp_path, path],
+            capture_output=True, text=True, timeout=120
+        )
+        if result.returncode != 0:
+            return result.stderr.strip() or f"pkexec exited with code {result.returncode}"
+        return None
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return str(e)
+    finally:
+        os.remove(tmp_path)
@@ -0,0 +1,215 @@
+import os
+import re
+import json
+import html
+import time
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from collections import namedtuple
+
+from .config import NEWS_URL, NEWS_CACHE_FILE
+
+NEWS_TIMEOUT = 10
+# Older items are assumed to be dealt with already
+NEWS_MAX_AGE = 60 * 24 * 60 * 60
+# 2: tokens only from titles, code spans and hyphenated names
+NEWS_CACHE_VERSION = 2
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_CODE_RE = re.compile(r"<(code|pre)\b[^>]*>(.*?)</\1>|`([^`]+)`", re.S | re.I)
+_TOKEN_RE = re.compile(r"[a-z0-9@_+][a-z0-9@._+-]*")
+# The distribution name would otherwise match the linux package in every item
+_DISTRO_RE = re.compile(r"\barch\s+linux\b")
+_INTERVENTION_RE = re.compile(r"manual(ly)?\s+intervention|intervention\s+(is\s+)?required")
+# Package names that are also ordinary words; they only count inside code spans
+COMMON_WORDS = frozenset("""
+    a at base bc check core dialog ed expect extra file find less make man pass patch screen
+    testing time tree which who words
+""".split())
+
+NewsItem = namedtuple("NewsItem", ["title", "link", "published", "text", "tokens"])
+NewsItem.__doc__ = """One Arch news entry
+
+published -- epoch seconds, 0 if the feed had no usable date
+text      -- description with the HTML stripped
+tokens    -- lower-case words of title and text that name packages (see item_tokens)
+"""
+
+NewsMatch = namedtuple("NewsMatch", ["item", "packages", "intervention"])
+NewsMatch.__doc__ = """A news item mentioning packages about to be updated
+
+packages     -- pending package names found in the item
+intervention -- True if the item asks for manual intervention
+"""
+
+
+def html_to_text(markup):
+    return " ".join(html.unescape(_TAG_RE.sub(" ", markup or "")).split())
+
+
+def _words(text):
+    for token in _TOKEN_RE.findall(_DISTRO_RE.sub(" ", text.lower())):
+        token = token.rstrip(".-_")
+        if token:
+            yield token
+
+
+def item_tokens(title, markup=""):
+    """Words of a news item that name packages
+
+    Every word of a code span counts and every title word except the
+    COMMON_WORDS; from the prose only hyphenated names count, since its
+    ordinary words would match packages such as which, less or file.
+    """
+    words = {word for word in _words(title) if word not in COMMON_WORDS}
+    for match in _CODE_RE.finditer(markup or ""):
+        words.update(_words(html_to_text(match.group(2) or match.group(3))))
+    words.update(word for word in _words(html_to_text(markup)) if '-' in word)
+    return sorted(words)
+
+
+def parse_feed(data):
+    """NewsItems of an RSS 2.0 document, newest first"""
+    items = []
+    for node in ET.fromstring(data).iter("item"):
+        title = html_to_text(node.findtext("title"))
+        text = html_to_text(node.findtext("description"))
+        try:
+            published = parsedate_to_datetime(node.findtext("pubDate") or "").timestamp()
+        except (TypeError, ValueError, IndexError):
+            published = 0
+        items.append(NewsItem(title, (node.findtext("link") or "").strip(), published, text,
+                              item_tokens(title, node.findtext("description"))))
+    return sorted(items, key=lambda item: item.published, reverse=True)
+
+
+def _load_cache(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def cached_news(path=None):
+    """Items of the last successful fetch, without touching the network"""
+    cache = _load_cache(path or NEWS_CACHE_FILE)
+    if cache.get("version") != NEWS_CACHE_VERSION:
+        # Tokens of an older version do not match the same way; the next fetch replaces them
+        return []
+    try:
+        return [NewsItem(**entry) for entry in cache.get("items", [])]
+    except TypeError:
+        return []
+
+
+def fetch_news(url=NEWS_URL, path=None, timeout=NEWS_TIMEOUT):
+    """Refresh the news cache with a conditional GET, return (items, error)
+
+    url may be a local file path or file:// URL. On failure the cached
+    items are returned together with the error.
+    """
+    path = path or NEWS_CACHE_FILE
+    cache = _load_cache(path)
+    if "://" not in url:
+        url = "file://" + os.path.abspath(url)
+    headers = {"User-Agent": "arch-update-gui"}
+    if cache.get("url") == url and cache.get("version") == NEWS_CACHE_VERSION:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as response:
+            data = response.read()
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        items = parse_feed(data)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return cached_news(path), None
+        return cached_news(path), f"HTTP {e.code}"
+    except (OSError, ET.ParseError) as e:
+        return cached_news(path), str(getattr(e, "reason", e))
+
+    cache.update({
+        "version": NEWS_CACHE_VERSION,
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched": time.time(),
+        "items": [item._asdict() for item in items]
+    })
+    try:
+        _save_cache(cache, path)
+    except OSError as e:
+        print(f"Failed to cache news: {e}")
+    return items, None
+
+
+class NewsIndex:
+    """Inverted index from words to news items
+
+    Built once per feed, so checking a large update only costs one
+    dictionary lookup per pending package.
+    """
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.index = {}
+        for item in self.items:
+            for token in item.tokens:
+                self.index.setdefault(token, []).append(item)
+
+    def lookup(self, name):
+        """Items naming the package or, for 'nvidia-utils', its family 'nvidia'"""
+        key = name.lower()
+        items = list(self.index.get(key, ()))
+        family = key.split('-', 1)[0]
+        if family != key and len(family) >= 3 and family not in COMMON_WORDS:
+            items += [item for item in self.index.get(family, ()) if item not in items]
+        return items
+
+    def match(self, names):
+        """NewsMatches for items mentioning any of names, newest first"""
+        found = {}
+        for name in names:
+            for item in self.lookup(name):
+                found.setdefault(item.link or item.title, (item, []))[1].append(name)
+        matches = [
+            NewsMatch(item, sorted(packages), bool(_INTERVENTION_RE.search(f"{item.title} {item.text}".lower())))
+            for item, packages in found.values()
+        ]
+        return sorted(matches, key=lambda match: match.item.published, reverse=True)
+
+
+def relevant_news(names, items=None, max_age=NEWS_MAX_AGE, path=None, now=None):
+    """Recent, not yet acknowledged items mentioning packages in names"""
+    path = path or NEWS_CACHE_FILE
+    items = cached_news(path) if items is None else items
+    acknowledged = set(_load_cache(path).get("acknowledged", []))
+    cutoff = (now or time.time()) - max_age
+    recent = [item for item in items if item.published >= cutoff and item.link not in acknowledged]
+    return NewsIndex(recent).match(names)
+
+
+def acknowledge_news(matches, path=None):
+    """Remember items the user has read so they do not block later updates"""
+    path = path or NEWS_CACHE_FILE
+    cache = _load_cache(path)
+    acknowledged = cache.get("acknowledged", [])
+    acknowledged += [match.item.link for match in matches if match.item.link not in acknowledged]
+    cache["acknowledged"] = acknowledged
+    try:
+        _save_cache(cache, path)
+    except OSError as e:
+        print(f"Failed to save acknowledged news: {e}")
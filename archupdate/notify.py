@@ -0,0 +1,49 @@
+import struct
+
+from .bus import Bus, DBusError
+
+NOTIFY_SERVICE = "org.freedesktop.Notifications"
+NOTIFY_PATH = "/org/freedesktop/Notifications"
+NOTIFY_APP_NAME = "Arch Update"
+NOTIFY_ICON = "system-software-update"
+
+URGENCY_LOW = 0
+URGENCY_NORMAL = 1
+URGENCY_CRITICAL = 2
+
+
+class DesktopNotifications:
+    """org.freedesktop.Notifications client over one lazily opened connection"""
+
+    def __init__(self, app_name=NOTIFY_APP_NAME, icon=NOTIFY_ICON):
+        self.app_name = app_name
+        self.icon = icon
+        self._bus = None
+
+    def close(self):
+        if self._bus is not None:
+            self._bus.close()
+            self._bus = None
+
+    def notify(self, summary, body="", urgency=URGENCY_NORMAL, replaces_id=0, timeout=-1):
+        """Show or replace a notification, return its id or None on failure"""
+        hints = {'urgency': ('y', urgency)}
+        for attempt in range(2):
+            try:
+                if self._bus is None:
+                    self._bus = Bus.session()
+                reply = self._bus.call(
+                    NOTIFY_SERVICE, NOTIFY_PATH, NOTIFY_SERVICE, "Notify", "susssasa{sv}i",
+                    (self.app_name, replaces_id, self.icon, summary, body, [], hints, timeout)
+                )
+                return reply[0] if reply else None
+            except (OSError, struct.error) as e:
+                # A stale connection (bus restarted) is retried once on a new socket
+                self.close()
+                if attempt:
+                    print(f"Failed to send notification: {e}")
+            except DBusError as e:
+                self.close()
+                print(f"Failed to send notification: {e}")
+                return None
+        return None
@@ -0,0 +1,346 @@
+"""Share the package cache with other hosts on the LAN
+
+One host serves its pacman cache read-only over HTTP:
+
+    python -m archupdate --serve-cache                 # port PEER_PORT on all interfaces
+
+The others fetch the packages an update is about to download from these
+peers before pacman goes to the mirrors. Every file is checked against
+the size and SHA-256 the sync database gives for it, so a peer can save a
+download but never change what gets installed; pacman verifies the
+signatures as usual afterwards.
+
+    python -m archupdate.peers --peer http://localhost:7878 --dest /tmp/pkg linux firefox
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import threading
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import SUDO_CMD, PACMAN_CACHE_DIR
+from .cache import cache_dirs, parse_package_file
+from .cancel import Cancelled
+from .formatting import format_size, format_duration
+from .transfers import download_label
+
+PEER_PORT = 7878
+# Seconds a peer gets to answer; a slow peer costs less than the mirror it stands in for
+PEER_TIMEOUT = 3
+PEER_WORKERS = 4
+INDEX_PATH = "/index"
+_CHUNK_SIZE = 256 * 1024
+
+PeerReport = namedtuple("PeerReport", ["fetched", "downloaded", "missing", "rejected", "errors", "elapsed"])
+PeerReport.__doc__ = """Outcome of fetch_from_peers()
+
+fetched    -- {file name: peer} of the verified downloads
+downloaded -- bytes fetched from peers
+missing    -- file names no reachable peer had
+rejected   -- {file name: reason} for downloads that failed verification
+errors     -- {peer: message} for peers that could not be reached
+elapsed    -- seconds the whole fetch took
+"""
+
+
+class PeerError(Exception):
+    pass
+
+
+def servable(file_name):
+    """Package files and their signatures; never partial downloads or anything else"""
+    if file_name.endswith(".sig"):
+        file_name = file_name[:-len(".sig")]
+    return parse_package_file(file_name) is not None
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    server_version = "arch-update-cache"
+
+    def do_GET(self):
+        self.send_cached(body=True)
+
+    def do_HEAD(self):
+        self.send_cached(body=False)
+
+    def send_cached(self, body):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        if path == INDEX_PATH:
+            index = self.server.index()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(index)))
+            self.end_headers()
+            if body:
+                self.wfile.write(index)
+            return
+        file_name = path.lstrip('/')
+        if '/' in file_name or not servable(file_name):
+            self.send_error(404)
+            return
+        for directory in self.server.directories:
+            try:
+                f = open(os.path.join(directory, file_name), 'rb')
+            except OSError:
+                continue
+            with f:
+                st = os.fstat(f.fileno())
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(st.st_size))
+                self.send_header("Last-Modified", formatdate(st.st_mtime, usegmt=True))
+                self.end_headers()
+                if body:
+                    try:
+                        # Straight from the page cache to the socket
+                        self.connection.sendfile(f)
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    self.server.count(st.st_size)
+            return
+        self.send_error(404)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class CacheServer(ThreadingHTTPServer):
+    """Read-only HTTP view of the package cache directories"""
+    daemon_threads = True
+
+    def __init__(self, address, directories=None, verbose=False):
+        super().__init__(address, CacheRequestHandler)
+        self.directories = list(directories or cache_dirs())
+        self.verbose = verbose
+        self.served_files = 0
+        self.served_bytes = 0
+        self._index = (None, b"")
+        self._lock = threading.Lock()
+
+    def index(self):
+        """Servable file names, one per line; rebuilt only when a cache directory changed"""
+        stamps = []
+        for directory in self.directories:
+            try:
+                stamps.append(os.stat(directory).st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        with self._lock:
+            if self._index[0] == stamps:
+                return self._index[1]
+        names = []
+        for directory in self.directories:
+            try:
+                with os.scandir(directory) as entries:
+                    names.extend(entry.name for entry in entries if servable(entry.name) and entry.is_file())
+            except OSError:
+                continue
+        index = "\n".join(sorted(set(names))).encode('utf-8')
+        with self._lock:
+            self._index = (stamps, index)
+        return index
+
+    def count(self, size):
+        with self._lock:
+            self.served_files += 1
+            self.served_bytes += size
+
+
+def serve_cache(port=PEER_PORT, bind="", directories=None, verbose=False):
+    server = CacheServer((bind, port), directories, verbose)
+    print(f"Serving {', '.join(server.directories)} on http://{bind or '0.0.0.0'}:{server.server_address[1]}",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.served_files} files, {format_size(server.served_bytes)}")
+    return 0
+
+
+def peer_base(peer):
+    """'host', 'host:port' or a URL -> 'http://host:port'"""
+    if "://" not in peer:
+        peer = f"http://{peer}"
+    parts = urllib.parse.urlsplit(peer)
+    if parts.port is None:
+        parts = parts._replace(netloc=f"{parts.netloc}:{PEER_PORT}")
+    return urllib.parse.urlunsplit(parts._replace(path=parts.path.rstrip('/'))).rstrip('/')
+
+
+def _open(url, timeout):
+    return urllib.request.urlopen(urllib.request.Request(url, headers={"User-Agent": "arch-update-gui"}),
+                                  timeout=timeout)
+
+
+def peer_index(peer, timeout=PEER_TIMEOUT):
+    """Set of file names a peer serves; raises OSError when it is unreachable"""
+    with _open(peer_base(peer) + INDEX_PATH, timeout) as response:
+        return set(response.read().decode('utf-8', 'replace').split())
+
+
+def fetch_package(url, path, size, sha256, timeout=PEER_TIMEOUT, progress=None, cancel=None):
+    """Download url to path and verify it; return the byte count
+
+    Raises PeerError when size or SHA-256 do not match, OSError on
+    connection trouble and Cancelled once the cancel Event is set. path is
+    only created for a verified download.
+    """
+    tmp_path = path + ".part"
+    digest = hashlib.sha256()
+    done = 0
+    try:
+        with _open(url, timeout) as response, open(tmp_path, 'wb') as f:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise Cancelled(url)
+                chunk = response.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                done += len(chunk)
+                if size and done > size:
+                    raise PeerError(f"larger than the {size} bytes in the sync database")
+                digest.update(chunk)
+                f.write(chunk)
+                if progress:
+                    progress(done)
+        if size and done != size:
+            raise PeerError(f"{done} bytes, the sync database says {size}")
+        if digest.hexdigest() != sha256.lower():
+            raise PeerError("SHA-256 does not match the sync database")
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    os.replace(tmp_path, path)
+    return done
+
+
+def fetch_from_peers(packages, peers, dest, cached_in=None, workers=PEER_WORKERS, timeout=PEER_TIMEOUT,
+                     tracker=None, cancel=None):
+    """Fetch SyncPackages from the first peer that has them into dest
+
+    Packages already in the cached_in directories (the pacman cache by
+    default) and packages without a SHA-256 in the sync database are left
+    to pacman. Progress goes to tracker, a TransferTracker, under the names
+    pacman uses for its own download lines.
+    """
+    started = time.monotonic()
+    cached_in = [PACMAN_CACHE_DIR] if cached_in is None else cached_in
+    wanted = {}
+    for package in packages:
+        if not package.filename or not package.sha256:
+            continue
+        if any(os.path.exists(os.path.join(directory, package.filename)) for directory in cached_in):
+            continue
+        wanted[package.filename] = package
+    if not wanted or not peers:
+        return PeerReport({}, 0, sorted(wanted), {}, {}, time.monotonic() - started)
+
+    def index_or_error(peer):
+        try:
+            return peer_index(peer, timeout), None
+        except (OSError, ValueError) as e:
+            return None, str(getattr(e, "reason", e))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(peers)))) as pool:
+        indexes = list(pool.map(index_or_error, peers))
+    errors = {peer: error for peer, (_, error) in zip(peers, indexes) if error}
+    available = [(peer, index) for peer, (index, _) in zip(peers, indexes) if index is not None]
+    os.makedirs(dest, exist_ok=True)
+
+    def fetch(package):
+        """(file name, peer or None, bytes, rejection reason or None)"""
+        file_name = package.filename
+        label = download_label(file_name)
+        progress = (lambda done: tracker.update(label, done, package.csize or None)) if tracker else None
+        rejection = None
+        for peer, index in available:
+            if file_name not in index:
+                continue
+            url = f"{peer_base(peer)}/{urllib.parse.quote(file_name)}"
+            try:
+                size = fetch_package(url, os.path.join(dest, file_name), package.csize, package.sha256,
+                                     timeout, progress, cancel)
+            except PeerError as e:
+                rejection = f"{peer}: {e}"
+                continue
+            except (OSError, ValueError) as e:
+                rejection = f"{peer}: {getattr(e, 'reason', e)}"
+                continue
+            if tracker:
+                tracker.finish(label)
+            return file_name, peer, size, None
+        return file_name, None, 0, rejection
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        outcomes = list(pool.map(fetch, wanted.values()))
+
+    fetched = {file_name: peer for file_name, peer, _, _ in outcomes if peer}
+    return PeerReport(
+        fetched=fetched,
+        downloaded=sum(size for _, _, size, _ in outcomes),
+        missing=sorted(file_name for file_name, peer, _, rejection in outcomes if not peer and not rejection),
+        rejected={file_name: rejection for file_name, _, _, rejection in outcomes if rejection},
+        errors=errors,
+        elapsed=time.monotonic() - started,
+    )
+
+
+def describe_peers(report):
+    """'12 packages (340.2 MiB) from 2 peers in 4s, 3 not on any peer'"""
+    peers = set(report.fetched.values())
+    text = (f"{len(report.fetched)} packages ({format_size(report.downloaded)}) from {len(peers)} "
+            f"peer{'s' if len(peers) != 1 else ''} in {format_duration(report.elapsed)}")
+    if report.missing:
+        text += f", {len(report.missing)} not on any peer"
+    if report.rejected:
+        text += f", {len(report.rejected)} rejected"
+    return text
+
+
+def install_packages_command(paths, cache_dir=PACMAN_CACHE_DIR):
+    """Privileged copy of verified downloads into pacman's cache, where it looks before downloading"""
+    return [SUDO_CMD, '-n', 'install', '-m', '644', '-t', cache_dir] + list(paths)
+
+
+def main(argv=None):
+    from .resolver import find_sync_dir, load_dependency_graph
+
+    parser = argparse.ArgumentParser(prog="python -m archupdate.peers",
+                                     description="Fetch packages from LAN peers, verified against the sync database")
+    parser.add_argument("--peer", action="append", required=True, help="peer URL or host[:port]; repeatable")
+    parser.add_argument("--dest", default=".", help="directory to download into (default: current)")
+    parser.add_argument("--sync-dir", help="sync databases with the checksums (default: the checked copy)")
+    parser.add_argument("packages", nargs="+", help="package names")
+    args = parser.parse_args(argv)
+
+    graph = load_dependency_graph(args.packages, args.sync_dir or find_sync_dir())
+    unknown = [name for name in args.packages if name not in graph]
+    if unknown:
+        print(f"Not in the sync databases: {', '.join(unknown)}")
+    report = fetch_from_peers(graph.packages.values(), args.peer, args.dest, cached_in=[args.dest])
+    print(describe_peers(report))
+    for file_name, peer in sorted(report.fetched.items()):
+        print(f"  {file_name} from {peer}")
+    for file_name, reason in sorted(report.rejected.items()):
+        print(f"  Rejected {file_name}: {reason}")
+    for peer, error in report.errors.items():
+        print(f"Failed to reach {peer}: {error}")
+    return 0 if report.fetched or not (report.missing or report.rejected) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import re
+import time
+
+from .formatting import format_duration
+
+# pacman output line -> transaction phase; the first match wins
+PHASE_PATTERNS = [
+    ("sync", re.compile(r"^:: Synchroni[sz]ing package databases")),
+    ("resolve", re.compile(r"^(:: Starting full system upgrade|resolving dependencies)")),
+    ("download", re.compile(r"^:: Retrieving packages")),
+    # '(1/5) checking keys in keyring' on a terminal, 'checking keyring...' when piped
+    ("verify", re.compile(r"^(\(\s*\d+/\d+\) )?(checking keys in keyring|checking keyring|checking package integrity|"
+                          r"loading package files|checking for file conflicts|checking available disk space)")),
+    ("pre-hooks", re.compile(r"^:: Running pre-transaction hooks")),
+    ("packages", re.compile(r"^:: Processing package changes")),
+    ("post-hooks", re.compile(r"^:: Running post-transaction hooks")),
+]
+HOOK_PHASES = ("pre-hooks", "post-hooks")
+# '(3/7) Updating linux initcpios...'
+_HOOK_RE = re.compile(r"^\(\s*(\d+)/(\d+)\) (.+?)\.*$")
+
+PHASE_LABELS = {
+    "sync": "Synchronizing databases",
+    "resolve": "Resolving dependencies",
+    "download": "Downloading packages",
+    "verify": "Checking packages",
+    "pre-hooks": "Running pre-transaction hooks",
+    "packages": "Installing packages",
+    "post-hooks": "Running post-transaction hooks",
+}
+
+
+class TransactionTimer:
+    """Timestamps pacman transaction phases and individual hooks from its output
+
+    Output is fed in arbitrary chunks; only complete lines are parsed. A
+    phase or hook ends when the next one starts or finish() is called.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.records = []
+        self._buffer = ""
+        self._phase = None
+        self._hook = None
+
+    def _close(self, record, now):
+        if record is not None:
+            record['duration'] = now - self.started - record['start']
+
+    def _open(self, kind, phase, name, now):
+        record = {'kind': kind, 'phase': phase, 'name': name, 'start': now - self.started, 'duration': None}
+        self.records.append(record)
+        return record
+
+    def feed(self, data, now=None):
+        """Parse a chunk of output, return [(kind, name, detail)] for new phases and hooks"""
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split('\n')
+        events = []
+        for line in lines:
+            event = self.feed_line(line.strip(), now)
+            if event:
+                events.append(event)
+        return events
+
+    def feed_line(self, line, now=None):
+        now = self.clock() if now is None else now
+        for phase, pattern in PHASE_PATTERNS:
+            if pattern.match(line):
+                if self._phase is not None and self._phase['name'] == phase:
+                    return None
+                self._close(self._hook, now)
+                self._close(self._phase, now)
+                self._hook = None
+                self._phase = self._open("phase", phase, phase, now)
+                return ("phase", phase, PHASE_LABELS[phase])
+
+        if self._phase is None or self._phase['name'] not in HOOK_PHASES:
+            return None
+        match = _HOOK_RE.match(line)
+        if not match:
+            return None
+        self._close(self._hook, now)
+        self._hook = self._open("hook", self._phase['name'], match.group(3), now)
+        return ("hook", match.group(3), f"{match.group(1)}/{match.group(2)}")
+
+    def finish(self, now=None):
+        """Close whatever is still running, return all records"""
+        now = self.clock() if now is None else now
+        if self._buffer.strip():
+            self.feed_line(self._buffer.strip(), now)
+            self._buffer = ""
+        self._close(self._hook, now)
+        self._close(self._phase, now)
+        self._hook = self._phase = None
+        return self.records
+
+    @property
+    def phase(self):
+        """Name of the phase in progress, None before the first one"""
+        return self._phase['name'] if self._phase is not None else None
+
+    def hooks(self):
+        return [record for record in self.records if record['kind'] == "hook"]
+
+    def phase_durations(self):
+        return [(record['name'], record['duration']) for record in self.records
+                if record['kind'] == "phase" and record['duration'] is not None]
+
+    def summary(self, slowest=3):
+        """Log lines with the phase durations and the slowest hooks"""
+        phases = self.phase_durations()
+        if not phases:
+            return []
+        lines = ["Transaction phases: " + ", ".join(f"{name} {format_duration(duration)}" for name, duration in phases)]
+        hooks = sorted((record for record in self.hooks() if record['duration'] is not None),
+                       key=lambda record: record['duration'], reverse=True)
+        if hooks:
+            lines.append("Slowest hooks: " + ", ".join(
+                f"{record['name']} {format_duration(record['duration'])}" for record in hooks[:slowest]
+            ))
+        return lines
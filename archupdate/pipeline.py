@@ -0,0 +1,187 @@
+"""Stages of an update run, persisted so an interrupted run can resume
+
+    check -> plan -> snapshot -> download -> install -> aur -> verify -> record
+
+The state is written to PIPELINE_STATE_FILE at every transition and
+removed once the run is recorded in the history, so a file left behind
+means the run was interrupted (crash, logout, power loss). Resuming starts
+at the first stage that is neither done nor skipped:
+
+    snapshot  -- taken again; a finished one is kept with the run
+    download  -- peer fetch and pacman again; packages already in the cache
+                 are not downloaded twice, the databases pacman used are kept
+    install   -- pacman on the same targets without -y, so nothing is
+                 resolved against newer databases than the plan
+    aur       -- yay on the same packages
+    verify    -- the local database is compared with the planned versions
+    record    -- the run is written to the history
+
+    python -m archupdate.pipeline              # show an interrupted run
+    python -m archupdate.pipeline --discard    # forget it
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+from .config import PIPELINE_STATE_FILE, LOCAL_DB_DIR
+from .cache import vercmp
+from .resolver import parse_pending_line
+
+STAGES = ("check", "plan", "snapshot", "download", "install", "aur", "verify", "record")
+STAGE_LABELS = {
+    "check": "Checking for updates",
+    "plan": "Selecting packages",
+    "snapshot": "Creating snapshot",
+    "download": "Downloading packages",
+    "install": "Installing packages",
+    "aur": "Building AUR packages",
+    "verify": "Verifying installed versions",
+    "record": "Recording the update",
+}
+PENDING, RUNNING, DONE, SKIPPED = "pending", "running", "done", "skipped"
+
+
+class UpdatePipeline:
+    """Stage statuses and the data later stages need, saved on every change
+
+    data holds what a resumed run cannot recompute: the pending lists of
+    the check, the planned targets, the start time, the snapshot and the
+    sync flag pacman ran with. Without a path nothing is written, as for
+    replayed runs.
+    """
+
+    def __init__(self, path=None, stages=None, data=None, created=None):
+        self.path = path
+        self.created = created or time.time()
+        self.stages = stages or {stage: {"status": PENDING} for stage in STAGES}
+        self.data = data or {}
+
+    def status(self, stage):
+        return self.stages[stage]["status"]
+
+    def begin(self, stage):
+        self.stages[stage] = {"status": RUNNING, "started": time.time()}
+        self.save()
+
+    def complete(self, stage, **data):
+        entry = self.stages[stage]
+        entry.update(status=DONE, finished=time.time())
+        self.data.update(data)
+        self.save()
+
+    def skip(self, stage):
+        self.stages[stage] = {"status": SKIPPED}
+        self.save()
+
+    def note(self, **data):
+        """Store data a resumed stage needs while the stage is still running"""
+        self.data.update(data)
+        self.save()
+
+    def next_stage(self):
+        """First stage still to run, None once all are done or skipped"""
+        for stage in STAGES:
+            if self.status(stage) not in (DONE, SKIPPED):
+                return stage
+        return None
+
+    def save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"created": self.created, "stages": self.stages, "data": self.data}, f, indent=2)
+        # A crash mid-write leaves the previous state, never half of one
+        os.replace(tmp_path, self.path)
+
+    def discard(self):
+        if self.path is None:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def load_pipeline(path=None):
+    """Interrupted run left in path (PIPELINE_STATE_FILE), or None"""
+    path = path or PIPELINE_STATE_FILE
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+        pipeline = UpdatePipeline(path, state["stages"], state["data"], state["created"])
+        # States from a version with other stages cannot be resumed safely
+        if set(pipeline.stages) != set(STAGES):
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    # Without a plan there is nothing to resume; the check itself is cached separately
+    if pipeline.status("plan") != DONE or pipeline.next_stage() is None:
+        return None
+    return pipeline
+
+
+def describe_pipeline(pipeline):
+    """Log lines: when the run started and the status of every stage"""
+    started = datetime.fromtimestamp(pipeline.data.get("started") or pipeline.created)
+    lines = [f"Update started {started.strftime('%Y-%m-%d %H:%M:%S')}, "
+             f"resumes at: {STAGE_LABELS[pipeline.next_stage()].lower()}"]
+    for stage in STAGES:
+        entry = pipeline.stages[stage]
+        when = entry.get("finished") or entry.get("started")
+        stamp = f" {datetime.fromtimestamp(when).strftime('%H:%M:%S')}" if when else ""
+        lines.append(f"  {stage:<9} {entry['status']}{stamp}")
+    return lines
+
+
+def installed_versions(local_db=LOCAL_DB_DIR):
+    """{name: version} from the 'name-pkgver-pkgrel' directories of pacman's local database"""
+    versions = {}
+    try:
+        with os.scandir(local_db) as entries:
+            for entry in entries:
+                parts = entry.name.rsplit('-', 2)
+                if len(parts) == 3 and entry.is_dir():
+                    versions[parts[0]] = f"{parts[1]}-{parts[2]}"
+    except OSError:
+        pass
+    return versions
+
+
+def verify_versions(pending_lines, local_db=LOCAL_DB_DIR):
+    """[(name, planned, installed or None)] of the 'name old -> new' lines not installed at new or later"""
+    installed = installed_versions(local_db)
+    missing = []
+    for pkg_line in pending_lines:
+        name, planned = parse_pending_line(pkg_line)
+        if not name or not planned:
+            continue
+        version = installed.get(name)
+        if version is None or vercmp(version, planned) < 0:
+            missing.append((name, planned, version))
+    return missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m archupdate.pipeline", description="Interrupted update runs")
+    parser.add_argument("--state", help=f"state file (default {PIPELINE_STATE_FILE})")
+    parser.add_argument("--discard", action="store_true", help="forget the interrupted run")
+    args = parser.parse_args(argv)
+
+    pipeline = load_pipeline(args.state)
+    if pipeline is None:
+        print("No interrupted update")
+        return 0
+    print("\n".join(describe_pipeline(pipeline)))
+    if args.discard:
+        pipeline.discard()
+        print("Discarded")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
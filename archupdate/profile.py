@@ -0,0 +1,163 @@
+import os
+import json
+import time
+from datetime import datetime
+
+from .config import CONFIG_DIR
+from .formatting import format_duration
+
+PROFILE_DIR = os.path.join(CONFIG_DIR, "profiles")
+# Older profiles are pruned when a new one is saved
+PROFILE_KEEP = 100
+
+WATERFALL_WIDTH = 40
+_NAME_WIDTH = 32
+
+
+class RunProfile:
+    """Monotonic timing spans of one check or update run
+
+    Spans are kept relative to the run's start, so the profile is immune
+    to clock changes and maps directly onto a Chrome trace timeline.
+    Spans timed elsewhere (pacman phases, per-package durations) are
+    added afterwards with their monotonic start and end.
+    """
+
+    def __init__(self, kind, clock=time.monotonic):
+        self.kind = kind
+        self.clock = clock
+        self.origin = clock()
+        self.started = time.time()
+        self.duration = None
+        self.status = None
+        self.spans = []
+        self._open = {}
+
+    def begin(self, name, category="stage", **args):
+        self.end(name)
+        span = {'name': name, 'category': category, 'start': self.clock() - self.origin, 'end': None, 'args': args}
+        self.spans.append(span)
+        self._open[name] = span
+
+    def end(self, name, **args):
+        span = self._open.pop(name, None)
+        if span is not None:
+            span['end'] = self.clock() - self.origin
+            span['args'].update(args)
+
+    def add(self, name, category, start, end, **args):
+        """Record a span measured on the same monotonic clock"""
+        self.spans.append({'name': name, 'category': category, 'start': start - self.origin,
+                           'end': end - self.origin, 'args': args})
+
+    def finish(self, status=None):
+        """Close spans still running and fix the total duration"""
+        for name in list(self._open):
+            self.end(name)
+        self.duration = self.clock() - self.origin
+        self.status = status
+        return self
+
+    def to_dict(self):
+        return {'kind': self.kind, 'started': self.started, 'duration': self.duration,
+                'status': self.status, 'spans': self.spans}
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls(data['kind'])
+        profile.origin = 0
+        profile.started = data['started']
+        profile.duration = data.get('duration')
+        profile.status = data.get('status')
+        profile.spans = data.get('spans', [])
+        return profile
+
+    def chrome_trace(self):
+        """Trace Event Format document for chrome://tracing and Perfetto
+
+        Each category becomes its own track so nested stages (phases,
+        hooks, packages inside the pacman run) do not overlap.
+        """
+        tracks = {}
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1,
+                   'args': {'name': f"Arch Update {self.kind} {datetime.fromtimestamp(self.started):%Y-%m-%d %H:%M:%S}"}}]
+        for span in self.spans:
+            if span['end'] is None:
+                continue
+            tid = tracks.setdefault(span['category'], len(tracks) + 1)
+            events.append({'name': span['name'], 'cat': span['category'], 'ph': 'X', 'pid': 1, 'tid': tid,
+                           'ts': round(span['start'] * 1e6), 'dur': round((span['end'] - span['start']) * 1e6),
+                           'args': span['args']})
+        events.extend({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': category}}
+                      for category, tid in tracks.items())
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def waterfall(self, width=WATERFALL_WIDTH):
+        """Text waterfall of the spans, one line each, in start order"""
+        total = self.duration or max((span['end'] or 0 for span in self.spans), default=0)
+        if not self.spans or total <= 0:
+            return []
+        lines = [f"Timing profile ({self.kind}, {format_duration(total)})"]
+        for span in sorted(self.spans, key=lambda span: span['start']):
+            if span['end'] is None:
+                continue
+            first = int(span['start'] / total * width)
+            last = max(first + 1, int(round(span['end'] / total * width)))
+            bar = " " * first + "█" * (min(last, width) - first)
+            name = span['name'] if span['category'] == "stage" else f"  {span['name']}"
+            if len(name) > _NAME_WIDTH:
+                name = name[:_NAME_WIDTH - 1] + "…"
+            lines.append(f"{name:<{_NAME_WIDTH}} |{bar:<{width}}| {span['end'] - span['start']:7.1f}s")
+        return lines
+
+    def stage_totals(self):
+        """{stage name: seconds} of the top-level stages"""
+        totals = {}
+        for span in self.spans:
+            if span['category'] == "stage" and span['end'] is not None:
+                totals[span['name']] = totals.get(span['name'], 0) + span['end'] - span['start']
+        return totals
+
+
+def save_profile(profile, directory=None, keep=PROFILE_KEEP):
+    """Write a finished profile to the profile directory, return its path"""
+    directory = directory or PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    started = datetime.fromtimestamp(profile.started)
+    # Milliseconds keep two runs of one second apart; 'x' keeps even two of one millisecond
+    stamp = f"{started:%Y%m%d-%H%M%S}-{started.microsecond // 1000:03d}"
+    attempt = 0
+    while True:
+        suffix = f".{attempt}" if attempt else ""
+        path = os.path.join(directory, f"{stamp}{suffix}-{profile.kind}.json")
+        try:
+            with open(path, 'x') as f:
+                json.dump(profile.to_dict(), f, indent=2)
+            break
+        except FileExistsError:
+            attempt += 1
+    for old in sorted(name for name in os.listdir(directory) if name.endswith(".json"))[:-keep]:
+        os.remove(os.path.join(directory, old))
+    return path
+
+
+def load_profiles(limit=20, directory=None):
+    """Most recent saved profiles first"""
+    directory = directory or PROFILE_DIR
+    try:
+        names = sorted((name for name in os.listdir(directory) if name.endswith(".json")), reverse=True)
+    except OSError:
+        return []
+    profiles = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(directory, name), 'r') as f:
+                profiles.append(RunProfile.from_dict(json.load(f)))
+        except (OSError, ValueError, KeyError):
+            continue
+    return profiles
+
+
+def export_profile(profile, path, chrome_trace=False):
+    with open(path, 'w') as f:
+        json.dump(profile.chrome_trace() if chrome_trace else profile.to_dict(), f, indent=2)
@@ -0,0 +1,176 @@
+"""Recorded process transcripts for replaying sudo/pacman/yay without running them
+
+A transcript is JSON lines: a header with the command, then one event per
+output read with its offset in seconds, then the exit code:
+
+    {"command": ["pacman", "-Syu", "--noconfirm"], "recorded": 1705312000.0}
+    {"t": 0.012, "out": ":: Synchronizing package databases...\\n"}
+    {"t": 0.250, "err": "warning: ...\\n"}
+    {"t": 12.5, "exit": 0}
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import selectors
+import subprocess
+from collections import namedtuple
+
+Recording = namedtuple("Recording", ["command", "events", "exit_code", "duration"])
+Recording.__doc__ = """One recorded process run
+
+command   -- normalized argv, see normalize_command()
+events    -- [(seconds, 'out' | 'err', text)] in order
+exit_code -- exit status of the process
+duration  -- seconds from start to exit
+"""
+
+# Privilege wrappers are not part of what a recording is matched on
+_WRAPPERS = {"sudo", "pkexec"}
+_WRAPPER_FLAGS = {"-n", "-S", "-E", "-v", "--"}
+
+
+def normalize_command(program, args=()):
+    """[program basename, args...] without a leading sudo/pkexec"""
+    argv = [program] + list(args)
+    while argv and os.path.basename(argv[0]) in _WRAPPERS:
+        argv = argv[1:]
+        while argv and argv[0] in _WRAPPER_FLAGS:
+            argv = argv[1:]
+    if argv:
+        argv[0] = os.path.basename(argv[0])
+    return argv
+
+
+def load_recording(path):
+    command, events, exit_code, duration = [], [], 0, 0.0
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "command" in entry:
+                command = entry["command"]
+            elif "exit" in entry:
+                exit_code, duration = entry["exit"], entry["t"]
+            else:
+                fd = "out" if "out" in entry else "err"
+                events.append((entry["t"], fd, entry[fd]))
+    duration = max(duration, events[-1][0] if events else 0.0)
+    return Recording(command, events, exit_code, duration)
+
+
+def save_recording(recording, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps({"command": recording.command, "recorded": time.time()}) + "\n")
+        for offset, fd, text in recording.events:
+            f.write(json.dumps({"t": round(offset, 6), fd: text}) + "\n")
+        f.write(json.dumps({"t": round(recording.duration, 6), "exit": recording.exit_code}) + "\n")
+    os.replace(tmp_path, path)
+
+
+class RecordingLibrary:
+    """Transcripts of a directory, looked up by the command being started
+
+    A recording matches when its command is a prefix of the started one,
+    so a recording of ["pacman"] answers every pacman call while one of
+    ["pacman", "-Syu"] only answers full upgrades. The longest match wins.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.recordings = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".jsonl"):
+                try:
+                    self.recordings.append(load_recording(os.path.join(directory, name)))
+                except (OSError, ValueError, KeyError, IndexError) as e:
+                    print(f"Failed to load recording {name}: {e}")
+
+    def find(self, program, args=()):
+        argv = normalize_command(program, args)
+        best = None
+        for recording in self.recordings:
+            if recording.command and argv[:len(recording.command)] == recording.command:
+                if best is None or len(recording.command) > len(best.command):
+                    best = recording
+        return best
+
+
+def schedule(recording, speed=1.0):
+    """[(delay from start, fd, text)] for replaying at speed; 0 means as fast as possible"""
+    if not speed:
+        return [(0.0, fd, text) for _, fd, text in recording.events]
+    return [(offset / speed, fd, text) for offset, fd, text in recording.events]
+
+
+def record_command(argv, path):
+    """Run argv with pipes, as the GUI does, and save what it printed with timing"""
+    started = time.monotonic()
+    events = []
+    process = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    selector = selectors.DefaultSelector()
+    selector.register(process.stdout, selectors.EVENT_READ, "out")
+    selector.register(process.stderr, selectors.EVENT_READ, "err")
+    open_pipes = 2
+    while open_pipes:
+        for key, _ in selector.select():
+            data = os.read(key.fileobj.fileno(), 65536)
+            if not data:
+                selector.unregister(key.fileobj)
+                open_pipes -= 1
+                continue
+            events.append((time.monotonic() - started, key.data, data.decode('utf-8', 'replace')))
+            # Echo so recording an interactive run still shows its progress
+            (sys.stdout if key.data == "out" else sys.stderr).write(events[-1][2])
+    exit_code = process.wait()
+    recording = Recording(normalize_command(argv[0], argv[1:]), events, exit_code, time.monotonic() - started)
+    save_recording(recording, path)
+    return recording
+
+
+def recording_from_text(command, text, line_delay=0.001, exit_code=0):
+    """Turn plain captured output into a transcript with even pacing"""
+    lines = text.splitlines(keepends=True)
+    events = [(i * line_delay, "out", line) for i, line in enumerate(lines)]
+    return Recording(normalize_command(command[0], command[1:]), events, exit_code, len(lines) * line_delay)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m archupdate.replay", description="Record process transcripts")
+    commands = parser.add_subparsers(dest="action", required=True)
+    record = commands.add_parser("record", help="run a command and record its output")
+    record.add_argument("-o", "--output", required=True, help="transcript file (.jsonl)")
+    record.add_argument("argv", nargs=argparse.REMAINDER, help="command to run, after --")
+    text = commands.add_parser("from-text", help="convert captured plain output to a transcript")
+    text.add_argument("-o", "--output", required=True, help="transcript file (.jsonl)")
+    text.add_argument("--command", required=True, help="command the output belongs to, e.g. 'pacman -Syu'")
+    text.add_argument("--exit", type=int, default=0, help="exit code to replay (default 0)")
+    text.add_argument("--line-delay", type=float, default=0.001, help="seconds between lines (default 0.001)")
+    text.add_argument("file", help="text file with the output")
+    show = commands.add_parser("show", help="summarize transcripts")
+    show.add_argument("files", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.action == "record":
+        command = args.argv[1:] if args.argv[:1] == ["--"] else args.argv
+        if not command:
+            parser.error("record needs a command after --")
+        return record_command(command, args.output).exit_code
+    if args.action == "from-text":
+        with open(args.file, 'r') as f:
+            recording = recording_from_text(args.command.split(), f.read(), args.line_delay, args.exit)
+        save_recording(recording, args.output)
+        return 0
+    for path in args.files:
+        recording = load_recording(path)
+        size = sum(len(text) for _, _, text in recording.events)
+        print(f"{path}: {' '.join(recording.command)}  {len(recording.events)} reads, {size} bytes, "
+              f"{recording.duration:.1f}s, exit {recording.exit_code}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
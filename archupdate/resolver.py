@@ -0,0 +1,193 @@
+import os
+import re
+import tarfile
+from collections import deque, namedtuple
+
+from .config import SYNC_DB_DIR, CHECKUPDATES_DB
+
+_DEP_NAME_RE = re.compile(r'^([^<>=:]+)')
+
+Resolution = namedtuple("Resolution", ["selected", "closure", "pulled_in", "hazards"])
+Resolution.__doc__ = """Outcome of resolving a selection against the dependency graph
+
+selected  -- the names the user picked that are known pending packages
+closure   -- every pending package the transaction has to contain
+pulled_in -- {name: dependant} for packages added to satisfy a dependency
+hazards   -- [(dependant, name)] pending packages left behind although they
+             were built against a package in the closure (partial upgrade)
+"""
+
+
+def dependency_name(dep):
+    """Strip the version constraint and description from a dependency string"""
+    dep = dep.strip()
+    match = _DEP_NAME_RE.match(dep)
+    return match.group(1).strip() if match else dep
+
+
+def parse_pending_line(pkg_line):
+    """Split a 'name old -> new' line into (name, new_version)"""
+    parts = pkg_line.split()
+    if not parts:
+        return "", ""
+    return parts[0], parts[-1] if len(parts) > 1 else ""
+
+
+def parse_desc(text):
+    """Parse a pacman desc file into {'%FIELD%': [values]}"""
+    fields = {}
+    current = None
+    for line in text.splitlines():
+        if not line:
+            current = None
+        elif line.startswith('%') and line.endswith('%'):
+            current = fields.setdefault(line, [])
+        elif current is not None:
+            current.append(line)
+    return fields
+
+
+class SyncPackage:
+    __slots__ = ("name", "version", "repo", "depends", "provides", "csize", "isize", "filename", "sha256")
+
+    def __init__(self, name, version, repo, depends=(), provides=(), csize=0, isize=0, filename="", sha256=""):
+        self.name = name
+        self.version = version
+        self.repo = repo
+        self.depends = tuple(depends)
+        self.provides = tuple(provides)
+        self.csize = csize
+        self.isize = isize
+        self.filename = filename
+        self.sha256 = sha256
+
+    @classmethod
+    def from_desc(cls, fields, repo):
+        return cls(
+            fields.get('%NAME%', [''])[0],
+            fields.get('%VERSION%', [''])[0],
+            repo,
+            (dependency_name(d) for d in fields.get('%DEPENDS%', [])),
+            (dependency_name(p) for p in fields.get('%PROVIDES%', [])),
+            int(fields.get('%CSIZE%', ['0'])[0] or 0),
+            int(fields.get('%ISIZE%', ['0'])[0] or 0),
+            fields.get('%FILENAME%', [''])[0],
+            fields.get('%SHA256SUM%', [''])[0]
+        )
+
+
+def find_sync_dir():
+    """Prefer the checkupdates database copy, fall back to pacman's own"""
+    checkup_sync = os.path.join(CHECKUPDATES_DB, "sync")
+    try:
+        if any(f.endswith(".db") for f in os.listdir(checkup_sync)):
+            return checkup_sync
+    except OSError:
+        pass
+    return SYNC_DB_DIR
+
+
+def read_sync_db(path, wanted=None):
+    """Yield SyncPackage entries of one repo database
+
+    Entries whose name is not in ``wanted`` are skipped from the tar member
+    name alone, so only the pending packages are ever decompressed and parsed.
+    """
+    repo = os.path.basename(path)[:-len(".db")] if path.endswith(".db") else os.path.basename(path)
+    entries = {}
+    with tarfile.open(path, "r:*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            entry_dir, _, filename = member.name.partition('/')
+            if filename not in ("desc", "depends"):
+                continue
+            if wanted is not None and entry_dir.rsplit('-', 2)[0] not in wanted:
+                continue
+            text = tar.extractfile(member).read().decode('utf-8', 'replace')
+            # Old databases keep %DEPENDS%/%PROVIDES% in a separate file
+            entries.setdefault(entry_dir, {}).update(parse_desc(text))
+    for fields in entries.values():
+        yield SyncPackage.from_desc(fields, repo)
+
+
+class DependencyGraph:
+    """Provides/depends index restricted to the pending packages
+
+    Edges are resolved once when the graph is built, so resolving a new
+    selection only walks the closure and stays cheap with 1000+ pending
+    packages.
+    """
+
+    def __init__(self, packages):
+        self.packages = {}
+        for pkg in packages:
+            self.packages.setdefault(pkg.name, pkg)
+
+        self.providers = {}
+        for pkg in self.packages.values():
+            self.providers.setdefault(pkg.name, set()).add(pkg.name)
+            for provided in pkg.provides:
+                self.providers.setdefault(provided, set()).add(pkg.name)
+
+        self.depends = {}
+        self.required_by = {name: set() for name in self.packages}
+        for pkg in self.packages.values():
+            targets = set()
+            for dep in pkg.depends:
+                # A real package of that name wins over virtual providers
+                if dep in self.packages:
+                    targets.add(dep)
+                else:
+                    targets.update(self.providers.get(dep, ()))
+            targets.discard(pkg.name)
+            self.depends[pkg.name] = frozenset(targets)
+            for target in targets:
+                self.required_by[target].add(pkg.name)
+
+    def __len__(self):
+        return len(self.packages)
+
+    def __contains__(self, name):
+        return name in self.packages
+
+    def resolve(self, selected):
+        """Compute the dependency closure of a selection and its hazards"""
+        selected = {name for name in selected if name in self.packages}
+        closure = set(selected)
+        pulled_in = {}
+        queue = deque(selected)
+        while queue:
+            name = queue.popleft()
+            for dep in self.depends[name]:
+                if dep not in closure:
+                    closure.add(dep)
+                    pulled_in[dep] = name
+                    queue.append(dep)
+
+        hazards = []
+        for name in closure:
+            for dependant in self.required_by[name]:
+                if dependant not in closure:
+                    hazards.append((dependant, name))
+        hazards.sort()
+        return Resolution(selected, closure, pulled_in, hazards)
+
+
+def load_dependency_graph(pending_lines, sync_dir=None):
+    """Build a DependencyGraph for checkupdates output lines"""
+    wanted = dict(parse_pending_line(line) for line in pending_lines if line.strip())
+    sync_dir = sync_dir or find_sync_dir()
+
+    found = {}
+    for db_name in sorted(os.listdir(sync_dir)):
+        if not db_name.endswith(".db"):
+            continue
+        try:
+            for pkg in read_sync_db(os.path.join(sync_dir, db_name), wanted):
+                # When several repos carry the package, keep the one checkupdates reported
+                if pkg.name not in found or pkg.version == wanted.get(pkg.name):
+                    found[pkg.name] = pkg
+        except (tarfile.TarError, OSError) as e:
+            print(f"Failed to read sync database {db_name}: {e}")
+    return DependencyGraph(found.values())
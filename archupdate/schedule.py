@@ -0,0 +1,133 @@
+import time
+import struct
+
+from .bus import Bus, DBusError
+
+LOGIND_SERVICE = "org.freedesktop.login1"
+LOGIND_PATH = "/org/freedesktop/login1"
+LOGIND_MANAGER = "org.freedesktop.login1.Manager"
+NM_SERVICE = "org.freedesktop.NetworkManager"
+NM_PATH = "/org/freedesktop/NetworkManager"
+
+NM_STATE_UNKNOWN = 0
+NM_STATE_CONNECTED_GLOBAL = 70
+
+# First retry after a failed check; doubles per failure up to the interval
+RETRY_BASE = 5 * 60
+# Give the network a moment to come back after resume
+RESUME_DELAY = 60
+
+
+def nm_online(state):
+    """NetworkManager state to connectivity; an unknown state does not block checks"""
+    return state == NM_STATE_UNKNOWN or state >= NM_STATE_CONNECTED_GLOBAL
+
+
+class CheckScheduler:
+    """Decides when the next automatic check runs
+
+    Times are wall-clock so a check that fell due while suspended is
+    noticed on resume. Checks wait for connectivity instead of failing,
+    and failed checks are retried with exponential backoff.
+    """
+
+    def __init__(self, interval, next_due=None):
+        self.interval = interval
+        self.failures = 0
+        self.online = True
+        self.sleeping = False
+        self.next_due = next_due if next_due is not None else time.time() + interval
+
+    def delay(self, now=None):
+        """Seconds until the next check, None while waiting for resume or connectivity"""
+        if self.sleeping or not self.online:
+            return None
+        return max(0.0, self.next_due - (now or time.time()))
+
+    def check_succeeded(self, now=None):
+        self.failures = 0
+        self.next_due = (now or time.time()) + self.interval
+
+    def check_failed(self, now=None):
+        self.failures += 1
+        backoff = min(self.interval, RETRY_BASE * 2 ** (self.failures - 1))
+        self.next_due = (now or time.time()) + backoff
+
+    def set_online(self, online):
+        self.online = online
+
+    def set_sleeping(self, sleeping, now=None):
+        self.sleeping = sleeping
+        if not sleeping:
+            # Catch up on a check missed during suspend once the network settled
+            self.next_due = max(self.next_due, (now or time.time()) + RESUME_DELAY)
+
+
+class SystemEvents:
+    """logind suspend/resume and NetworkManager connectivity from the system bus
+
+    Without a system bus (containers, other init systems) nothing is
+    reported and the scheduler behaves like a plain timer.
+    """
+
+    def __init__(self):
+        self.bus = None
+        try:
+            self.bus = Bus.system()
+            self.bus.add_match(sender=LOGIND_SERVICE, path=LOGIND_PATH,
+                               interface=LOGIND_MANAGER, member="PrepareForSleep")
+            self.bus.add_match(sender=NM_SERVICE, path=NM_PATH,
+                               interface=NM_SERVICE, member="StateChanged")
+        except (OSError, DBusError) as e:
+            print(f"Failed to watch suspend and network events: {e}")
+            self.close()
+
+    def fileno(self):
+        return self.bus.fileno() if self.bus is not None else -1
+
+    def close(self):
+        if self.bus is not None:
+            self.bus.close()
+            self.bus = None
+
+    def connectivity(self):
+        """True/False as reported by NetworkManager, None if it cannot tell"""
+        if self.bus is None:
+            return None
+        try:
+            return nm_online(self.bus.call(NM_SERVICE, NM_PATH, NM_SERVICE, "state")[0])
+        except DBusError:
+            # NetworkManager not installed or not running
+            return None
+        except (OSError, struct.error) as e:
+            print(f"Failed to query network state: {e}")
+            self.close()
+            return None
+
+    def poll(self):
+        """[('sleep', bool) or ('online', bool)] received since the last poll"""
+        if self.bus is None:
+            return []
+        try:
+            signals = self.bus.poll_signals()
+        except (OSError, DBusError, struct.error) as e:
+            print(f"Lost the system bus connection: {e}")
+            self.close()
+            return []
+        events = []
+        for signal in signals:
+            if signal.member == "PrepareForSleep" and signal.args:
+                events.append(("sleep", bool(signal.args[0])))
+            elif signal.member == "StateChanged" and signal.args:
+                events.append(("online", nm_online(signal.args[0])))
+        return events
+
+    def apply(self, scheduler, now=None):
+        """Feed new events into a CheckScheduler, return them"""
+        events = self.poll()
+        for event, value in events:
+            if event == "sleep":
+                scheduler.set_sleeping(value, now)
+            else:
+                scheduler.set_online(value)
+        return events
@@ -0,0 +1,339 @@
+"""Read-only system snapshots taken before an update, and rollback to them
+
+Backends are tried in order: snapper, timeshift, then a plain btrfs root.
+Each creates one snapshot through sudo -n (the update has just cached the
+credentials) and knows the command that rolls the system back to it.
+Rollback commands are interactive and meant to run in a terminal.
+
+    python -m archupdate.snapshots detect
+    python -m archupdate.snapshots --root /mnt/test create --keep 3
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import statistics
+from collections import namedtuple
+
+from .config import SUDO_CMD, SNAPSHOT_ROOT
+from .jobs import run_command, command_failed
+
+SNAPSHOT_DESCRIPTION = "arch-update-gui pre-update"
+# Snapshots estimated to take longer than this are skipped; see should_snapshot()
+SNAPSHOT_BUDGET = 15
+# Hard limit for one creation, however long the estimate
+SNAPSHOT_TIMEOUT = 300
+# Subdirectory of the btrfs root the plain btrfs backend puts its snapshots in
+BTRFS_SNAPSHOT_DIR = ".snapshots/arch-update"
+# Snapshots of the plain btrfs backend kept; older ones are deleted after each new one
+SNAPSHOT_KEEP = 5
+_BTRFS_NAME_RE = re.compile(r"^\d{8}-\d{6}$")
+TIMESHIFT_CONFIG = "/etc/timeshift/timeshift.json"
+
+Snapshot = namedtuple("Snapshot", ["backend", "id", "created", "duration"])
+Snapshot.__doc__ = """One snapshot taken before an update
+
+backend  -- 'snapper', 'timeshift' or 'btrfs'
+id       -- snapper number, timeshift name or btrfs subvolume path
+created  -- epoch seconds
+duration -- seconds the creation took
+"""
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _run(argv, timeout=SNAPSHOT_TIMEOUT):
+    result = run_command(argv, timeout)
+    error = command_failed(result)
+    if error:
+        raise SnapshotError(error)
+    return result.stdout
+
+
+def filesystem_type(path):
+    """Type of the filesystem path is on, from the longest matching /proc/mounts entry"""
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    try:
+        with open("/proc/mounts", 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mountpoint = fields[1].replace("\\040", " ")
+                inside = path == mountpoint or path.startswith(mountpoint.rstrip('/') + '/')
+                if inside and len(mountpoint) >= len(best):
+                    best, fstype = mountpoint, fields[2]
+    except OSError:
+        return None
+    return fstype
+
+
+def pinned_root_subvolume(cmdline="/proc/cmdline", fstab="/etc/fstab"):
+    """Where / is mounted by subvolume name or id ('subvol=@ in /etc/fstab'), or None
+
+    Rollbacks that make a copy the default subvolume only take effect when
+    the root is mounted through the default, as archinstall's '@' layout
+    does not.
+    """
+    try:
+        with open(cmdline, 'r') as f:
+            for arg in f.read().split():
+                if arg.startswith("rootflags="):
+                    for option in arg[len("rootflags="):].split(','):
+                        if option.startswith(("subvol=", "subvolid=")):
+                            return f"{option} in the kernel command line"
+    except OSError:
+        pass
+    try:
+        with open(fstab, 'r') as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split()
+                if len(fields) >= 4 and fields[1] == "/":
+                    for option in fields[3].split(','):
+                        if option.startswith(("subvol=", "subvolid=")):
+                            return f"{option} in {fstab}"
+    except OSError:
+        pass
+    return None
+
+
+def _pinned_problem():
+    pinned = pinned_root_subvolume()
+    if pinned is None:
+        return None
+    return (f"The root filesystem is mounted by subvolume ({pinned}), so changing the default subvolume "
+            "does nothing after a reboot. Restore by hand instead: mount the top-level subvolume "
+            "(subvolid=5), move the current root subvolume aside, snapshot the saved one in its place "
+            "under the same name, then reboot.")
+
+
+class SnapperBackend:
+    name = "snapper"
+    # Seconds assumed before any creation was measured
+    default_estimate = 2.0
+
+    def __init__(self, root="/", config="root"):
+        self.root = root
+        self.config = config
+
+    def available(self):
+        return (self.root == "/" and shutil.which("snapper") is not None
+                and os.path.exists(f"/etc/snapper/configs/{self.config}"))
+
+    def create(self, description=SNAPSHOT_DESCRIPTION, timeout=SNAPSHOT_TIMEOUT):
+        # snapper snapshots of btrfs are read-only unless --read-write is given
+        output = _run([SUDO_CMD, '-n', 'snapper', '-c', self.config, 'create', '--type', 'single',
+                       '--cleanup-algorithm', 'number', '--description', description, '--print-number'], timeout)
+        number = output.strip().splitlines()[-1].strip() if output.strip() else ""
+        if not number.isdigit():
+            raise SnapshotError(f"snapper printed no snapshot number: {output.strip()!r}")
+        return number
+
+    def rollback_command(self, snapshot_id):
+        return [SUDO_CMD, 'snapper', '-c', self.config, 'rollback', str(snapshot_id)]
+
+    def rollback_problem(self, snapshot_id):
+        """Why rollback_command would not restore the snapshot, or None; snapper rolls back by set-default"""
+        return _pinned_problem() if self.root == "/" else None
+
+    def describe(self, snapshot_id):
+        return f"snapper #{snapshot_id}"
+
+
+class TimeshiftBackend:
+    name = "timeshift"
+    default_estimate = 2.0
+    # rsync mode copies the whole system
+    rsync_estimate = 300.0
+    _NAME_RE = re.compile(r"(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})")
+
+    def __init__(self, root="/"):
+        self.root = root
+
+    def available(self):
+        return self.root == "/" and shutil.which("timeshift") is not None and os.path.exists(TIMESHIFT_CONFIG)
+
+    def btrfs_mode(self):
+        try:
+            with open(TIMESHIFT_CONFIG, 'r') as f:
+                return str(json.load(f).get("btrfs_mode", "false")).lower() == "true"
+        except (OSError, ValueError):
+            return False
+
+    @property
+    def estimate(self):
+        return self.default_estimate if self.btrfs_mode() else self.rsync_estimate
+
+    def create(self, description=SNAPSHOT_DESCRIPTION, timeout=SNAPSHOT_TIMEOUT):
+        output = _run([SUDO_CMD, '-n', 'timeshift', '--create', '--comments', description, '--tags', 'O',
+                       '--scripted'], timeout)
+        # 'Tagged snapshot '2024-01-15_10-00-00': ondemand'
+        names = self._NAME_RE.findall(output)
+        if not names:
+            raise SnapshotError(f"timeshift printed no snapshot name: {output.strip()[-200:]!r}")
+        return names[-1]
+
+    def rollback_command(self, snapshot_id):
+        return [SUDO_CMD, 'timeshift', '--restore', '--snapshot', str(snapshot_id)]
+
+    def rollback_problem(self, snapshot_id):
+        # timeshift swaps the subvolumes themselves, whatever the mount options
+        return None
+
+    def describe(self, snapshot_id):
+        return f"timeshift {snapshot_id}"
+
+
+class BtrfsBackend:
+    """Read-only snapshot of a btrfs root subvolume, without a snapshot manager"""
+    name = "btrfs"
+    default_estimate = 1.0
+
+    def __init__(self, root="/"):
+        self.root = root
+
+    def available(self):
+        return shutil.which("btrfs") is not None and filesystem_type(self.root) == "btrfs"
+
+    def snapshot_dir(self):
+        return os.path.join(self.root, BTRFS_SNAPSHOT_DIR)
+
+    def create(self, description=SNAPSHOT_DESCRIPTION, timeout=SNAPSHOT_TIMEOUT):
+        path = os.path.join(self.snapshot_dir(), time.strftime("%Y%m%d-%H%M%S"))
+        _run([SUDO_CMD, '-n', 'mkdir', '-p', self.snapshot_dir()], timeout)
+        _run([SUDO_CMD, '-n', 'btrfs', 'subvolume', 'snapshot', '-r', self.root, path], timeout)
+        return path
+
+    def list_snapshots(self, timeout=SNAPSHOT_TIMEOUT):
+        """Paths of the snapshots create() made, oldest first; rollback copies are left out"""
+        output = _run([SUDO_CMD, '-n', 'ls', '-1', self.snapshot_dir()], timeout)
+        return [os.path.join(self.snapshot_dir(), name)
+                for name in sorted(output.split()) if _BTRFS_NAME_RE.match(name)]
+
+    def prune(self, keep, timeout=SNAPSHOT_TIMEOUT):
+        """Delete all but the newest keep snapshots; return the deleted paths
+
+        Nothing else removes them, and each one pins the extents the
+        updates after it replaced.
+        """
+        old = self.list_snapshots(timeout)[:-keep] if keep > 0 else []
+        if old:
+            _run([SUDO_CMD, '-n', 'btrfs', 'subvolume', 'delete'] + old, timeout)
+        return old
+
+    def rollback_command(self, snapshot_id):
+        """Writable copy of the snapshot made the default subvolume; takes effect on reboot
+
+        Only works when the bootloader mounts the default subvolume (no
+        subvol= in the kernel command line or fstab).
+        """
+        target = os.path.join(os.path.dirname(snapshot_id), f"rollback-{os.path.basename(snapshot_id)}")
+        return [SUDO_CMD, 'sh', '-c',
+                f'btrfs subvolume snapshot "{snapshot_id}" "{target}" && btrfs subvolume set-default "{target}"']
+
+    def rollback_problem(self, snapshot_id):
+        """Why rollback_command would not restore the snapshot, or None"""
+        # The snapshot directory may be unreadable without root; then only the copy finds out
+        if os.path.isdir(self.snapshot_dir()) and not os.path.isdir(snapshot_id):
+            return f"{snapshot_id} no longer exists; old snapshots are deleted after each new one."
+        return _pinned_problem() if self.root == "/" else None
+
+    def describe(self, snapshot_id):
+        return f"btrfs {snapshot_id}"
+
+
+BACKENDS = {backend.name: backend for backend in (SnapperBackend, TimeshiftBackend, BtrfsBackend)}
+
+
+def detect_backend(root=None):
+    """First available backend for root (SNAPSHOT_ROOT or /), or None"""
+    root = root or SNAPSHOT_ROOT
+    for backend_class in BACKENDS.values():
+        backend = backend_class(root)
+        if backend.available():
+            return backend
+    return None
+
+
+def backend_for(name):
+    """Backend a recorded snapshot belongs to, for its rollback command"""
+    backend_class = BACKENDS.get(name)
+    return backend_class(SNAPSHOT_ROOT) if backend_class else None
+
+
+def estimate_duration(backend, past_durations=()):
+    """Median of the measured creations, or the backend's guess before there are any"""
+    past_durations = [duration for duration in past_durations if duration is not None]
+    if past_durations:
+        return statistics.median(past_durations)
+    return getattr(backend, "estimate", backend.default_estimate)
+
+
+def should_snapshot(backend, past_durations=(), budget=SNAPSHOT_BUDGET):
+    """(take it, estimated seconds); slow filesystems and rsync-mode timeshift are skipped"""
+    estimate = estimate_duration(backend, past_durations)
+    return estimate <= budget, estimate
+
+
+def create_snapshot(backend, description=SNAPSHOT_DESCRIPTION, timeout=SNAPSHOT_TIMEOUT):
+    """Create a snapshot and measure it; raises SnapshotError"""
+    started = time.monotonic()
+    snapshot_id = backend.create(description, timeout)
+    return Snapshot(backend.name, snapshot_id, time.time(), time.monotonic() - started)
+
+
+def prune_snapshots(backend, keep=SNAPSHOT_KEEP, timeout=SNAPSHOT_TIMEOUT):
+    """Delete the backend's snapshots beyond the newest keep; return their ids, raises SnapshotError
+
+    Only the plain btrfs backend prunes here; snapper cleans up by number
+    and timeshift on its own schedule.
+    """
+    prune = getattr(backend, "prune", None)
+    return prune(keep, timeout) if prune else []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m archupdate.snapshots", description="Pre-update snapshots")
+    parser.add_argument("--root", help="filesystem root to snapshot (default $ARCH_UPDATE_SNAPSHOT_ROOT or /)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), help="use this backend instead of detecting one")
+    commands = parser.add_subparsers(dest="action", required=True)
+    commands.add_parser("detect", help="print the backend that would be used")
+    create = commands.add_parser("create", help="create a snapshot and print its id and duration")
+    create.add_argument("--keep", type=int, default=SNAPSHOT_KEEP,
+                        help=f"btrfs snapshots to keep, older ones are deleted (default {SNAPSHOT_KEEP})")
+    rollback = commands.add_parser("rollback-command", help="print the command that rolls back to a snapshot")
+    rollback.add_argument("id")
+    args = parser.parse_args(argv)
+
+    root = args.root or SNAPSHOT_ROOT
+    backend = BACKENDS[args.backend](root) if args.backend else detect_backend(root)
+    if backend is None or (args.action != "rollback-command" and not backend.available()):
+        print(f"No snapshot backend available for {root}")
+        return 1
+    if args.action == "detect":
+        print(f"{backend.name} ({root}), estimated {estimate_duration(backend):.1f}s")
+    elif args.action == "create":
+        try:
+            snapshot = create_snapshot(backend)
+        except SnapshotError as e:
+            print(f"Failed to create snapshot: {e}")
+            return 1
+        print(f"{backend.describe(snapshot.id)} created in {snapshot.duration:.2f}s")
+        try:
+            for snapshot_id in prune_snapshots(backend, args.keep):
+                print(f"Deleted {backend.describe(snapshot_id)}")
+        except SnapshotError as e:
+            print(f"Failed to delete old snapshots: {e}")
+    else:
+        print(" ".join(backend.rollback_command(args.id)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
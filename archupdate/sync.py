@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import urllib.error
+import urllib.request
+from email.utils import formatdate, parsedate_to_datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import PACMAN_CONF, CHECKUPDATES_DB, SYNC_DB_DIR, LOCAL_DB_DIR, SUDO_CMD
+from .mirrors import pacman_architecture
+from .formatting import format_size
+from .cancel import Cancelled
+
+SYNC_TIMEOUT = 15
+SYNC_STATE_FILE = os.path.join(CHECKUPDATES_DB, "sync_state.json")
+# Databases checked longer ago than this are refreshed again by the update
+SYNC_REUSE_MAX_AGE = 30 * 60
+
+SyncReport = namedtuple("SyncReport", ["repos", "downloaded", "saved", "errors"])
+SyncReport.__doc__ = """Outcome of one database sync
+
+repos      -- {repo: 'updated' | 'unchanged' | 'failed'}
+downloaded -- bytes transferred
+saved      -- bytes not transferred because the database was unchanged
+errors     -- {repo: message}
+"""
+
+
+def parse_pacman_repos(path=PACMAN_CONF):
+    """[(repo, [server templates])] in pacman.conf order, following Include lines"""
+    repos = []
+    servers = None
+
+    def read(conf_path, top_level):
+        nonlocal servers
+        try:
+            with open(conf_path, 'r') as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            line = line.split('#', 1)[0].strip()
+            if top_level and line.startswith('[') and line.endswith(']'):
+                name = line[1:-1].strip()
+                servers = None if name == "options" else []
+                if servers is not None:
+                    repos.append((name, servers))
+                continue
+            key, _, value = line.partition('=')
+            key, value = key.strip(), value.strip()
+            if servers is None or not value:
+                continue
+            if key == "Server":
+                servers.append(value)
+            elif key == "Include":
+                read(value, False)
+
+    read(path, True)
+    return repos
+
+
+def _load_state(path=SYNC_STATE_FILE):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state, path=SYNC_STATE_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def fetch_if_changed(url, path, etag=None, timeout=SYNC_TIMEOUT, progress=None, cancel=None):
+    """Conditional GET of url into path; return (changed, bytes read, new etag)
+
+    progress(bytes read, content length or None) is called after every chunk.
+    Raises urllib.error.HTTPError with code 404 when the file does not exist,
+    and Cancelled, leaving path as it was, once the cancel Event is set.
+    """
+    headers = {"User-Agent": "arch-update-gui"}
+    if os.path.exists(path):
+        headers["If-Modified-Since"] = formatdate(os.stat(path).st_mtime, usegmt=True)
+        if etag:
+            headers["If-None-Match"] = etag
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as response:
+            tmp_path = path + ".part"
+            size = 0
+            length = response.headers.get("Content-Length")
+            length = int(length) if length and length.isdigit() else None
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        f.close()
+                        os.remove(tmp_path)
+                        raise Cancelled(url)
+                    chunk = response.read(64 * 1024)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    size += len(chunk)
+                    if progress:
+                        progress(size, length)
+            os.replace(tmp_path, path)
+            # Keep the server's timestamp like pacman does, so If-Modified-Since stays exact
+            last_modified = response.headers.get("Last-Modified")
+            if last_modified:
+                try:
+                    stamp = parsedate_to_datetime(last_modified).timestamp()
+                    os.utime(path, (stamp, stamp))
+                except (TypeError, ValueError, OverflowError):
+                    pass
+            return True, size, response.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return False, 0, etag
+        raise
+
+
+def sync_repo(repo, servers, sync_dir, etags, arch, tracker=None, cancel=None):
+    """Refresh one repo database (and its signature) from the first working server"""
+    db_path = os.path.join(sync_dir, f"{repo}.db")
+    last_error = "No Server configured"
+    for server in servers:
+        base = server.replace("$repo", repo).replace("$arch", arch).rstrip('/')
+        db_url = f"{base}/{repo}.db"
+        try:
+            old_size = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+            progress = (lambda done, total: tracker.update(f"{repo}.db", done, total)) if tracker else None
+            changed, size, etag = fetch_if_changed(db_url, db_path, etags.get(db_url), progress=progress,
+                                                   cancel=cancel)
+            if tracker:
+                tracker.finish(f"{repo}.db")
+            if etag:
+                etags[db_url] = etag
+            sig_path = db_path + ".sig"
+            try:
+                fetch_if_changed(db_url + ".sig", sig_path, etags.get(db_url + ".sig"), cancel=cancel)
+            except (OSError, ValueError) as e:
+                # An old signature next to a new database makes pacman reject the pair
+                if os.path.exists(sig_path):
+                    os.remove(sig_path)
+                # Most repositories do not sign their databases; any other failure tries the next server
+                if not (isinstance(e, urllib.error.HTTPError) and e.code == 404):
+                    raise
+            return ("updated" if changed else "unchanged"), size, (0 if changed else old_size), None
+        except (OSError, ValueError) as e:
+            last_error = str(getattr(e, "reason", e))
+    return "failed", 0, 0, last_error
+
+
+def sync_databases(db_path=CHECKUPDATES_DB, pacman_conf=PACMAN_CONF, workers=4, tracker=None, cancel=None):
+    """Refresh the private database copy with conditional requests
+
+    The copy is what checkupdates --nosync reads and what the following
+    update installs instead of downloading the databases a second time.
+    Downloads report their progress to tracker, a TransferTracker. Setting
+    the cancel Event stops all downloads and raises Cancelled.
+    """
+    sync_dir = os.path.join(db_path, "sync")
+    os.makedirs(sync_dir, exist_ok=True)
+    local_link = os.path.join(db_path, "local")
+    if not os.path.lexists(local_link):
+        os.symlink(LOCAL_DB_DIR, local_link)
+
+    state_path = os.path.join(db_path, "sync_state.json")
+    state = _load_state(state_path)
+    etags = state.get("etags", {})
+    arch = pacman_architecture(pacman_conf)
+    repos = parse_pacman_repos(pacman_conf)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        outcomes = list(pool.map(lambda repo: sync_repo(repo[0], repo[1], sync_dir, etags, arch, tracker, cancel), repos))
+
+    report = SyncReport({}, 0, 0, {})
+    for (repo, _), (status, size, saved, error) in zip(repos, outcomes):
+        report.repos[repo] = status
+        if error:
+            report.errors[repo] = error
+    report = report._replace(downloaded=sum(o[1] for o in outcomes), saved=sum(o[2] for o in outcomes))
+
+    state.update({
+        "etags": etags,
+        "synced": time.time(),
+        "complete": bool(repos) and not report.errors,
+        "total_saved": state.get("total_saved", 0) + report.saved
+    })
+    try:
+        _save_state(state, state_path)
+    except OSError as e:
+        print(f"Failed to save sync state: {e}")
+    return report
+
+
+def describe_sync(report):
+    """One-line summary such as '3 unchanged, 1 updated, 7.9 MiB downloaded, 0 B not downloaded'"""
+    counts = {}
+    for status in report.repos.values():
+        counts[status] = counts.get(status, 0) + 1
+    parts = [f"{counts[status]} {status}" for status in ("unchanged", "updated", "failed") if status in counts]
+    parts.append(f"{format_size(report.downloaded)} downloaded, {format_size(report.saved)} not downloaded")
+    return ", ".join(parts)
+
+
+def sync_complete(report):
+    """True when checkupdates may skip its own sync (--nosync)"""
+    return bool(report.repos) and not report.errors
+
+
+def reusable_databases(db_path=CHECKUPDATES_DB, max_age=SYNC_REUSE_MAX_AGE):
+    """Private copies an update can install instead of running pacman -Sy
+
+    Only a complete and recent sync qualifies; None means the update has
+    to refresh by itself. Databases the system already has in the same or
+    a newer version are left out, so the list may be empty.
+    """
+    state = _load_state(os.path.join(db_path, "sync_state.json"))
+    if not state.get("complete") or time.time() - state.get("synced", 0) > max_age:
+        return None
+    sync_dir = os.path.join(db_path, "sync")
+    paths = []
+    for name in sorted(os.listdir(sync_dir)):
+        if not (name.endswith(".db") or name.endswith(".db.sig")):
+            continue
+        path = os.path.join(sync_dir, name)
+        system_path = os.path.join(SYNC_DB_DIR, name)
+        try:
+            if os.path.exists(system_path) and os.stat(system_path).st_mtime >= os.stat(path).st_mtime:
+                continue
+        except OSError:
+            continue
+        paths.append(path)
+    return paths
+
+
+def install_databases_command(paths):
+    """Privileged copy into pacman's sync directory keeping the timestamps"""
+    return [SUDO_CMD, '-n', 'install', '-m', '644', '-p', '-t', SYNC_DB_DIR] + list(paths)
+
+
+def total_saved(db_path=CHECKUPDATES_DB):
+    return _load_state(os.path.join(db_path, "sync_state.json")).get("total_saved", 0)
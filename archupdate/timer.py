@@ -0,0 +1,134 @@
+import os
+import sys
+import shutil
+
+from .jobs import run_command, command_failed
+
+TIMER_NAME = "arch-update-check"
+
+# update_gui.py next to the package runs the headless check
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "update_gui.py")
+
+SERVICE_TEMPLATE = """[Unit]
+Description=Check for Arch Linux updates
+
+[Service]
+Type=oneshot
+ExecStart="{python}" "{script}" --check --notify
+# --check exits 2 when nothing is pending
+SuccessExitStatus=2
+Nice=10
+IOSchedulingClass=idle
+"""
+
+TIMER_TEMPLATE = """[Unit]
+Description=Periodic Arch Linux update check
+
+[Timer]
+OnCalendar={calendar}
+# Catch up on checks missed while powered off or suspended
+Persistent=true
+RandomizedDelaySec={delay}
+AccuracySec=1min
+
+[Install]
+WantedBy=timers.target
+"""
+
+
+def user_unit_dir():
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(config_home, "systemd", "user")
+
+
+def unit_paths():
+    unit_dir = user_unit_dir()
+    return (os.path.join(unit_dir, f"{TIMER_NAME}.service"),
+            os.path.join(unit_dir, f"{TIMER_NAME}.timer"))
+
+
+def systemd_user_available():
+    """True when systemctl exists and a user manager runs for this session"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
+    return shutil.which("systemctl") is not None and os.path.isdir(os.path.join(runtime_dir, "systemd"))
+
+
+def on_calendar(interval_hours):
+    """OnCalendar expression firing every interval_hours, aligned to midnight
+
+    Intervals that do not divide 24 restart at midnight, so the last gap of
+    the day is shorter.
+    """
+    interval_hours = max(1, min(24, int(interval_hours)))
+    if interval_hours == 24:
+        return "daily"
+    return f"*-*-* 00/{interval_hours}:00:00"
+
+
+def render_units(interval_hours, python=None, script=APP_SCRIPT):
+    """Return (service, timer) unit file contents"""
+    escape = lambda path: path.replace('%', '%%').replace('"', '\\"')
+    # Spread the start by up to a tenth of the interval, at most 30 minutes
+    delay = min(30, max(1, int(interval_hours) * 6))
+    service = SERVICE_TEMPLATE.format(python=escape(python or sys.executable), script=escape(script))
+    timer = TIMER_TEMPLATE.format(calendar=on_calendar(interval_hours), delay=f"{delay}min")
+    return service, timer
+
+
+def _systemctl(*args, cancel=None):
+    return run_command(["systemctl", "--user", *args], timeout=30, cancel=cancel)
+
+
+def timer_installed():
+    return os.path.exists(unit_paths()[1])
+
+
+def install_timer(interval_hours, cancel=None):
+    """Write the units, reload the user manager and enable the timer; True on success
+
+    Setting the cancel Event stops the systemctl call that is running.
+    """
+    contents = render_units(interval_hours)
+    try:
+        changed = False
+        for path, text in zip(unit_paths(), contents):
+            try:
+                with open(path, 'r') as f:
+                    if f.read() == text:
+                        continue
+            except OSError:
+                pass
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(text)
+            changed = True
+    except OSError as e:
+        print(f"Failed to install update check timer: {e}")
+        return False
+    if changed:
+        _systemctl("daemon-reload", cancel=cancel)
+    error = command_failed(_systemctl("enable", "--now", f"{TIMER_NAME}.timer", cancel=cancel))
+    if error:
+        print(f"Failed to enable {TIMER_NAME}.timer: {error}")
+        return False
+    if changed:
+        # A running timer keeps its old schedule until restarted
+        _systemctl("restart", f"{TIMER_NAME}.timer", cancel=cancel)
+    return True
+
+
+def remove_timer(cancel=None):
+    """Disable the timer and delete the generated units"""
+    disabled = _systemctl("disable", "--now", f"{TIMER_NAME}.timer", cancel=cancel)
+    if disabled.error:
+        print(f"Failed to remove update check timer: {disabled.error}")
+        return False
+    try:
+        for path in unit_paths():
+            if os.path.exists(path):
+                os.remove(path)
+    except OSError as e:
+        print(f"Failed to remove update check timer: {e}")
+        return False
+    _systemctl("daemon-reload", cancel=cancel)
+    return True
@@ -0,0 +1,302 @@
+import os
+import re
+import math
+import time
+import threading
+from collections import deque, namedtuple
+
+from .formatting import format_size, format_duration
+
+# ' linux-6.7.arch1-1-x86_64   132.5 MiB  12.4 MiB/s 00:05 [######-----]  56%'
+# Only on a terminal: pacman turns its progress bars off when stdout is a pipe, as under QProcess
+_PROGRESS_RE = re.compile(
+    r"^\s*(?P<name>\S+)\s+(?P<size>[\d.]+)\s*(?P<unit>[KMGT]?i?B)\s+"
+    r"[\d.]+\s*[KMGT]?i?B/s\s+[\d:-]+\s+\[[^\]]*\]\s+(?P<percent>\d+)%"
+)
+# ' linux-6.7.arch1-1-x86_64 downloading...', all piped pacman prints per file;
+# the byte counts then come from PartialDownloads
+_STARTED_RE = re.compile(r"^\s*(?P<name>\S+)\s+downloading\.\.\.\s*$")
+_UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "TiB": 1024 ** 4,
+          "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4}
+# pacman's aggregate line with ParallelDownloads
+_TOTAL_NAMES = {"Total"}
+# From the transaction summary, before the downloads start
+_DOWNLOAD_SIZE_RE = re.compile(r"^Total Download Size:\s+([\d.]+)\s*([KMGT]?i?B)")
+# Seconds between two renders of the totals
+REFRESH_INTERVAL = 0.25
+# Seconds between two looks at the files pacman downloads into
+POLL_INTERVAL = 0.5
+
+TransferSnapshot = namedtuple("TransferSnapshot", ["done", "total", "active", "finished", "rate", "smoothed_rate", "eta"])
+TransferSnapshot.__doc__ = """Aggregate state of all downloads at one moment
+
+done          -- bytes transferred so far
+total         -- bytes expected overall, None while unknown
+active        -- files still downloading
+finished      -- files completed
+rate          -- bytes/s over the last RATE_WINDOW seconds
+smoothed_rate -- exponentially smoothed bytes/s, what the ETA uses
+eta           -- seconds left at the smoothed rate, None while unknown
+"""
+
+
+def _bytes(number, unit):
+    return int(float(number) * _UNITS.get(unit, 1))
+
+
+def parse_progress_line(line):
+    """(file name, bytes done, file size) from a pacman download line, or None
+
+    Sizeless 'downloading...' lines give (name, 0, None).
+    """
+    match = _PROGRESS_RE.match(line)
+    if match:
+        if match.group("name") in _TOTAL_NAMES:
+            return None
+        size = _bytes(match.group("size"), match.group("unit"))
+        return match.group("name"), size * min(int(match.group("percent")), 100) // 100, size
+    match = _STARTED_RE.match(line)
+    if match and match.group("name") not in _TOTAL_NAMES:
+        return match.group("name"), 0, None
+    return None
+
+
+def download_label(file_name):
+    """'linux-6.7.arch1-1-x86_64.pkg.tar.zst' -> 'linux-6.7.arch1-1-x86_64', the name pacman prints"""
+    return file_name.split(".pkg.tar")[0]
+
+
+def package_name_from_file(file_name):
+    """'linux-6.7.arch1-1-x86_64' -> 'linux'; names without version parts come back as they are"""
+    parts = file_name.rsplit('-', 3)
+    return parts[0] if len(parts) == 4 else file_name
+
+
+class TransferTracker:
+    """Bytes, throughput and ETA across concurrent downloads
+
+    Fed either with pacman output, whose progress lines and 'Total
+    Download Size' are parsed, or with counters from a downloader of our
+    own via update(). Feeding is cheap and may happen from any thread;
+    snapshot() does the rate math and is meant to be called every
+    REFRESH_INTERVAL by whoever renders.
+    """
+    RATE_WINDOW = 2.0
+    # Time constant of the smoothed rate in seconds
+    SMOOTHING = 3.0
+
+    def __init__(self, expected_total=None, clock=time.monotonic):
+        """Call start() when the downloads begin; update() counts right away"""
+        self.clock = clock
+        self.expected_total = expected_total
+        self.started = clock()
+        self.files = {}
+        self.changed = set()
+        self.samples = deque()
+        self.smoothed_rate = None
+        self._last_snapshot = None
+        self.running = False
+        self._buffer = ""
+        self._lock = threading.Lock()
+
+    def feed(self, data):
+        """Parse a chunk of pacman output; return the number of progress lines in it"""
+        self._buffer += data
+        *lines, self._buffer = re.split(r"[\r\n]", self._buffer)
+        parsed = 0
+        for line in lines:
+            # Before start() only the summary counts, not the database downloads of -Sy
+            progress = parse_progress_line(line) if self.running else None
+            if progress:
+                if progress[2] is None:
+                    self.begin(progress[0])
+                else:
+                    self.update(*progress)
+                parsed += 1
+                continue
+            match = _DOWNLOAD_SIZE_RE.match(line.strip())
+            if match:
+                self.expected_total = _bytes(*match.groups())
+        return parsed
+
+    def start(self, now=None):
+        """Begin counting downloads and restart the clock"""
+        self.running = True
+        self.started = self.clock() if now is None else now
+        self.samples.clear()
+        self.smoothed_rate = None
+        self._last_snapshot = None
+
+    def begin(self, name):
+        """A file pacman announced; its bytes arrive through update()"""
+        with self._lock:
+            if name not in self.files:
+                self.files[name] = {'done': 0, 'total': None, 'finished': False}
+                self.changed.add(name)
+
+    def update(self, name, done, total=None):
+        with self._lock:
+            known_total = self.files[name]['total'] if name in self.files else None
+            self.files[name] = {'done': done, 'total': total if total is not None else known_total,
+                                'finished': total is not None and done >= total}
+            self.changed.add(name)
+
+    def finish(self, name=None):
+        """Mark one file, or all of them, as complete"""
+        with self._lock:
+            for file_name in ([name] if name is not None else list(self.files)):
+                entry = self.files.get(file_name)
+                if entry is None or entry['finished']:
+                    continue
+                if entry['total'] is not None:
+                    entry['done'] = entry['total']
+                entry['finished'] = True
+                self.changed.add(file_name)
+
+    def unfinished(self):
+        with self._lock:
+            return [name for name, entry in self.files.items() if not entry['finished']]
+
+    def take_changed(self):
+        """{file name: (done, total)} updated since the last call"""
+        with self._lock:
+            changed = {name: (self.files[name]['done'], self.files[name]['total']) for name in self.changed}
+            self.changed.clear()
+        return changed
+
+    def done(self):
+        with self._lock:
+            return sum(entry['done'] for entry in self.files.values())
+
+    def total(self):
+        with self._lock:
+            known = sum(entry['total'] or 0 for entry in self.files.values())
+        if self.expected_total:
+            return max(self.expected_total, known)
+        return known or None
+
+    def snapshot(self, now=None):
+        now = self.clock() if now is None else now
+        done = self.done()
+        total = self.total()
+        self.samples.append((now, done))
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.RATE_WINDOW:
+            self.samples.popleft()
+        first_time, first_done = self.samples[0]
+        rate = (done - first_done) / (now - first_time) if now > first_time else 0.0
+
+        if self._last_snapshot is not None and now > self._last_snapshot[0]:
+            last_time, last_done = self._last_snapshot
+            step_rate = (done - last_done) / (now - last_time)
+            if self.smoothed_rate is None:
+                self.smoothed_rate = step_rate
+            else:
+                alpha = 1 - math.exp(-(now - last_time) / self.SMOOTHING)
+                self.smoothed_rate += alpha * (step_rate - self.smoothed_rate)
+        self._last_snapshot = (now, done)
+
+        smoothed = self.smoothed_rate or 0.0
+        eta = (total - done) / smoothed if total is not None and smoothed > 0 else None
+        with self._lock:
+            finished = sum(1 for entry in self.files.values() if entry['finished'])
+            active = len(self.files) - finished
+        return TransferSnapshot(done, total, active, finished, rate, smoothed, eta)
+
+    def elapsed(self, now=None):
+        return (self.clock() if now is None else now) - self.started
+
+
+class PartialDownloads:
+    """Byte counts of pacman's downloads, read from the files it writes
+
+    Piped pacman prints one 'downloading...' line per file and nothing
+    else, so the counters come from the '.part' files in the cache
+    directories (pacman 7 writes them to a download-* directory inside)
+    measured against the compressed sizes from the sync database. A file
+    whose '.part' is gone, or whose package is in the cache, is complete.
+
+    pacman 7 creates the download-* directory mode 0700 for its download
+    user, so an unprivileged reader cannot see inside: those files only
+    show up once complete, and on_unreadable(path) is called once per
+    such directory so the caller can stop presenting byte counts.
+    """
+
+    def __init__(self, tracker, directories, files=None, on_unreadable=None):
+        """files: {label: (package file name, compressed size)} of the expected downloads"""
+        self.tracker = tracker
+        self.directories = list(directories)
+        self.files = files or {}
+        self.on_unreadable = on_unreadable
+        self.partial = set()
+        self.unreadable = set()
+
+    def _scan(self, directory, found, nested=True):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.endswith(".part") and ".pkg.tar" in name and not name.endswith(".sig.part"):
+                        try:
+                            size = entry.stat(follow_symlinks=False).st_size
+                        except OSError:
+                            continue
+                        label = download_label(name)
+                        found[label] = max(found.get(label, 0), size)
+                    elif nested and name.startswith("download-") and entry.is_dir(follow_symlinks=False):
+                        self._scan(entry.path, found, nested=False)
+        except PermissionError:
+            if directory not in self.unreadable:
+                self.unreadable.add(directory)
+                if self.on_unreadable:
+                    self.on_unreadable(directory)
+        except OSError:
+            # The directory went away between two polls
+            pass
+
+    def poll(self):
+        """Feed the current sizes to the tracker; return the number of files being written"""
+        found = {}
+        for directory in self.directories:
+            self._scan(directory, found)
+        for label, size in found.items():
+            self.tracker.update(label, size, self.files.get(label, (None, None))[1])
+        for label in self.partial - found.keys():
+            self.tracker.finish(label)
+        # Files small enough to finish between two polls are only seen in the cache
+        for label in self.tracker.unfinished():
+            file_name = self.files.get(label, (None, None))[0]
+            if label not in found and file_name and any(
+                    os.path.exists(os.path.join(directory, file_name)) for directory in self.directories):
+                self.tracker.update(label, self.files[label][1] or 0, self.files[label][1])
+                self.tracker.finish(label)
+        self.partial = set(found)
+        return len(found)
+
+    def watch(self, cancel, interval=POLL_INTERVAL):
+        """Poll until the cancel Event is set; meant for a background thread"""
+        while not cancel.wait(interval):
+            self.poll()
+
+
+def describe_transfer(snapshot):
+    """'12.3 MiB of 45.6 MiB, 3.4 MiB/s (avg 3.1 MiB/s), 11s left, 2 active'"""
+    text = format_size(snapshot.done)
+    if snapshot.total:
+        text += f" of {format_size(snapshot.total)}"
+    text += f", {format_size(snapshot.rate)}/s"
+    if snapshot.smoothed_rate:
+        text += f" (avg {format_size(snapshot.smoothed_rate)}/s)"
+    if snapshot.eta is not None:
+        text += f", {format_duration(snapshot.eta)} left"
+    if snapshot.active > 1:
+        text += f", {snapshot.active} active"
+    return text
+
+
+def describe_file_progress(snapshot, expected_files=None):
+    """'3 of 12 files downloaded, 2 active', for when the byte counts cannot be read"""
+    text = f"{snapshot.finished} of {expected_files} files downloaded" if expected_files \
+        else f"{snapshot.finished} files downloaded"
+    if snapshot.active:
+        text += f", {snapshot.active} active"
+    return text
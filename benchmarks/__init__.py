@@ -0,0 +1 @@
+"""Benchmarks of the parsing and rendering hot paths; see benchmarks/run.py"""
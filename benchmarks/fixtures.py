@@ -0,0 +1,164 @@
+"""Synthetic fixtures shaped like real pacman/checkupdates data
+
+Everything is generated from a fixed seed, so two runs on the same sizes
+time exactly the same input.
+"""
+import io
+import os
+import json
+import random
+import tarfile
+import time
+
+SEED = 20240115
+# Words package names are built from, so names look like real ones
+_PARTS = ["lib", "python", "perl", "qt6", "kde", "gnome", "x11", "font", "rust", "go", "node",
+          "gtk", "sdl", "mesa", "vulkan", "gst", "plugin", "tools", "utils", "base", "core", "data"]
+_HOOKS = ["Arming ConditionNeedsUpdate", "Updating module dependencies", "Install DKMS modules",
+          "Updating linux initcpios", "Reloading system manager configuration", "Updating icon theme caches",
+          "Updating the desktop file MIME type cache", "Updating fontconfig cache"]
+
+
+def package_names(count, seed=SEED):
+    rng = random.Random(seed)
+    names = []
+    seen = set()
+    while len(names) < count:
+        name = "-".join(rng.sample(_PARTS, rng.randint(1, 3))) + (str(rng.randint(1, 99)) if rng.random() < 0.3 else "")
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def _version(rng):
+    return f"{rng.randint(0, 30)}.{rng.randint(0, 20)}.{rng.randint(0, 50)}-{rng.randint(1, 5)}"
+
+
+def checkupdates_output(names, seed=SEED):
+    """'name old -> new' lines as checkupdates prints them"""
+    rng = random.Random(seed)
+    return "".join(f"{name} {_version(rng)} -> {_version(rng)}\n" for name in names)
+
+
+def write_pacman_log(path, size_mb, seed=SEED):
+    """pacman.log of about size_mb MiB; the newest transaction ends near now
+
+    Reused when a log of the same size already exists.
+    """
+    if os.path.exists(path) and os.path.getsize(path) >= size_mb * 1024 * 1024 * 0.95:
+        return path
+    rng = random.Random(seed)
+    names = package_names(3000, seed)
+    target = size_mb * 1024 * 1024
+    # ~1 KiB per transaction line set; spread the transactions over the last years
+    transactions = max(1, target // 9000)
+    stamp = time.time() - transactions * 6 * 3600
+    written = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        while written < target:
+            lines = []
+
+            def log(tag, text):
+                lines.append(f"[{time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime(stamp))}] [{tag}] {text}\n")
+
+            log("PACMAN", "Running 'pacman -Syu --noconfirm'")
+            log("PACMAN", "synchronizing package lists")
+            log("PACMAN", "starting full system upgrade")
+            log("ALPM", "transaction started")
+            for name in rng.sample(names, rng.randint(20, 120)):
+                stamp += rng.random() * 2
+                action = "upgraded" if rng.random() < 0.9 else "installed"
+                log("ALPM", f"{action} {name} ({_version(rng)} -> {_version(rng)})")
+                if rng.random() < 0.1:
+                    log("ALPM-SCRIPTLET", f"==> Post-install message for {name}")
+            log("ALPM", "transaction completed")
+            for hook in rng.sample(_HOOKS, 4):
+                log("ALPM", f"running '{hook.lower().replace(' ', '-')}.hook'...")
+            block = "".join(lines)
+            f.write(block)
+            written += len(block)
+            stamp += 6 * 3600
+    os.replace(tmp_path, path)
+    return path
+
+
+def update_transcript(pending_lines, seed=SEED):
+    """pacman -Syu --noconfirm output as piped pacman prints it, hooks included
+
+    pacman drops its progress bars when stdout is not a terminal, as under
+    QProcess: each download is a single 'downloading...' line and each
+    step a plain line, so only the hooks carry counters.
+    """
+    rng = random.Random(seed)
+    names = [line.split()[0] for line in pending_lines]
+    total = len(names)
+    download = total * 5000 / 1024
+    out = [":: Synchronizing package databases...\n", " core downloading...\n", " extra downloading...\n",
+           ":: Starting full system upgrade...\n", "resolving dependencies...\n",
+           "looking for conflicting packages...\n", "\n",
+           f"Packages ({total}) " + "  ".join(f"{line.split()[0]}-{line.split()[-1]}" for line in pending_lines) + "\n",
+           "\n", f"Total Download Size:    {download:.2f} MiB\n",
+           f"Total Installed Size:  {download * rng.uniform(2.5, 4):.2f} MiB\n",
+           f"Net Upgrade Size:        {rng.uniform(-5, 50):.2f} MiB\n", "\n",
+           ":: Proceed with installation? [Y/n] \n", ":: Retrieving packages...\n"]
+    out.extend(f" {line.split()[0]}-{line.split()[-1]}-x86_64 downloading...\n" for line in pending_lines)
+    out.extend(["checking keyring...\n", "checking package integrity...\n", "loading package files...\n",
+                "checking for file conflicts...\n", "checking available disk space...\n",
+                ":: Processing package changes...\n"])
+    out.extend(f"upgrading {name}...\n" for name in names)
+    out.append(":: Running post-transaction hooks...\n")
+    for i, hook in enumerate(_HOOKS, 1):
+        out.append(f"({i}/{len(_HOOKS)}) {hook}...\n")
+        if "initcpios" in hook:
+            out.extend(f"  -> Running build hook: [{part}]\n" for part in ("base", "udev", "autodetect", "modconf"))
+    return "".join(out)
+
+
+def chunks(text, size=4096):
+    """Split output like pipe reads do, without regard for line ends"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def write_sync_db_tree(directory, pending_lines, repos=("core", "extra", "multilib"), extra_packages=20000,
+                       seed=SEED):
+    """Gzipped repo databases holding the pending packages plus unrelated ones"""
+    sync_dir = os.path.join(directory, "sync")
+    marker = os.path.join(sync_dir, ".fixture")
+    key = f"{len(pending_lines)}:{extra_packages}:{seed}"
+    if os.path.exists(marker) and open(marker).read() == key:
+        return sync_dir
+    os.makedirs(sync_dir, exist_ok=True)
+    rng = random.Random(seed)
+    pending = {line.split()[0]: line.split()[-1] for line in pending_lines}
+    names = list(pending) + [f"unrelated-{i}" for i in range(extra_packages)]
+    per_repo = {repo: [] for repo in repos}
+    for name in names:
+        per_repo[rng.choice(repos)].append(name)
+    for repo, repo_names in per_repo.items():
+        with tarfile.open(os.path.join(sync_dir, f"{repo}.db"), "w:gz") as tar:
+            for name in repo_names:
+                version = pending.get(name) or _version(rng)
+                depends = rng.sample(names, rng.randint(0, 6))
+                desc = (f"%FILENAME%\n{name}-{version}-x86_64.pkg.tar.zst\n\n%NAME%\n{name}\n\n"
+                        f"%VERSION%\n{version}\n\n%CSIZE%\n{rng.randint(10 ** 4, 10 ** 8)}\n\n"
+                        f"%ISIZE%\n{rng.randint(10 ** 4, 10 ** 9)}\n\n%DEPENDS%\n" +
+                        "".join(f"{dep}>=1.0\n" for dep in depends) + "\n")
+                data = desc.encode()
+                info = tarfile.TarInfo(f"{name}-{version}/desc")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+    with open(marker, 'w') as f:
+        f.write(key)
+    return sync_dir
+
+
+def write_ignore_list(config_dir, names, seed=SEED):
+    """An ignore list mixing exact names and globs, as ignored_packages.json"""
+    rng = random.Random(seed)
+    entries = rng.sample(names, min(40, len(names))) + ["lib*-plugin*", "python-gtk*", "font-*"]
+    os.makedirs(config_dir, exist_ok=True)
+    with open(os.path.join(config_dir, "ignored_packages.json"), 'w') as f:
+        json.dump(entries, f)
+    return entries
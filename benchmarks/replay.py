@@ -0,0 +1,98 @@
+"""Drive a full check and update through the window on recorded transcripts
+
+    python -m benchmarks.replay                       # synthetic transcripts, max speed
+    python -m benchmarks.replay --speed 1             # with their recorded timing
+    python -m benchmarks.replay --recordings DIR      # transcripts made with archupdate.replay
+
+Runs headless on the Qt offscreen platform and reports how long each
+stage took and how many frames the event loop dropped while output
+streamed in. Needs no pacman, sudo or yay.
+"""
+import os
+import sys
+import time
+import argparse
+
+from benchmarks.run import FIXTURE_DIR, prepare_environment
+
+
+def write_recordings(directory, packages, aur_packages):
+    """checkupdates, yay -Qua and pacman -Syu transcripts from the benchmark fixtures"""
+    from benchmarks import fixtures
+    from archupdate.replay import Recording, recording_from_text, save_recording
+
+    os.makedirs(directory, exist_ok=True)
+    checkupdates_text = fixtures.checkupdates_output(fixtures.package_names(packages))
+    aur_text = fixtures.checkupdates_output(fixtures.package_names(aur_packages, seed=7), seed=7)
+    transcript = fixtures.update_transcript(checkupdates_text.splitlines())
+    save_recording(recording_from_text(["checkupdates"], checkupdates_text), os.path.join(directory, "checkupdates.jsonl"))
+    save_recording(recording_from_text(["yay", "-Qua"], aur_text, exit_code=0 if aur_packages else 1),
+                   os.path.join(directory, "yay-qua.jsonl"))
+    save_recording(recording_from_text(["pacman"], transcript, line_delay=0.0005), os.path.join(directory, "pacman.jsonl"))
+    save_recording(Recording(["yay"], [], 0, 1.0), os.path.join(directory, "yay.jsonl"))
+    return directory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay", description=__doc__.splitlines()[0])
+    parser.add_argument("--recordings", metavar="DIR", help="directory of transcripts (default: synthetic ones)")
+    parser.add_argument("--speed", type=float, default=0, help="replay speed, 0 for as fast as possible (default)")
+    parser.add_argument("--packages", type=int, default=300, help="pending packages in the synthetic transcripts")
+    parser.add_argument("--aur", type=int, default=0, help="pending AUR packages in the synthetic transcripts")
+    parser.add_argument("--timeout", type=float, default=600, help="give up after this many seconds")
+    args = parser.parse_args(argv)
+
+    sizes = {'packages': args.packages}
+    prepare_environment(sizes)
+    directory = args.recordings or write_recordings(os.path.join(FIXTURE_DIR, f"replay-{args.packages}-{args.aur}"),
+                                                    args.packages, args.aur)
+    os.environ["ARCH_NEWS_URL"] = f"file://{os.path.join(FIXTURE_DIR, 'no-news.xml')}"
+
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
+
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    import update_gui
+
+    window = update_gui.UpdateAppWindow(update_gui.ReplayBackend(directory, args.speed))
+    monitor = update_gui.FrameMonitor()
+    results = {}
+    started = time.perf_counter()
+
+    def record_stage(name):
+        results[name] = {'seconds': time.perf_counter() - started, 'dropped': monitor.dropped,
+                         'stall': monitor.longest_stall}
+        monitor.start()
+
+    def poll():
+        if time.perf_counter() - started > args.timeout:
+            print("Timed out", file=sys.stderr)
+            app.quit()
+        elif 'check' not in results:
+            if window.authenticated and window.current_process is None and window.update_button.isEnabled():
+                record_stage('check')
+                window.run_updates()
+        elif window.current_process is None and window.check_button.isEnabled():
+            record_stage('update')
+            app.quit()
+
+    poller = QTimer()
+    poller.timeout.connect(poll)
+    poller.start(50)
+    monitor.start()
+    window.check_for_updates()
+    app.exec()
+    monitor.stop()
+
+    previous = 0.0
+    print(f"{'stage':<10} {'time':>9} {'dropped':>8} {'longest stall':>14}")
+    for name, result in results.items():
+        print(f"{name:<10} {result['seconds'] - previous:>8.2f}s {result['dropped']:>8} "
+              f"{result['stall'] * 1000:>11.0f} ms")
+        previous = result['seconds']
+    print(f"pending: {len(window.pending_pacman)} official, {len(window.pending_aur)} AUR")
+    return 0 if 'update' in results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Time the parsing and rendering hot paths against a stored baseline
+
+    python -m benchmarks.run                 # full size fixtures (500 MiB pacman.log)
+    python -m benchmarks.run --quick         # small fixtures for a fast look
+    python -m benchmarks.run --save-baseline # store the results as the new baseline
+
+Runs headless on the Qt offscreen platform. Fixtures are generated once
+into benchmarks/.fixtures and reused. Exits 1 when a case got slower than
+the baseline by more than --threshold.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FIXTURE_DIR = os.path.join(BENCH_DIR, ".fixtures")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+
+class Case:
+    """One benchmark: setup() runs untimed before every repetition of run()"""
+
+    def __init__(self, name, run, setup=None, heavy=False):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.heavy = heavy
+
+    def measure(self, repeat):
+        times = []
+        for _ in range(repeat):
+            if self.setup:
+                self.setup()
+            started = time.perf_counter()
+            self.run()
+            times.append(time.perf_counter() - started)
+        return {'median': statistics.median(times), 'min': min(times), 'runs': len(times)}
+
+
+class _FakeProcess:
+    """Stands in for QProcess so handle_stdout reads recorded chunks"""
+
+    def __init__(self):
+        self.chunk = b""
+
+    def readAllStandardOutput(self):
+        return self
+
+    def data(self):
+        return self.chunk
+
+
+def prepare_environment(sizes):
+    """Point HOME and the checkupdates DB at fixtures before the app is imported"""
+    home = os.path.join(FIXTURE_DIR, "home")
+    os.makedirs(home, exist_ok=True)
+    os.environ["HOME"] = home
+    os.environ["CHECKUPDATES_DB"] = os.path.join(FIXTURE_DIR, f"db-{sizes['packages']}")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, REPO_DIR)
+
+
+def build_cases(sizes):
+    from benchmarks import fixtures
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QEvent
+
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    import update_gui
+    from archupdate.config import CONFIG_DIR
+    from archupdate.resolver import load_dependency_graph
+
+    names = fixtures.package_names(sizes['packages'])
+    checkupdates_text = fixtures.checkupdates_output(names)
+    pending = checkupdates_text.splitlines()
+    aur_pending = fixtures.checkupdates_output(fixtures.package_names(sizes['packages'] // 10, seed=7), seed=7).splitlines()
+    fixtures.write_ignore_list(CONFIG_DIR, names)
+    log_path = fixtures.write_pacman_log(os.path.join(FIXTURE_DIR, f"pacman-{sizes['log_mb']}M.log"), sizes['log_mb'])
+    transcript_chunks = [chunk.encode() for chunk in fixtures.chunks(fixtures.update_transcript(pending[:sizes['transcript']]))]
+    checkupdates_chunks = [chunk.encode() for chunk in fixtures.chunks(checkupdates_text)]
+    sync_dir = fixtures.write_sync_db_tree(os.environ["CHECKUPDATES_DB"], pending, extra_packages=sizes['sync_extra'])
+
+    update_gui.PACMAN_LOG = log_path
+    window = update_gui.UpdateAppWindow()
+    fake_process = _FakeProcess()
+    # Only the last transaction, as after a real update
+    log_start = time.time() - 12 * 3600
+
+    def flush_deletes():
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    def reset_update():
+        window.process = fake_process
+        window.current_process = "pacman_update"
+        window.transaction_timer = update_gui.TransactionTimer()
+        window.profile = None
+        window.current_package = None
+        window.clear_package_progress()
+        flush_deletes()
+        window.package_started.clear()
+        window.package_durations.clear()
+        window.update_log_content = ""
+        window.log_textview.clear()
+
+    def feed(chunks):
+        for chunk in chunks:
+            fake_process.chunk = chunk
+            window.handle_stdout()
+
+    def reset_check():
+        window.process = fake_process
+        window.current_process = "checkupdates"
+        window.pending_pacman = []
+        window.update_log_content = ""
+        window.log_textview.clear()
+
+    def reset_pending():
+        window.pending_pacman = list(pending)
+        window.pending_aur = list(aur_pending)
+
+    def reset_progress():
+        window.clear_package_progress()
+        flush_deletes()
+
+    def build_progress():
+        for line in pending:
+            window.add_package_progress(line.split()[0])
+
+    return [
+        Case("parse_pacman_log", lambda: update_gui.parse_pacman_log(log_start), heavy=True),
+        Case("handle_stdout (pacman -Syu)", lambda: feed(transcript_chunks), setup=reset_update),
+        Case("handle_stdout (checkupdates)", lambda: feed(checkupdates_chunks), setup=reset_check),
+        Case("filter_ignored_packages", window.filter_ignored_packages, setup=reset_pending),
+        Case("populate_package_list", window.populate_package_list, setup=reset_pending),
+        Case("package progress panel", build_progress, setup=reset_progress),
+        Case("load_dependency_graph", lambda: load_dependency_graph(pending, sync_dir)),
+    ]
+
+
+def load_baseline(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print a table against the baseline, return the names of regressed cases"""
+    regressions = []
+    cases = baseline.get('cases', {}) if baseline else {}
+    print(f"{'case':<32} {'median':>10} {'min':>10} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        line = f"{name:<32} {result['median'] * 1000:>8.1f}ms {result['min'] * 1000:>8.1f}ms"
+        base = cases.get(name)
+        if base:
+            change = result['median'] / base['median'] - 1 if base['median'] else 0.0
+            line += f" {base['median'] * 1000:>8.1f}ms {change:>+7.0%}"
+            if change > threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="small fixtures (20 MiB log, 500 packages)")
+    parser.add_argument("--log-size", type=int, metavar="MIB", help="pacman.log size (default 500)")
+    parser.add_argument("--packages", type=int, help="pending packages in checkupdates output (default 2000)")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per case (heavy cases at most 2)")
+    parser.add_argument("--case", action="append", help="only run cases whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown of the median that counts as a regression (default 0.25)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    sizes = {'log_mb': 20, 'packages': 500} if args.quick else {'log_mb': 500, 'packages': 2000}
+    if args.log_size:
+        sizes['log_mb'] = args.log_size
+    if args.packages:
+        sizes['packages'] = args.packages
+    sizes['transcript'] = min(sizes['packages'], 300)
+    sizes['sync_extra'] = sizes['packages'] * 10
+
+    prepare_environment(sizes)
+    print(f"Preparing fixtures in {FIXTURE_DIR} ...", file=sys.stderr)
+    cases = build_cases(sizes)
+    if args.case:
+        cases = [case for case in cases if any(part in case.name for part in args.case)]
+
+    results = {}
+    for case in cases:
+        print(f"Running {case.name} ...", file=sys.stderr)
+        results[case.name] = case.measure(min(args.repeat, 2) if case.heavy else args.repeat)
+
+    meta = {'sizes': sizes, 'python': platform.python_version(), 'machine': platform.machine(),
+            'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+    if args.json:
+        json.dump({'meta': meta, 'cases': results}, sys.stdout, indent=2)
+        print()
+
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get('meta', {}).get('sizes') != sizes:
+        print(f"Baseline was recorded with other fixture sizes ({baseline['meta'].get('sizes')}), not comparing",
+              file=sys.stderr)
+        baseline = None
+    regressions = compare(results, baseline, args.threshold) if not args.json else []
+
+    if args.save_baseline:
+        merged = dict(baseline.get('cases', {})) if baseline else {}
+        merged.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'meta': meta, 'cases': merged}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+    elif baseline is None and not args.json:
+        print("No baseline to compare against; run with --save-baseline first", file=sys.stderr)
+    return 1 if regressions and not args.save_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -56,7 +56,6 @@ install_dependencies() {
         "python-virtualenv"
         "pacman-contrib"
         "zenity"
-        "libnotify"
     )
     
     # Check for yay
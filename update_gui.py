@@ -5,9 +5,19 @@ import subprocess
 import os
 import re
 import time
-import json
+import signal
+import shlex
+import shutil
+import tempfile
 from datetime import datetime
-from threading import Thread
+from threading import Event
+
+# Headless modes share the engine but must not pay for loading Qt
+HEADLESS_ARGS = ("--check", "--daemon", "--history", "--hook-times", "--profiles", "--install-timer", "--remove-timer",
+                 "--serve-cache", "--help", "-h")
+if __name__ == "__main__" and any(arg.split('=', 1)[0] in HEADLESS_ARGS for arg in sys.argv[1:]):
+    from archupdate.cli import main
+    sys.exit(main(sys.argv[1:], prog=os.path.basename(sys.argv[0])))
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -15,28 +25,72 @@ from PySide6.QtWidgets import (
     QStackedWidget, QDialog, QColorDialog, QFormLayout, QScrollArea,
     QSystemTrayIcon, QMenu, QCheckBox, QSpinBox, QLineEdit, QTreeWidget,
     QTreeWidgetItem, QGroupBox, QMessageBox, QTabWidget, QListWidgetItem,
-    QFrame, QComboBox, QSlider, QFontComboBox, QSplitter, QStatusBar
+    QFrame, QComboBox, QSlider, QFontComboBox, QSplitter, QStatusBar,
+    QTreeView, QDateEdit, QFileDialog
+)
+from PySide6.QtCore import (
+    QProcess, Qt, QSettings, Signal, QObject, QTimer, QEvent, QPropertyAnimation, QEasingCurve,
+    QAbstractItemModel, QModelIndex, QDate, QRectF, QFileSystemWatcher, QSocketNotifier, QByteArray, QThreadPool
+)
+from PySide6.QtGui import QPalette, QColor, QIcon, QAction, QFont, QPixmap, QPainter, QBrush, QLinearGradient, QPen
+
+from archupdate.config import (
+    PACMAN_LOG, CHECKUPDATES_CMD, YAY_CMD, PACMAN_CMD, PKEXEC_CMD, SUDO_CMD,
+    ZENITY_CMD, TERMINAL_CMD, TERMINAL_EXEC_FLAG, CONFIG_DIR,
+    LAST_CHECK_FILE, MIRRORLIST, REPLAY_DIR, REPLAY_SPEED, DB_LOCK_FILE,
+    CACHE_PEERS, FLEET_INVENTORY, PIPELINE_STATE_FILE
+)
+from archupdate.history import HistoryStore, package_record
+from archupdate.formatting import format_size, format_duration
+from archupdate.analytics import load_analytics
+from archupdate.check import (
+    CheckResult, parse_update_lines, check_failed, save_check_result, load_check_result
+)
+from archupdate.timer import systemd_user_available, install_timer, remove_timer, timer_installed
+from archupdate.schedule import CheckScheduler, SystemEvents
+from archupdate.sync import (
+    sync_databases, sync_complete, describe_sync, reusable_databases, install_databases_command, total_saved
+)
+from archupdate.phases import TransactionTimer, HOOK_PHASES, PHASE_LABELS
+from archupdate.transfers import (
+    TransferTracker, PartialDownloads, REFRESH_INTERVAL, parse_progress_line, package_name_from_file,
+    download_label, describe_transfer, describe_file_progress
+)
+from archupdate.profile import RunProfile, save_profile, export_profile
+from archupdate.replay import RecordingLibrary, schedule
+from archupdate.snapshots import (
+    SNAPSHOT_BUDGET, SNAPSHOT_KEEP, Snapshot, SnapshotError, detect_backend, backend_for, should_snapshot,
+    create_snapshot, prune_snapshots
+)
+from archupdate.cancel import (
+    Cancelled, SAFE_PHASES, kill_tree, running, installing, cleanup_interrupted_transaction, cleanup_interrupted_check,
+    log_offset, transaction_started
+)
+from archupdate.cache import (
+    CATEGORIES, CATEGORY_LABELS, cache_dirs, analyze_cache, describe_report, reclaimable_bytes, remove_files
+)
+from archupdate.peers import fetch_from_peers, describe_peers, install_packages_command
+from archupdate.fleet import (
+    FLEET_WORKERS, SSHPool, load_inventory, stages, check_fleet, aggregate_pending, rollout, describe_check
+)
+from archupdate.jobs import CANCEL_POLL, JobResult, run_command, command_failed
+from archupdate.pipeline import (
+    STAGE_LABELS, RUNNING, DONE, SKIPPED, UpdatePipeline, load_pipeline, describe_pipeline, verify_versions
+)
+from archupdate.news import fetch_news, relevant_news, acknowledge_news
+from archupdate.mirrors import (
+    parse_mirrorlist, benchmark_mirrors, save_benchmark, load_benchmark,
+    reorder_mirrorlist, write_mirrorlist, estimated_time
+)
+from archupdate.notify import DesktopNotifications, NOTIFY_APP_NAME, URGENCY_NORMAL, URGENCY_CRITICAL
+from archupdate.resolver import load_dependency_graph, parse_pending_line
+from archupdate.ignore import (
+    load_ignored_packages, save_ignored_packages, get_ignore_list,
+    parse_pacman_conf_ignores
 )
-from PySide6.QtCore import QProcess, Qt, QSettings, Signal, QObject, QTimer, QEvent, QPropertyAnimation, QEasingCurve
-from PySide6.QtGui import QPalette, QColor, QIcon, QAction, QFont, QPixmap, QPainter, QBrush, QLinearGradient
-
-# --- Configuration ---
-PACMAN_LOG = "/var/log/pacman.log"
-CHECKUPDATES_CMD = "/usr/bin/checkupdates"
-YAY_CMD = "/usr/bin/yay"
-PACMAN_CMD = "/usr/bin/pacman"
-PKEXEC_CMD = "/usr/bin/pkexec"
-SUDO_CMD = "/usr/bin/sudo"
-ZENITY_CMD = "/usr/bin/zenity"
-TERMINAL_CMD = "foot"
-TERMINAL_EXEC_FLAG = "-e"
-
-# Add new configuration
-UPDATE_HISTORY_FILE = os.path.expanduser("~/.config/MyOrg/update_history.json")
-IGNORED_PACKAGES_FILE = os.path.expanduser("~/.config/MyOrg/ignored_packages.json")
 
 # Ensure config directory exists
-os.makedirs(os.path.dirname(UPDATE_HISTORY_FILE), exist_ok=True)
+os.makedirs(CONFIG_DIR, exist_ok=True)
 
 # --- Enhanced Theme Presets ---
 THEME_PRESETS = {
@@ -192,135 +246,694 @@ THEME_PRESETS = {
     }
 }
 
+# --- Theme Engine ---
+# One application-level stylesheet for every window, dialog and progress row.
+# Text and base colours come from the QPalette; the sheet only carries what a
+# palette cannot express (gradients, borders, radii, padding).
+APP_STYLESHEET = """
+    QMainWindow {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+            stop:0 {window_bg}, stop:1 {secondary_bg});
+    }}
+    QDialog {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+            stop:0 {window_bg}, stop:1 {secondary_bg});
+    }}
+    
+    CardWidget {{
+        background: rgba(255, 255, 255, 0.05);
+        border: 1px solid {border};
+        border-radius: 12px;
+    }}
+    
+    QListWidget {{
+        background: rgba(0, 0, 0, 0.2);
+        border: 1px solid {border};
+        border-radius: 8px;
+        selection-background-color: {accent};
+    }}
+    PackageCard QListWidget {{
+        border: none;
+        background: transparent;
+        outline: none;
+    }}
+    PackageCard QListWidget::item {{
+        padding: 8px;
+        border-radius: 6px;
+        margin-bottom: 2px;
+    }}
+    PackageCard QListWidget::item:selected {{
+        background: rgba(255, 255, 255, 0.1);
+    }}
+    QLabel#statsLabel {{
+        color: rgba(255, 255, 255, 0.7);
+        font-size: 12px;
+    }}
+    QLabel#transferLabel {{
+        color: rgba(255, 255, 255, 0.7);
+        font-size: 12px;
+    }}
+    
+    QScrollArea {{
+        border: none;
+        background: transparent;
+    }}
+    
+    StatusCard QProgressBar {{
+        border: none;
+        border-radius: 5px;
+        background-color: rgba(255, 255, 255, 0.08);
+        text-align: center;
+    }}
+    StatusCard QProgressBar::chunk {{
+        background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+            stop:0 #56b06c, stop:1 #4a9d60);
+        border-radius: 5px;
+    }}
+    
+    QLabel#packageName {{
+        font-weight: bold;
+        font-size: 13px;
+    }}
+    QLabel#packageStatus {{
+        font-size: 12px;
+        color: rgba(255, 255, 255, 0.8);
+    }}
+    QProgressBar#packageProgress {{
+        border: 1px solid rgba(255, 255, 255, 0.2);
+        border-radius: 4px;
+        background: rgba(0, 0, 0, 0.2);
+        text-align: center;
+        font-size: 11px;
+    }}
+    QProgressBar#packageProgress::chunk {{
+        background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+            stop:0 #4CAF50, stop:1 #45a049);
+        border-radius: 3px;
+    }}
+    
+    QTextEdit#logView {{
+        background: rgba(0, 0, 0, 0.3);
+        color: white;
+        border: 1px solid rgba(255, 255, 255, 0.2);
+        border-radius: 8px;
+        padding: 10px;
+        font-family: 'Monospace';
+        font-size: 12px;
+    }}
+    
+    ActionButton {{
+        background: rgba(255, 255, 255, 0.08);
+        color: white;
+        border: 1px solid rgba(255, 255, 255, 0.15);
+        border-radius: 8px;
+        font-size: 14px;
+        padding: 8px 16px;
+    }}
+    ActionButton:hover {{
+        background: rgba(255, 255, 255, 0.15);
+        border-color: rgba(255, 255, 255, 0.25);
+    }}
+    ActionButton:pressed {{
+        background: rgba(255, 255, 255, 0.2);
+    }}
+    ActionButton:disabled {{
+        background: rgba(255, 255, 255, 0.03);
+        color: #666666;
+        border-color: rgba(255, 255, 255, 0.05);
+    }}
+    ActionButton[primary="true"] {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+            stop:0 #56b06c, stop:1 #4a9d60);
+        border: none;
+        font-weight: bold;
+    }}
+    ActionButton[primary="true"]:hover {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+            stop:0 #66c07c, stop:1 #5aad70);
+    }}
+    ActionButton[primary="true"]:pressed {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+            stop:0 #4a9d60, stop:1 #3e8d54);
+    }}
+    ActionButton[primary="true"]:disabled {{
+        background: #555555;
+        color: #888888;
+    }}
+    
+    QMenuBar {{
+        background: rgba(0, 0, 0, 0.2);
+        border-bottom: 1px solid {border};
+    }}
+    QMenuBar::item {{
+        background: transparent;
+        padding: 8px 12px;
+        border-radius: 4px;
+    }}
+    QMenuBar::item:selected {{
+        background: {accent};
+    }}
+    QMenu {{
+        background: {window_bg};
+        border: 1px solid {border};
+        border-radius: 8px;
+    }}
+    QMenu::item {{
+        padding: 8px 20px;
+        border-radius: 4px;
+    }}
+    QMenu::item:selected {{
+        background: {accent};
+    }}
+    
+    QStatusBar {{
+        background: rgba(0, 0, 0, 0.1);
+        border-top: 1px solid {border};
+        padding: 5px 10px;
+    }}
+    
+    QTabWidget::pane {{
+        border: 1px solid {border};
+        border-radius: 8px;
+        background: rgba(0, 0, 0, 0.2);
+    }}
+    QTabBar::tab {{
+        background: rgba(255, 255, 255, 0.1);
+        border: 1px solid {border};
+        border-radius: 6px;
+        padding: 8px 16px;
+        margin-right: 2px;
+    }}
+    QTabBar::tab:selected {{
+        background: {accent};
+        color: {window_bg};
+    }}
+    QGroupBox {{
+        font-weight: bold;
+        border: 2px solid {border};
+        border-radius: 8px;
+        margin-top: 10px;
+        padding-top: 10px;
+    }}
+    QGroupBox::title {{
+        subcontrol-origin: margin;
+        left: 10px;
+        padding: 0 5px 0 5px;
+    }}
+    QComboBox {{
+        background: rgba(255, 255, 255, 0.1);
+        border: 1px solid {border};
+        border-radius: 4px;
+        padding: 5px;
+    }}
+    QComboBox QAbstractItemView {{
+        background: {list_bg};
+        selection-background-color: {accent};
+    }}
+    QSpinBox, QLineEdit, QDateEdit {{
+        background: rgba(255, 255, 255, 0.1);
+        border: 1px solid {border};
+        border-radius: 4px;
+        padding: 5px;
+    }}
+    QCheckBox::indicator {{
+        width: 18px;
+        height: 18px;
+        border-radius: 3px;
+        border: 2px solid {border};
+        background: rgba(255, 255, 255, 0.1);
+    }}
+    QCheckBox::indicator:checked {{
+        background: {accent};
+        border-color: {accent};
+    }}
+    
+    PackageSearchDialog QLineEdit {{
+        padding: 10px;
+        border: 2px solid {border};
+        border-radius: 8px;
+        background: rgba(0, 0, 0, 0.3);
+    }}
+    QTreeWidget, QTreeView {{
+        border: 2px solid {border};
+        border-radius: 8px;
+        background: rgba(0, 0, 0, 0.2);
+    }}
+"""
+
+_compiled_themes = {}
+_applied_theme = None
+
+def build_palette(theme):
+    palette = QPalette()
+    text = QColor(theme["text_fg"])
+    placeholder = QColor(text)
+    placeholder.setAlpha(128)
+    
+    palette.setColor(QPalette.Window, QColor(theme["window_bg"]))
+    palette.setColor(QPalette.WindowText, text)
+    palette.setColor(QPalette.Base, QColor(theme["list_bg"]))
+    palette.setColor(QPalette.AlternateBase, QColor(theme["secondary_bg"]))
+    palette.setColor(QPalette.Text, text)
+    palette.setColor(QPalette.PlaceholderText, placeholder)
+    palette.setColor(QPalette.Button, QColor(theme["button_bg"]))
+    palette.setColor(QPalette.ButtonText, QColor(theme["button_fg"]))
+    palette.setColor(QPalette.Highlight, QColor(theme["accent"]))
+    palette.setColor(QPalette.HighlightedText, QColor(theme["window_bg"]))
+    palette.setColor(QPalette.ToolTipBase, QColor(theme["window_bg"]))
+    palette.setColor(QPalette.ToolTipText, text)
+    palette.setColor(QPalette.Link, QColor(theme["accent"]))
+    palette.setColor(QPalette.BrightText, QColor(theme["error"]))
+    palette.setColor(QPalette.Mid, QColor(theme["border"]))
+    return palette
+
+def compile_theme(theme_name):
+    """Return the cached (QPalette, stylesheet) pair of a theme preset"""
+    if theme_name not in THEME_PRESETS:
+        theme_name = "Dark Professional"
+    if theme_name not in _compiled_themes:
+        theme = THEME_PRESETS[theme_name]
+        _compiled_themes[theme_name] = (build_palette(theme), APP_STYLESHEET.format(**theme))
+    return _compiled_themes[theme_name]
+
+def apply_theme(theme_name):
+    """Install a theme on the application, a no-op if it is already active"""
+    global _applied_theme
+    if theme_name not in THEME_PRESETS:
+        theme_name = "Dark Professional"
+    if theme_name == _applied_theme:
+        return False
+    
+    palette, stylesheet = compile_theme(theme_name)
+    app = QApplication.instance()
+    app.setPalette(palette)
+    app.setStyleSheet(stylesheet)
+    _applied_theme = theme_name
+    return True
+
 # --- Helper Functions ---
 def get_color_setting(settings, key, default_color):
     color_str = settings.value(key, default_color)
     return QColor(color_str)
 
-def check_polkit_agent():
+POLKIT_AGENTS = [
+    'polkit-kde-authentication-agent',
+    'polkit-gnome-authentication-agent',
+    'lxpolkit',
+    '/usr/lib/polkit-kde-authentication-agent-1',
+    '/usr/lib/polkit-gnome/polkit-gnome-authentication-agent-1'
+]
+
+def check_polkit_agent(cancel=None):
     """Check if a polkit agent is running"""
-    try:
-        agents = [
-            'polkit-kde-authentication-agent',
-            'polkit-gnome-authentication-agent',
-            'lxpolkit',
-            '/usr/lib/polkit-kde-authentication-agent-1',
-            '/usr/lib/polkit-gnome/polkit-gnome-authentication-agent-1'
-        ]
-        
-        for agent in agents:
-            result = subprocess.run(['pgrep', '-f', agent], 
-                                  capture_output=True, timeout=2)
-            if result.returncode == 0:
-                return True
-        
-        if not os.environ.get('DISPLAY'):
-            return False
-            
-        return False
-    except:
-        return False
+    result = run_command(['pgrep', '-f', '|'.join(POLKIT_AGENTS)], timeout=2, cancel=cancel)
+    return result.returncode == 0
 
-def load_update_history():
-    """Load update history from JSON file"""
-    try:
-        if os.path.exists(UPDATE_HISTORY_FILE):
-            with open(UPDATE_HISTORY_FILE, 'r') as f:
-                return json.load(f)
-    except:
-        pass
-    return []
-
-def save_update_history(history):
-    """Save update history to JSON file"""
-    try:
-        with open(UPDATE_HISTORY_FILE, 'w') as f:
-            json.dump(history, f, indent=2)
-    except Exception as e:
-        print(f"Failed to save history: {e}")
+# --- Authentication ---
+def zenity_authenticate(cancel=None):
+    """Ask for the password with zenity and cache the sudo credentials; return an error message or None"""
+    if not os.path.exists(ZENITY_CMD):
+        return "Zenity not available"
+    prompt = run_command([ZENITY_CMD, '--password', '--title=Arch Update GUI Authentication'],
+                         timeout=120, cancel=cancel)
+    if prompt.error:
+        return f"Authentication {prompt.error}"
+    if prompt.returncode != 0 or not prompt.stdout.strip():
+        return "Authentication cancelled"
+    auth = run_command([SUDO_CMD, '-S', '-v'], timeout=10, cancel=cancel, input=prompt.stdout.strip() + '\n')
+    if auth.error:
+        return f"Authentication {auth.error}"
+    if auth.returncode != 0:
+        return "Incorrect password"
+    return None
 
-def load_ignored_packages():
-    """Load ignored packages list"""
-    try:
-        if os.path.exists(IGNORED_PACKAGES_FILE):
-            with open(IGNORED_PACKAGES_FILE, 'r') as f:
-                return json.load(f)
-    except:
-        pass
-    return []
-
-def save_ignored_packages(packages):
-    """Save ignored packages list"""
-    try:
-        with open(IGNORED_PACKAGES_FILE, 'w') as f:
-            json.dump(packages, f, indent=2)
-    except Exception as e:
-        print(f"Failed to save ignored packages: {e}")
+# --- Notification Dispatcher ---
+class Notifier(QObject):
+    """Coalesced desktop notifications over a single D-Bus connection
 
-# --- Auth Worker ---
-class AuthWorker(QObject):
-    finished = Signal(bool)
-    error = Signal(str)
-    
-    def __init__(self, use_zenity=True):
-        super().__init__()
-        self.use_zenity = use_zenity
-    
-    def run(self):
-        try:
-            if self.use_zenity and os.path.exists(ZENITY_CMD):
-                result = subprocess.run(
-                    [ZENITY_CMD, '--password', '--title=Arch Update GUI Authentication'],
-                    capture_output=True,
-                    text=True,
-                    timeout=120
-                )
-                
-                if result.returncode == 0 and result.stdout.strip():
-                    password = result.stdout.strip()
-                    
-                    auth_result = subprocess.run(
-                        [SUDO_CMD, '-S', '-v'],
-                        input=password + '\n',
-                        capture_output=True,
-                        text=True,
-                        timeout=10
-                    )
-                    
-                    if auth_result.returncode == 0:
-                        self.finished.emit(True)
-                    else:
-                        self.error.emit("Incorrect password")
-                        self.finished.emit(False)
-                else:
-                    self.error.emit("Authentication cancelled")
-                    self.finished.emit(False)
+    Notifications posted within COALESCE_MS are sent together and only the
+    latest one per key survives. Each key keeps the id the server returned,
+    so a newer message (e.g. progress) replaces its popup in place instead of
+    stacking. Without a notification server the tray icon is used instead.
+    """
+    COALESCE_MS = 300
+
+    def __init__(self, settings, tray_icon, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.tray_icon = tray_icon
+        self.desktop = DesktopNotifications()
+        # One thread, so the D-Bus connection is never used by two sends at once
+        self.jobs = JobRunner(self, max_threads=1)
+        self.sending = None
+        self.pending = {}
+        self.ids = {}
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(self.COALESCE_MS)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def notify(self, key, body, urgency=URGENCY_NORMAL, summary=NOTIFY_APP_NAME, timeout=5000):
+        if not self.settings.value("show_notifications", True, type=bool):
+            return
+        self.pending.pop(key, None)
+        self.pending[key] = (summary, body, urgency, timeout)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def send(self, pending, ids):
+        """{key: id or None} for pending, None where the server could not be reached"""
+        return {key: self.desktop.notify(summary, body, urgency, ids.get(key, 0), timeout)
+                for key, (summary, body, urgency, timeout) in pending.items()}
+
+    def flush(self):
+        """Send the pending notifications in the background; a hung server must not freeze the GUI"""
+        if self.sending is not None or not self.pending:
+            # Whatever arrives meanwhile goes out when the running send is done
+            return
+        pending, self.pending = self.pending, {}
+        ids = dict(self.ids)
+        self.sending = self.jobs.submit("notify", lambda job: self.send(pending, ids),
+                                        lambda result: self.sent(pending, result))
+
+    def sent(self, pending, result):
+        self.sending = None
+        sent = result.value or {}
+        for key, (summary, body, urgency, timeout) in pending.items():
+            if sent.get(key) is not None:
+                self.ids[key] = sent[key]
             else:
-                self.error.emit("Zenity not available")
-                self.finished.emit(False)
-                
-        except subprocess.TimeoutExpired:
-            self.error.emit("Authentication timed out")
-            self.finished.emit(False)
-        except Exception as e:
-            self.error.emit(str(e))
-            self.finished.emit(False)
+                icon = QSystemTrayIcon.Critical if urgency == URGENCY_CRITICAL else QSystemTrayIcon.Information
+                self.tray_icon.showMessage(summary, body, icon, timeout)
+        if self.pending and not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def close(self):
+        """On quit: let a running send finish, then send what is left in the foreground"""
+        self.flush_timer.stop()
+        self.jobs.pool.waitForDone()
+        self.sending = None
+        if self.pending:
+            self.send(self.pending, self.ids)
+            self.pending = {}
+        self.desktop.close()
 
-# --- Custom Events ---
-class YayFinishedEvent(QEvent):
+# --- Jobs ---
+# Seconds the AUR update in the terminal may take before it is stopped
+YAY_TIMEOUT = 600
+
+class JobDoneEvent(QEvent):
     EVENT_TYPE = QEvent.Type(QEvent.registerEventType())
     
-    def __init__(self, returncode, error=None):
+    def __init__(self, job, result):
         super().__init__(self.EVENT_TYPE)
-        self.returncode = returncode
-        self.error = error
+        self.job = job
+        self.result = result
 
-class SearchCompleteEvent(QEvent):
+class JobProgressEvent(QEvent):
     EVENT_TYPE = QEvent.Type(QEvent.registerEventType())
     
-    def __init__(self, packages):
+    def __init__(self, job, payload):
         super().__init__(self.EVENT_TYPE)
-        self.packages = packages
+        self.job = job
+        self.payload = payload
+
+class Job:
+    """A submitted piece of background work; its function gets the Job as only argument
+
+    The function watches job.cancel_event (or passes it on to what it
+    calls) and may send intermediate results with job.report().
+    """
+    
+    def __init__(self, runner, name, fn, on_done, on_progress, timeout):
+        self.runner = runner
+        self.name = name
+        self.fn = fn
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.timeout = timeout
+        self.cancel_event = Event()
+        self.started = time.monotonic()
+        self.result = None
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+    
+    def done(self):
+        return self.result is not None
+    
+    def report(self, payload):
+        """Hand payload to on_progress in the GUI thread; callable from the job's thread"""
+        self.runner.post(JobProgressEvent(self, payload))
+
+class JobRunner(QObject):
+    """Background jobs on a bounded QThreadPool, with results delivered in the GUI thread
+
+    on_done gets a JobResult. A job past its timeout is cancelled and
+    reported as timed out at once; whatever it returns later is dropped.
+    Jobs of a deleted runner (a closed dialog) finish without calling back.
+    Everything is cancelled on quit, as the pool waits for its threads.
+    """
+    MAX_THREADS = 6
+    
+    def __init__(self, parent=None, max_threads=MAX_THREADS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.jobs = set()
+        QApplication.instance().aboutToQuit.connect(self.cancel_all)
+    
+    def submit(self, name, fn, on_done=None, timeout=None, on_progress=None):
+        job = Job(self, name, fn, on_done, on_progress, timeout)
+        self.jobs.add(job)
+        if timeout:
+            QTimer.singleShot(int(timeout * 1000), self, lambda: self.time_out(job))
+        self.pool.start(lambda: self.execute(job))
+        return job
+    
+    def command(self, name, argv, on_done=None, timeout=None, input=None):
+        """Job running argv; its value is a CommandResult, its timeout kills the command"""
+        return self.submit(name, lambda job: run_command(argv, timeout, job.cancel_event, input), on_done)
+    
+    def execute(self, job):
+        value = error = None
+        try:
+            value = job.fn(job)
+        except Cancelled:
+            error = "cancelled"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        self.post(JobDoneEvent(job, JobResult(job.name, value, error, job.cancelled, False,
+                                              time.monotonic() - job.started)))
+    
+    def post(self, event):
+        try:
+            QApplication.instance().postEvent(self, event)
+        except RuntimeError:
+            # The runner was deleted along with its dialog
+            pass
+    
+    def time_out(self, job):
+        if job.done():
+            return
+        job.cancel()
+        self.finish(job, JobResult(job.name, None, f"timed out after {format_duration(job.timeout)}", True, True,
+                                   time.monotonic() - job.started))
+    
+    def finish(self, job, result):
+        if job.done():
+            return
+        job.result = result
+        self.jobs.discard(job)
+        if job.on_done:
+            job.on_done(result)
+    
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+    
+    def event(self, e):
+        if isinstance(e, JobDoneEvent):
+            self.finish(e.job, e.result)
+            return True
+        if isinstance(e, JobProgressEvent):
+            if not e.job.done() and e.job.on_progress:
+                e.job.on_progress(e.payload)
+            return True
+        return super().event(e)
+
+# --- Process Backends ---
+class FrameMonitor(QObject):
+    """Counts frames the event loop missed while something streams into the UI"""
+    FRAME_MS = 16
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.FRAME_MS)
+        self.timer.timeout.connect(self.tick)
+        self.dropped = 0
+        self.longest_stall = 0.0
+        self.last_tick = None
+    
+    def start(self):
+        self.dropped = 0
+        self.longest_stall = 0.0
+        self.last_tick = time.perf_counter()
+        self.timer.start()
+    
+    def tick(self):
+        now = time.perf_counter()
+        elapsed = now - self.last_tick
+        self.last_tick = now
+        self.longest_stall = max(self.longest_stall, elapsed)
+        self.dropped += max(0, int(elapsed * 1000 / self.FRAME_MS) - 1)
+    
+    def stop(self):
+        self.timer.stop()
+        if self.last_tick is not None:
+            self.tick()
+
+class ReplayProcess(QObject):
+    """QProcess stand-in that streams a recorded transcript
+    
+    Only the part of the QProcess API the window uses is provided. Output
+    is delivered one recorded read at a time through the event loop, with
+    the original spacing divided by speed, or back to back at speed 0.
+    """
+    started = Signal()
+    readyReadStandardOutput = Signal()
+    readyReadStandardError = Signal()
+    finished = Signal(int, QProcess.ExitStatus)
+    errorOccurred = Signal(QProcess.ProcessError)
+    
+    def __init__(self, library, speed=1.0, parent=None):
+        super().__init__(parent)
+        self.library = library
+        self.speed = speed
+        self.buffers = {"out": bytearray(), "err": bytearray()}
+        self.pending = []
+        self.recording = None
+        self.running = False
+        self.exit_code = 0
+        self.exit_status = QProcess.NormalExit
+        self.clock = None
+        self.stats = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.deliver)
+        self.frames = FrameMonitor(self)
+    
+    def start(self, program, args=()):
+        self.recording = self.library.find(program, args)
+        if self.recording is None:
+            print(f"No recording for: {program} {' '.join(args)}")
+            QTimer.singleShot(0, lambda: self.errorOccurred.emit(QProcess.FailedToStart))
+            return
+        self.pending = schedule(self.recording, self.speed)
+        self.pending.append(((self.recording.duration / self.speed) if self.speed else 0.0, None, None))
+        self.pending.reverse()
+        self.running = True
+        self.exit_status = QProcess.NormalExit
+        self.stats = {"reads": 0, "bytes": 0}
+        self.clock = time.perf_counter()
+        self.frames.start()
+        self.started.emit()
+        self.timer.start(0)
+    
+    def deliver(self):
+        """Emit the next due read, or finish, then wait for the one after"""
+        if not self.running:
+            return
+        delay, fd, text = self.pending.pop()
+        if fd is None:
+            self.finish(self.recording.exit_code, QProcess.NormalExit)
+            return
+        data = text.encode()
+        self.buffers[fd] += data
+        self.stats["reads"] += 1
+        self.stats["bytes"] += len(data)
+        (self.readyReadStandardOutput if fd == "out" else self.readyReadStandardError).emit()
+        if self.running and self.pending:
+            wait = self.pending[-1][0] - (time.perf_counter() - self.clock)
+            self.timer.start(max(0, int(wait * 1000)))
+    
+    def finish(self, exit_code, exit_status):
+        self.running = False
+        self.timer.stop()
+        self.frames.stop()
+        self.exit_code = exit_code
+        self.exit_status = exit_status
+        self.stats.update(wall=time.perf_counter() - self.clock, dropped=self.frames.dropped,
+                          stall=self.frames.longest_stall)
+        self.finished.emit(exit_code, exit_status)
+    
+    def kill(self):
+        if self.running:
+            self.finish(-1, QProcess.CrashExit)
+    
+    terminate = kill
+    
+    def processId(self):
+        return 0
+    
+    def state(self):
+        return QProcess.Running if self.running else QProcess.NotRunning
+    
+    def exitCode(self):
+        return self.exit_code
+    
+    def exitStatus(self):
+        return self.exit_status
+    
+    def readAllStandardOutput(self):
+        data, self.buffers["out"] = bytes(self.buffers["out"]), bytearray()
+        return QByteArray(data)
+    
+    def readAllStandardError(self):
+        data, self.buffers["err"] = bytes(self.buffers["err"]), bytearray()
+        return QByteArray(data)
+    
+    def describe_stats(self):
+        if not self.stats or "wall" not in self.stats:
+            return ""
+        s = self.stats
+        return (f"Replay: {s['reads']} reads, {format_size(s['bytes'])} in {s['wall']:.2f}s, "
+                f"{s['dropped']} frames dropped, longest stall {s['stall'] * 1000:.0f} ms\n")
+
+class QProcessBackend:
+    """Runs sudo/pacman/yay for real"""
+    replay = False
+    
+    def create_process(self, parent):
+        return QProcess(parent)
+    
+    def describe(self, process):
+        return ""
+
+class ReplayBackend:
+    """Replays recorded transcripts; authentication, database sync and the AUR terminal are skipped"""
+    replay = True
+    
+    def __init__(self, directory, speed=1.0):
+        self.library = RecordingLibrary(directory)
+        self.speed = speed
+    
+    def create_process(self, parent):
+        return ReplayProcess(self.library, self.speed, parent)
+    
+    def describe(self, process):
+        return process.describe_stats()
+
+def default_process_backend():
+    if REPLAY_DIR:
+        print(f"Replaying recorded transcripts from {REPLAY_DIR} at speed {REPLAY_SPEED:g}")
+        return ReplayBackend(REPLAY_DIR, REPLAY_SPEED)
+    return QProcessBackend()
 
 # --- Beautiful Card Widget ---
 class CardWidget(QFrame):
@@ -365,20 +978,13 @@ class StatusCard(CardWidget):
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
         self.progress_bar.setFixedHeight(10)
-        self.progress_bar.setStyleSheet("""
-            QProgressBar {
-                border: none;
-                border-radius: 5px;
-                background-color: rgba(255, 255, 255, 0.08);
-                text-align: center;
-            }
-            QProgressBar::chunk {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #56b06c, stop:1 #4a9d60);
-                border-radius: 5px;
-            }
-        """)
         self.content_layout.addWidget(self.progress_bar)
+        
+        # Download totals, rate and ETA while packages or databases download
+        self.transfer_label = QLabel()
+        self.transfer_label.setObjectName("transferLabel")
+        self.transfer_label.setVisible(False)
+        self.content_layout.addWidget(self.transfer_label)
 
 # --- Beautiful Package Card ---
 class PackageCard(CardWidget):
@@ -386,26 +992,11 @@ class PackageCard(CardWidget):
         super().__init__("Available Updates", parent)
         
         self.package_list = QListWidget()
-        self.package_list.setStyleSheet("""
-            QListWidget {
-                border: none;
-                background: transparent;
-                outline: none;
-            }
-            QListWidget::item {
-                padding: 8px;
-                border-radius: 6px;
-                margin-bottom: 2px;
-            }
-            QListWidget::item:selected {
-                background: rgba(255, 255, 255, 0.1);
-            }
-        """)
         self.content_layout.addWidget(self.package_list)
         
         # Stats
         self.stats_label = QLabel("0 updates available")
-        self.stats_label.setStyleSheet("color: rgba(255, 255, 255, 0.7); font-size: 12px;")
+        self.stats_label.setObjectName("statsLabel")
         self.content_layout.addWidget(self.stats_label)
 
 # --- Beautiful Action Buttons ---
@@ -416,54 +1007,8 @@ class ActionButton(QPushButton):
         self.setMinimumWidth(120)
         self.setCursor(Qt.PointingHandCursor)
         
-        if primary:
-            self.setStyleSheet("""
-                QPushButton {
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                        stop:0 #56b06c, stop:1 #4a9d60);
-                    color: white;
-                    border: none;
-                    border-radius: 8px;
-                    font-weight: bold;
-                    font-size: 14px;
-                    padding: 8px 16px;
-                }
-                QPushButton:hover {
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                        stop:0 #66c07c, stop:1 #5aad70);
-                }
-                QPushButton:pressed {
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                        stop:0 #4a9d60, stop:1 #3e8d54);
-                }
-                QPushButton:disabled {
-                    background: #555555;
-                    color: #888888;
-                }
-            """)
-        else:
-            self.setStyleSheet("""
-                QPushButton {
-                    background: rgba(255, 255, 255, 0.08);
-                    color: white;
-                    border: 1px solid rgba(255, 255, 255, 0.15);
-                    border-radius: 8px;
-                    font-size: 14px;
-                    padding: 8px 16px;
-                }
-                QPushButton:hover {
-                    background: rgba(255, 255, 255, 0.15);
-                    border-color: rgba(255, 255, 255, 0.25);
-                }
-                QPushButton:pressed {
-                    background: rgba(255, 255, 255, 0.2);
-                }
-                QPushButton:disabled {
-                    background: rgba(255, 255, 255, 0.03);
-                    color: #666666;
-                    border-color: rgba(255, 255, 255, 0.05);
-                }
-            """)
+        # Styled by the application stylesheet, see APP_STYLESHEET
+        self.setProperty("primary", primary)
         
         if icon_text:
             self.setText(f"{icon_text}  {text}")
@@ -472,11 +1017,23 @@ class ActionButton(QPushButton):
 
 # --- Main Application Window ---
 class UpdateAppWindow(QMainWindow):
-    def __init__(self):
+    # Method starting each stage of the update pipeline; check and plan are done once run_updates starts it.
+    # install only starts on its own when resumed, otherwise it is the second half of download's pacman run.
+    STAGE_STEPS = {
+        "snapshot": "start_snapshot",
+        "download": "start_peer_fetch",
+        "install": "resume_install",
+        "aur": "run_yay_update",
+        "verify": "start_verify",
+        "record": "finalize_update",
+    }
+    
+    def __init__(self, process_backend=None):
         super().__init__()
         self.setWindowTitle("Arch Update GUI")
         self.setGeometry(100, 100, 900, 700)
         self.settings = QSettings("MyOrg", "ArchUpdateGUI")
+        self.history = HistoryStore()
 
         self.pending_pacman = []
         self.pending_aur = []
@@ -485,29 +1042,75 @@ class UpdateAppWindow(QMainWindow):
         self.current_process = None
         self.package_widgets = {}
         self.current_package = None
+        self.package_started = {}
+        self.package_durations = {}
         self.authenticated = False
-        self.auth_thread = None
-        self.auth_worker = None
-        
-        has_polkit = check_polkit_agent()
-        self.use_terminal_sudo = not has_polkit
+        self.auth_job = None
+        self.dependency_graph = None
+        self.last_sync_report = None
+        self.transaction_timer = None
+        self.transfer_tracker = None
+        # Set by cancel_run: 'check' or 'update' once stopping, deferred while pacman commits
+        self.cancel_requested = None
+        self.cancel_deferred = False
+        # Jobs cancel_run stops: the database sync of a check, the peer fetch of an update
+        self.sync_job = None
+        self.peer_job = None
+        # End of pacman's log when the update started; a cancel checks it for a begun transaction
+        self.update_log_offset = 0
+        # Job reading pacman's download progress from its partial files
+        self.download_watch = None
+        # Set when pacman's download directory cannot be read: progress counts files, not bytes
+        self.downloads_per_file = False
+        self.download_file_count = None
+        self.yay_process = None
+        # What the LAN peers supplied for the running update, left out of pacman's download size
+        self.peer_report = None
+        # Snapshot taken before the running update, recorded with its history session
+        self.update_snapshot = None
+        # UpdatePipeline of the running update, None between updates
+        self.pipeline = None
+        self.transfer_timer = QTimer(self)
+        self.transfer_timer.setInterval(int(REFRESH_INTERVAL * 1000))
+        self.transfer_timer.timeout.connect(self.refresh_transfers)
+        self.profile = None
+        self.last_profile = None
+        self.graph_generation = 0
+        self.update_targets = None
+        self.selected_aur = []
+        
+        self.jobs = JobRunner(self)
+        self.use_terminal_sudo = True
+        self.jobs.submit("polkit agent", lambda job: check_polkit_agent(job.cancel_event),
+                         lambda result: setattr(self, 'use_terminal_sudo', not result.value))
 
         # Setup system tray
         self.setup_system_tray()
+        self.notifier = Notifier(self.settings, self.tray_icon, self)
+        QApplication.instance().aboutToQuit.connect(self.notifier.close)
         
-        # Setup auto-check timer
+        # Setup auto-check timer; the QTimer is only used without systemd
         self.auto_check_timer = QTimer(self)
+        self.auto_check_timer.setSingleShot(True)
         self.auto_check_timer.timeout.connect(self.auto_check_updates)
+        self.check_scheduler = None
+        self.system_events = None
+        self.system_events_notifier = None
+        self.scheduled_check_running = False
         self.setup_auto_check_timer()
+        self.last_cached_check = 0
 
         # --- Beautiful Main Layout ---
         self.setup_beautiful_ui()
+        self.package_card.package_list.itemChanged.connect(self.on_package_selection_changed)
         
         # --- QProcess Setup (MUST BE BEFORE add_enhanced_menus) ---
-        self.process = QProcess(self)
+        self.process_backend = process_backend or default_process_backend()
+        self.process = self.process_backend.create_process(self)
         self.process.readyReadStandardOutput.connect(self.handle_stdout)
         self.process.readyReadStandardError.connect(self.handle_stderr)
         self.process.finished.connect(self.process_finished)
+        self.process.errorOccurred.connect(self.handle_qprocess_error)
         
         # Add menu bar with enhanced features
         self.add_enhanced_menus()
@@ -516,8 +1119,16 @@ class UpdateAppWindow(QMainWindow):
         self.restore_window_state()
         self.show()
         
-        # Check on startup if enabled
-        if self.settings.value("auto_check_startup", False, type=bool):
+        # Results of scheduled headless checks; the directory is watched
+        # because the cache file is replaced atomically
+        self.check_watcher = QFileSystemWatcher([CONFIG_DIR], self)
+        self.check_watcher.directoryChanged.connect(self.load_cached_check)
+        self.load_cached_check()
+        
+        # An interrupted update is offered first; a startup check would replace its plan
+        if not self.process_backend.replay and load_pipeline() is not None:
+            QTimer.singleShot(0, lambda: self.offer_resume(startup=True))
+        elif self.settings.value("auto_check_startup", False, type=bool):
             QTimer.singleShot(2000, self.check_for_updates)
     
     def setup_beautiful_ui(self):
@@ -584,12 +1195,6 @@ class UpdateAppWindow(QMainWindow):
         
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setStyleSheet("""
-            QScrollArea {
-                border: none;
-                background: transparent;
-            }
-        """)
         
         self.scroll_widget = QWidget()
         self.package_progress_layout = QVBoxLayout(self.scroll_widget)
@@ -615,6 +1220,11 @@ class UpdateAppWindow(QMainWindow):
         self.update_button.setEnabled(False)
         actions_layout.addWidget(self.update_button)
         
+        self.cancel_button = ActionButton("Cancel", "■")
+        self.cancel_button.clicked.connect(self.cancel_run)
+        self.cancel_button.setVisible(False)
+        actions_layout.addWidget(self.cancel_button)
+        
         actions_layout.addStretch()
         
         self.clean_cache_button = ActionButton("Clean Cache", "⌫")  # Changed from emoji
@@ -631,13 +1241,6 @@ class UpdateAppWindow(QMainWindow):
         
         # --- Status Bar ---
         self.status_bar = QStatusBar()
-        self.status_bar.setStyleSheet("""
-            QStatusBar {
-                background: rgba(255, 255, 255, 0.05);
-                border-top: 1px solid rgba(255, 255, 255, 0.1);
-                padding: 5px;
-            }
-        """)
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("Ready")
         
@@ -651,6 +1254,12 @@ class UpdateAppWindow(QMainWindow):
         log_header.addWidget(log_title)
         log_header.addStretch()
         
+        self.export_profile_button = ActionButton("Export Profile", "⏱")
+        self.export_profile_button.setToolTip("Save the timing profile of the last run as JSON or Chrome trace")
+        self.export_profile_button.setEnabled(False)
+        self.export_profile_button.clicked.connect(self.export_last_profile)
+        log_header.addWidget(self.export_profile_button)
+        
         back_button = ActionButton("Back to Main", "←")  # Changed from emoji
         back_button.clicked.connect(self.show_main_page)
         log_header.addWidget(back_button)
@@ -659,17 +1268,7 @@ class UpdateAppWindow(QMainWindow):
         
         self.log_textview = QTextEdit()
         self.log_textview.setReadOnly(True)
-        self.log_textview.setStyleSheet("""
-            QTextEdit {
-                background: rgba(0, 0, 0, 0.3);
-                color: white;
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                border-radius: 8px;
-                padding: 10px;
-                font-family: 'Monospace';
-                font-size: 12px;
-            }
-        """)
+        self.log_textview.setObjectName("logView")
         log_layout.addWidget(self.log_textview)
         
         # Store reference for page switching
@@ -715,20 +1314,121 @@ class UpdateAppWindow(QMainWindow):
                 self.activateWindow()
     
     def setup_auto_check_timer(self):
+        """Schedule checks with a systemd user timer, or a QTimer as fallback"""
         self.auto_check_timer.stop()
+        self.check_scheduler = None
+        enabled = self.settings.value("auto_check_enabled", False, type=bool)
+        interval_hours = self.settings.value("auto_check_interval", 6, type=int)
+        
+        if not systemd_user_available():
+            if enabled:
+                self.start_check_scheduler(interval_hours)
+            return
+        if enabled:
+            self.jobs.submit("install timer", lambda job: install_timer(interval_hours, job.cancel_event),
+                             lambda result: self.handle_timer_installed(result, interval_hours), timeout=120)
+        elif self.settings.value("auto_check_timer_owned", False, type=bool) and timer_installed():
+            # Only the timer installed here; one from --install-timer belongs to the user
+            self.jobs.submit("remove timer", lambda job: remove_timer(job.cancel_event), self.handle_timer_removed, timeout=120)
+    
+    def handle_timer_installed(self, result, interval_hours):
+        if result.value:
+            self.settings.setValue("auto_check_timer_owned", True)
+        elif self.settings.value("auto_check_enabled", False, type=bool):
+            self.start_check_scheduler(interval_hours)
+    
+    def handle_timer_removed(self, result):
+        if result.value:
+            self.settings.setValue("auto_check_timer_owned", False)
+    
+    def start_check_scheduler(self, interval_hours):
+        """Schedule checks in the running app, for systems without a systemd user manager"""
+        self.check_scheduler = CheckScheduler(interval_hours * 60 * 60)
+        self.watch_system_events()
+        self.arm_auto_check()
+    
+    def watch_system_events(self):
+        """Follow suspend/resume and connectivity so scheduled checks are not wasted"""
+        if self.system_events is None:
+            self.system_events = SystemEvents()
+            if self.system_events.bus is not None:
+                self.system_events_notifier = QSocketNotifier(
+                    self.system_events.fileno(), QSocketNotifier.Read, self
+                )
+                self.system_events_notifier.activated.connect(self.on_system_events)
+        online = self.system_events.connectivity()
+        if online is not None:
+            self.check_scheduler.set_online(online)
+    
+    def on_system_events(self, *args):
+        if self.check_scheduler is None:
+            self.system_events.poll()
+        else:
+            self.system_events.apply(self.check_scheduler)
+            self.arm_auto_check()
+        if self.system_events.bus is None:
+            self.system_events_notifier.setEnabled(False)
+    
+    def arm_auto_check(self):
+        """Start the single-shot timer for the next due check, or wait for an event"""
+        delay = self.check_scheduler.delay()
+        if delay is None:
+            self.auto_check_timer.stop()
+        else:
+            self.auto_check_timer.start(int(delay * 1000))
+    
+    def finish_scheduled_check(self, success):
+        if not self.scheduled_check_running:
+            return
+        self.scheduled_check_running = False
+        if self.check_scheduler is not None:
+            if success:
+                self.check_scheduler.check_succeeded()
+            else:
+                self.check_scheduler.check_failed()
+            self.arm_auto_check()
+    
+    def load_cached_check(self, *args):
+        """Show the result of a scheduled check unless a check or update is running here"""
+        try:
+            mtime = os.stat(LAST_CHECK_FILE).st_mtime
+        except OSError:
+            return
+        if mtime <= self.last_cached_check:
+            return
+        self.last_cached_check = mtime
+        result = load_check_result()
+        if result is None or self.current_process is not None or self.authenticated or self.pipeline is not None:
+            return
         
-        if self.settings.value("auto_check_enabled", False, type=bool):
-            interval_hours = self.settings.value("auto_check_interval", 6, type=int)
-            interval_ms = interval_hours * 60 * 60 * 1000
-            self.auto_check_timer.start(interval_ms)
+        self.pending_pacman = list(result.pacman)
+        self.pending_aur = list(result.aur)
+        self.dependency_graph = None
+        self.graph_generation += 1
+        self.populate_package_list()
+        if self.pending_pacman:
+            self.index_pending_dependencies()
+        
+        count = len(self.pending_pacman) + len(self.pending_aur)
+        checked = datetime.fromtimestamp(result.checked).strftime('%Y-%m-%d %H:%M')
+        self.package_card.stats_label.setText(f"{count} updates available (checked {checked})")
+        if count:
+            self.status_card.status_icon.setText("▣")
+            self.status_card.status_label.setText(f"{count} update(s) available! Check again to update.")
+        else:
+            self.status_card.status_icon.setText("✓")
+            self.status_card.status_label.setText("System is up to date!")
     
     def auto_check_updates(self):
-        self.tray_icon.showMessage(
-            "Arch Update",
-            "Checking for updates...",
-            QSystemTrayIcon.Information,
-            2000
-        )
+        if self.check_scheduler is None:
+            return
+        if self.current_process is not None or self.scheduled_check_running or self.pipeline is not None:
+            # Busy with a check or an update already; try again next interval
+            self.check_scheduler.check_succeeded()
+            self.arm_auto_check()
+            return
+        self.scheduled_check_running = True
+        self.notifier.notify("check", "Checking for updates...", timeout=2000)
         self.check_for_updates()
     
     def add_enhanced_menus(self):
@@ -747,11 +1447,31 @@ class UpdateAppWindow(QMainWindow):
         history_action.triggered.connect(self.open_update_history)
         tools_menu.addAction(history_action)
         
+        mirrors_action = QAction("Benchmark Mirrors", self)
+        mirrors_action.triggered.connect(self.open_mirror_benchmark)
+        tools_menu.addAction(mirrors_action)
+        
+        fleet_action = QAction("Fleet", self)
+        fleet_action.triggered.connect(self.open_fleet)
+        tools_menu.addAction(fleet_action)
+        
+        cache_action = QAction("Package Cache", self)
+        cache_action.triggered.connect(self.open_package_cache)
+        tools_menu.addAction(cache_action)
+        
+        statistics_action = QAction("Update Statistics", self)
+        statistics_action.triggered.connect(self.open_update_statistics)
+        tools_menu.addAction(statistics_action)
+        
         tools_menu.addSeparator()
         
         rollback_action = QAction("Rollback Last Update", self)
         rollback_action.triggered.connect(self.rollback_update)
         tools_menu.addAction(rollback_action)
+        
+        resume_action = QAction("Resume Interrupted Update", self)
+        resume_action.triggered.connect(lambda: self.offer_resume())
+        tools_menu.addAction(resume_action)
     
     def open_package_search(self):
         dialog = PackageSearchDialog(self)
@@ -765,13 +1485,49 @@ class UpdateAppWindow(QMainWindow):
         dialog = UpdateHistoryDialog(self)
         dialog.exec()
     
+    def open_update_statistics(self):
+        dialog = UpdateStatisticsDialog(self)
+        dialog.exec()
+    
+    def open_mirror_benchmark(self):
+        dialog = MirrorBenchmarkDialog(self)
+        dialog.exec()
+    
+    def open_fleet(self):
+        dialog = FleetDialog(self)
+        dialog.exec()
+    
+    def open_package_cache(self):
+        dialog = PackageCacheDialog(self)
+        dialog.exec()
+    
     def rollback_update(self):
-        reply = QMessageBox.question(
-            self,
-            "Rollback Update",
-            "This will downgrade recently updated packages.\nContinue?",
-            QMessageBox.Yes | QMessageBox.No
-        )
+        session = self.history.last_snapshot()
+        if session is not None:
+            backend = backend_for(session['snapshot_backend'])
+            box = QMessageBox(self)
+            box.setWindowTitle("Rollback Update")
+            box.setIcon(QMessageBox.Question)
+            box.setText(f"The update of {session['date']} has a snapshot ({backend.describe(session['snapshot_id'])}).\n"
+                        "Restore the whole system to it, or downgrade recently updated packages from the cache?")
+            restore = box.addButton("Restore Snapshot", QMessageBox.AcceptRole)
+            downgrade = box.addButton("Downgrade Packages", QMessageBox.DestructiveRole)
+            box.addButton(QMessageBox.Cancel)
+            box.setDefaultButton(restore)
+            box.exec()
+            if box.clickedButton() is restore:
+                self.rollback_to_snapshot(session)
+                return
+            if box.clickedButton() is not downgrade:
+                return
+            reply = QMessageBox.Yes
+        else:
+            reply = QMessageBox.question(
+                self,
+                "Rollback Update",
+                "This will downgrade recently updated packages.\nContinue?",
+                QMessageBox.Yes | QMessageBox.No
+            )
         
         if reply == QMessageBox.Yes:
             try:
@@ -790,6 +1546,33 @@ class UpdateAppWindow(QMainWindow):
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Rollback failed: {str(e)}")
     
+    def rollback_to_snapshot(self, session):
+        """Run the backend's rollback for a history session's snapshot in a terminal"""
+        backend = backend_for(session['snapshot_backend'])
+        problem = backend.rollback_problem(session['snapshot_id'])
+        if problem:
+            QMessageBox.warning(self, "Restore Snapshot",
+                                f"{backend.describe(session['snapshot_id'])} cannot be restored from here.\n\n{problem}")
+            return
+        reply = QMessageBox.warning(
+            self, "Restore Snapshot",
+            f"Roll the system back to {backend.describe(session['snapshot_id'])}, taken before the update "
+            f"of {session['date']}?\nEverything changed since then is undone after a reboot.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        command = " ".join(shlex.quote(arg) for arg in backend.rollback_command(session['snapshot_id']))
+        script = f'echo "Restoring snapshot..." && {command} && echo "Done. Reboot to finish. Press Enter..." && read'
+        if TERMINAL_EXEC_FLAG:
+            cmd = [TERMINAL_CMD, TERMINAL_EXEC_FLAG, 'bash', '-c', script]
+        else:
+            cmd = [TERMINAL_CMD, 'bash', '-c', script]
+        try:
+            subprocess.Popen(cmd)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Rollback failed: {str(e)}")
+    
     def changeEvent(self, event):
         if event.type() == QEvent.WindowStateChange:
             if self.isMinimized() and self.settings.value("minimize_to_tray", True, type=bool):
@@ -811,55 +1594,228 @@ class UpdateAppWindow(QMainWindow):
         dialog = BeautifulSettingsDialog(self.settings, self)
         dialog.exec()
     
-    def record_update_history(self, update_type, package_count, status):
-        history = load_update_history()
-        entry = {
-            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'type': update_type,
-            'package_count': package_count,
-            'status': status
-        }
-        history.append(entry)
-        
-        if len(history) > 100:
-            history = history[-100:]
-        
-        save_update_history(history)
+    def record_update_history(self, update_type, status, packages=()):
+        try:
+            timings = self.transaction_timer.records if self.transaction_timer else ()
+            self.history.record_session(update_type, status, packages, started=self.start_timestamp or None,
+                                        timings=timings, snapshot=self.update_snapshot)
+        except Exception as e:
+            print(f"Failed to save history: {e}")
+        self.finish_profile(status)
+        # Recorded runs are over, whatever their status; only interrupted ones are resumed
+        self.end_pipeline()
+    
+    def planned_pacman_lines(self):
+        """Pending lines of the official packages the current run updates"""
+        if self.update_targets is None:
+            return self.pending_pacman
+        targets = set(self.update_targets)
+        return [pkg_line for pkg_line in self.pending_pacman if parse_pending_line(pkg_line)[0] in targets]
+    
+    def session_packages(self):
+        """Package records of the current run for the history store"""
+        records = []
+        for pkg_line in self.planned_pacman_lines():
+            name = parse_pending_line(pkg_line)[0]
+            sync_pkg = self.dependency_graph.packages.get(name) if self.dependency_graph else None
+            records.append(package_record(
+                pkg_line, "pacman",
+                sync_pkg.csize if sync_pkg else None,
+                sync_pkg.isize if sync_pkg else None,
+                self.package_durations.get(name)
+            ))
+        records.extend(package_record(pkg_line, "aur") for pkg_line in self.selected_aur)
+        return records
+    
+    def update_type(self):
+        full_update = self.update_targets is None and len(self.selected_aur) == len(self.pending_aur)
+        return "Full Update" if full_update else "Selective Update"
+    
+    def cache_check_result(self):
+        sync = self.last_sync_report._asdict() if self.last_sync_report else None
+        result = CheckResult(time.time(), self.pending_pacman, self.pending_aur, [], {}, sync)
+        try:
+            save_check_result(result)
+            self.last_cached_check = os.stat(LAST_CHECK_FILE).st_mtime
+        except OSError as e:
+            print(f"Failed to cache check result: {e}")
     
     def filter_ignored_packages(self):
-        ignored = load_ignored_packages()
+        ignored = get_ignore_list()
         if ignored:
-            self.pending_pacman = [pkg for pkg in self.pending_pacman 
-                                  if not any(pkg.startswith(ign) for ign in ignored)]
-            self.pending_aur = [pkg for pkg in self.pending_aur 
-                               if not any(pkg.startswith(ign) for ign in ignored)]
-    
+            self.pending_pacman = ignored.filter(self.pending_pacman)
+            self.pending_aur = ignored.filter(self.pending_aur)
+
+    def populate_package_list(self):
+        """Fill the package list with checkable pending entries"""
+        package_list = self.package_card.package_list
+        package_list.blockSignals(True)
+        package_list.clear()
+
+        if self.pending_pacman:
+            package_list.addItem("━━━ Official Packages ━━━")
+            for pkg in self.pending_pacman:
+                package_list.addItem(self.make_package_item(pkg, "pacman"))
+
+        if self.pending_aur:
+            if self.pending_pacman:
+                package_list.addItem("")
+            package_list.addItem("━━━ AUR Packages ━━━")
+            for pkg in self.pending_aur:
+                package_list.addItem(self.make_package_item(pkg, "aur"))
+
+        package_list.blockSignals(False)
+
+    def make_package_item(self, pkg_line, source):
+        icon = "📦" if source == "pacman" else "🎯"
+        item = QListWidgetItem(f"{icon} {pkg_line}")
+        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+        item.setCheckState(Qt.Checked)
+        item.setData(Qt.UserRole, pkg_line)
+        item.setData(Qt.UserRole + 1, source)
+        item.setToolTip("Official repository package" if source == "pacman" else "AUR package")
+        return item
+
+    def package_items(self, source):
+        package_list = self.package_card.package_list
+        for row in range(package_list.count()):
+            item = package_list.item(row)
+            if item.data(Qt.UserRole + 1) == source:
+                yield item
+
+    def selected_packages(self, source):
+        """Pending lines of the checked entries for 'pacman' or 'aur'"""
+        return [item.data(Qt.UserRole) for item in self.package_items(source)
+                if item.checkState() == Qt.Checked]
+
+    def selected_pacman_targets(self):
+        """Package names for the pacman transaction, None for a full -Syu"""
+        selected = self.selected_packages("pacman")
+        if len(selected) == len(self.pending_pacman):
+            return None
+
+        names = {parse_pending_line(pkg_line)[0] for pkg_line in selected}
+        if self.dependency_graph is not None:
+            names |= self.dependency_graph.resolve(names).closure
+        return sorted(names)
+
+    def confirm_partial_upgrade(self):
+        if self.update_targets is None or self.dependency_graph is None:
+            return True
+
+        hazards = self.dependency_graph.resolve(self.update_targets).hazards
+        if not hazards:
+            return True
+
+        lines = [f"  {dependant} (depends on {name})" for dependant, name in hazards[:10]]
+        if len(hazards) > 10:
+            lines.append(f"  ... and {len(hazards) - 10} more")
+        reply = QMessageBox.question(
+            self,
+            "Partial Upgrade",
+            "These packages stay at their old version although they were built "
+            "against packages in this update:\n\n" + "\n".join(lines) +
+            "\n\nA partial upgrade can break them. Continue anyway?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        return reply == QMessageBox.Yes
+
+    def index_pending_dependencies(self):
+        """Index sync DB depends/provides of the pending packages in the background"""
+        self.dependency_graph = None
+        self.graph_generation += 1
+        generation = self.graph_generation
+        pending = list(self.pending_pacman)
+
+        self.jobs.submit("dependency graph", lambda job: load_dependency_graph(pending),
+                         lambda result: self.handle_dependency_graph(generation, result))
+
+    def handle_dependency_graph(self, generation, result):
+        if generation != self.graph_generation:
+            return
+
+        if result.error:
+            self.update_log_content += f"Dependency data unavailable: {result.error}\n"
+            return
+
+        self.dependency_graph = result.value
+        self.update_log_content += f"Indexed dependencies of {len(result.value)} pending packages.\n"
+        self.refresh_selection()
+
+    def on_package_selection_changed(self, item):
+        if item.data(Qt.UserRole) is not None:
+            self.refresh_selection()
+
+    def refresh_selection(self):
+        """Re-resolve the checked entries and mark pulled-in and hazardous packages"""
+        selected = self.selected_packages("pacman")
+        selected_aur = self.selected_packages("aur")
+        total = len(self.pending_pacman) + len(self.pending_aur)
+        count = len(selected) + len(selected_aur)
+
+        resolution = None
+        if self.dependency_graph is not None:
+            resolution = self.dependency_graph.resolve(
+                parse_pending_line(pkg_line)[0] for pkg_line in selected)
+
+        hazards = {}
+        if resolution is not None:
+            for dependant, name in resolution.hazards:
+                hazards.setdefault(dependant, []).append(name)
+
+        package_list = self.package_card.package_list
+        package_list.blockSignals(True)
+        for item in self.package_items("pacman"):
+            pkg_line = item.data(Qt.UserRole)
+            name = parse_pending_line(pkg_line)[0]
+            if resolution is not None and name in resolution.pulled_in:
+                required_by = resolution.pulled_in[name]
+                item.setText(f"📦 {pkg_line}  (required by {required_by})")
+                item.setToolTip(f"Updated as a dependency of {required_by}")
+            elif name in hazards:
+                item.setText(f"⚠ {pkg_line}")
+                item.setToolTip("Partial upgrade: built against " + ", ".join(sorted(hazards[name])))
+            else:
+                item.setText(f"📦 {pkg_line}")
+                item.setToolTip("Official repository package")
+        package_list.blockSignals(False)
+
+        if count == total:
+            self.package_card.stats_label.setText(f"{total} updates available")
+            return
+
+        summary = f"{count} of {total} updates selected"
+        if resolution is not None and resolution.pulled_in:
+            summary += f", {len(resolution.pulled_in)} pulled in as dependencies"
+        if hazards:
+            summary += f", ⚠ {len(hazards)} partial-upgrade hazard(s)"
+        self.package_card.stats_label.setText(summary)
+
     def finalize_update(self):
+        unverified = self.pipeline.data.get("unverified") if self.pipeline else None
         self.status_card.status_icon.setText("✓")
-        self.status_card.status_label.setText("Updates complete!")
+        if unverified:
+            self.status_card.status_label.setText(
+                f"Updates complete, {len(unverified)} package(s) not at the planned version. Check log."
+            )
+        else:
+            self.status_card.status_label.setText("Updates complete!")
         self.status_card.progress_bar.setVisible(False)
         
+        self.profile_begin("log parsing")
         self.update_log_content += self.parse_pacman_log(self.start_timestamp)
+        self.profile_end("log parsing")
         self.update_log_content += f"\nUpdate run finished: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         
         self.set_buttons_enabled(True)
         self.update_button.setEnabled(False)
         self.authenticated = False
         
-        total_packages = len(self.pending_pacman) + len(self.pending_aur)
-        self.record_update_history("Full Update", total_packages, "Success")
-        
-        try:
-            subprocess.Popen(['notify-send', 'Arch Update', 'System update completed successfully!'])
-        except:
-            pass
+        packages = self.session_packages()
+        total_packages = len(packages)
+        self.record_update_history(self.update_type(), "Success", packages)
         
-        self.tray_icon.showMessage(
-            "Arch Update",
-            f"Successfully updated {total_packages} packages!",
-            QSystemTrayIcon.Information,
-            5000
-        )
+        self.notifier.notify("update", f"Successfully updated {total_packages} packages!")
     
     def process_started(self):
         pname = self.current_process or "(unknown)"
@@ -876,10 +1832,7 @@ class UpdateAppWindow(QMainWindow):
             pass
         
         if pname == "pacman_update":
-            try:
-                subprocess.Popen(['notify-send', 'Arch Update', 'Pacman update in progress...'])
-            except:
-                pass
+            self.notifier.notify("update", "Pacman update in progress...")
 
     def handle_qprocess_error(self, error):
         error_names = {
@@ -890,7 +1843,10 @@ class UpdateAppWindow(QMainWindow):
             4: "ReadError",
             5: "UnknownError"
         }
-        error_name = error_names.get(error, f"Error({error})")
+        if error == QProcess.Crashed and self.cancel_requested:
+            # Killed by cancel_run; finished() follows and reports the cancel
+            return
+        error_name = error_names.get(getattr(error, "value", error), f"Error({error})")
         msg = f"⚠ Process error: {error_name} for {self.current_process}"
         self.status_card.status_icon.setText("✗")
         self.status_card.status_label.setText(msg)
@@ -904,12 +1860,17 @@ class UpdateAppWindow(QMainWindow):
             pass
         
         self.status_card.progress_bar.setVisible(False)
-        self.set_buttons_enabled(True)
-        
-        try:
-            subprocess.Popen(['notify-send', '-u', 'critical', 'Arch Update Error', msg])
-        except:
-            pass
+        if error != QProcess.Crashed:
+            # A crash is followed by finished(), which ends the run and resets the buttons
+            self.set_buttons_enabled(True)
+            self.finish_scheduled_check(False)
+        if error == QProcess.FailedToStart:
+            # finished() is never emitted for a process that did not start
+            self.current_process = None
+            self.finish_profile("Failed")
+            self.end_pipeline()
+        
+        self.notifier.notify("error", msg, URGENCY_CRITICAL, summary="Arch Update Error")
 
     def restore_window_state(self):
         geometry = self.settings.value("window/geometry")
@@ -920,90 +1881,57 @@ class UpdateAppWindow(QMainWindow):
 
     def apply_styles(self):
         """Apply beautiful theme styling"""
-        theme_name = self.settings.value("current_theme", "Dark Professional")
-        if theme_name in THEME_PRESETS:
-            theme = THEME_PRESETS[theme_name]
-        else:
-            theme = THEME_PRESETS["Dark Professional"]
-        
-        # Apply gradient background
-        gradient = QLinearGradient(0, 0, 0, self.height())
-        gradient.setColorAt(0, QColor(theme["window_bg"]))
-        gradient.setColorAt(1, QColor(theme["secondary_bg"]))
-        
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                    stop:0 {theme["window_bg"]}, stop:1 {theme["secondary_bg"]});
-                color: {theme["text_fg"]};
-            }}
-            
-            CardWidget {{
-                background: rgba(255, 255, 255, 0.05);
-                border: 1px solid {theme["border"]};
-                border-radius: 12px;
-                color: {theme["text_fg"]};
-            }}
-            
-            QLabel {{
-                color: {theme["text_fg"]};
-            }}
-            
-            QListWidget {{
-                background: rgba(0, 0, 0, 0.2);
-                color: {theme["text_fg"]};
-                border: 1px solid {theme["border"]};
-                border-radius: 8px;
-                selection-background-color: {theme["accent"]};
-            }}
-            
-            QScrollArea {{
-                border: none;
-                background: transparent;
-            }}
-            
-            QMenuBar {{
-                background: rgba(0, 0, 0, 0.2);
-                border-bottom: 1px solid {theme["border"]};
-                color: {theme["text_fg"]};
-            }}
-            
-            QMenuBar::item {{
-                background: transparent;
-                padding: 8px 12px;
-                border-radius: 4px;
-            }}
-            
-            QMenuBar::item:selected {{
-                background: {theme["accent"]};
-            }}
-            
-            QMenu {{
-                background: {theme["window_bg"]};
-                border: 1px solid {theme["border"]};
-                border-radius: 8px;
-                color: {theme["text_fg"]};
-            }}
-            
-            QMenu::item {{
-                padding: 8px 20px;
-                border-radius: 4px;
-            }}
-            
-            QMenu::item:selected {{
-                background: {theme["accent"]};
-            }}
-        """)
-        
-        # Update status bar
-        self.status_bar.setStyleSheet(f"""
-            QStatusBar {{
-                background: rgba(0, 0, 0, 0.1);
-                border-top: 1px solid {theme["border"]};
-                color: {theme["text_fg"]};
-                padding: 5px 10px;
-            }}
-        """)
+        apply_theme(self.settings.value("current_theme", "Dark Professional"))
+
+    # --- Timing Profile ---
+    def profile_begin(self, name, category="stage"):
+        if self.profile is not None:
+            self.profile.begin(name, category)
+
+    def profile_end(self, name):
+        if self.profile is not None:
+            self.profile.end(name)
+
+    def profile_transaction(self):
+        """Add pacman's phases and hooks to the run profile"""
+        if self.profile is None:
+            return
+        timer = self.transaction_timer
+        for record in timer.records:
+            if record['duration'] is not None:
+                start = timer.started + record['start']
+                self.profile.add(record['name'], record['kind'], start, start + record['duration'])
+
+    def finish_profile(self, status):
+        """Close the run profile, append its waterfall to the log and save it"""
+        if self.profile is None:
+            return
+        profile, self.profile = self.profile.finish(status), None
+        self.last_profile = profile
+        waterfall = "\n".join(profile.waterfall())
+        if waterfall:
+            self.update_log_content += f"\n{waterfall}\n"
+        try:
+            save_profile(profile)
+        except OSError as e:
+            print(f"Failed to save timing profile: {e}")
+        self.export_profile_button.setEnabled(True)
+
+    def export_last_profile(self):
+        if self.last_profile is None:
+            return
+        stamp = datetime.fromtimestamp(self.last_profile.started).strftime('%Y%m%d-%H%M%S')
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Export Timing Profile",
+            os.path.join(os.path.expanduser("~"), f"arch-update-{self.last_profile.kind}-{stamp}.json"),
+            "Chrome trace (*.json);;Profile JSON (*.json)"
+        )
+        if not path:
+            return
+        try:
+            export_profile(self.last_profile, path, chrome_trace=selected.startswith("Chrome"))
+        except OSError as e:
+            QMessageBox.warning(self, "Export Failed", f"Could not write {path}: {e}")
 
     def show_main_page(self):
         self.stacked_widget.setCurrentWidget(self.main_page_widget)
@@ -1013,36 +1941,35 @@ class UpdateAppWindow(QMainWindow):
         self.stacked_widget.setCurrentWidget(self.log_page_widget)
 
     def clean_cache(self):
-        reply = subprocess.run(['which', 'paccache'], capture_output=True)
-        if reply.returncode != 0:
+        if shutil.which('paccache') is None:
             QMessageBox.warning(self, "Error", "paccache not found. Install pacman-contrib.")
             return
         
         self.status_card.status_icon.setText("⌫")
         self.status_card.status_label.setText("Cleaning package cache...")
-        
-        try:
-            result = subprocess.run([PKEXEC_CMD, 'paccache', '-rk1'], 
-                                  capture_output=True, text=True, timeout=30)
-            if result.returncode == 0:
-                self.status_card.status_icon.setText("✓")
-                self.status_card.status_label.setText("Cache cleaned successfully!")
-                self.update_log_content += f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: Cache cleaned\n"
-                self.update_log_content += result.stdout
-                try:
-                    subprocess.Popen(['notify-send', 'Arch Update', 'Package cache cleaned!'])
-                except:
-                    pass
-            else:
-                self.status_card.status_icon.setText("✗")
-                self.status_card.status_label.setText("Failed to clean cache.")
-                self.update_log_content += f"Cache clean failed: {result.stderr}\n"
-        except subprocess.TimeoutExpired:
+        self.clean_cache_button.setEnabled(False)
+        # pkexec waits for the password, so the timeout includes typing it
+        self.jobs.command("clean cache", [PKEXEC_CMD, 'paccache', '-rk1'], self.handle_clean_cache, timeout=120)
+
+    def handle_clean_cache(self, result):
+        self.clean_cache_button.setEnabled(True)
+        command = result.value
+        if command is not None and command.returncode == 0:
+            self.status_card.status_icon.setText("✓")
+            self.status_card.status_label.setText("Cache cleaned successfully!")
+            self.update_log_content += f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: Cache cleaned\n"
+            self.update_log_content += command.stdout
+            self.notifier.notify("cache", "Package cache cleaned!")
+        elif command is not None and command.error and command.error.startswith("timed out"):
             self.status_card.status_icon.setText("⏱")
             self.status_card.status_label.setText("Cache cleaning timed out")
-        except Exception as e:
+        elif command is not None and command.returncode is not None:
             self.status_card.status_icon.setText("✗")
-            self.status_card.status_label.setText(f"Error: {str(e)}")
+            self.status_card.status_label.setText("Failed to clean cache.")
+            self.update_log_content += f"Cache clean failed: {command.stderr}\n"
+        else:
+            self.status_card.status_icon.setText("✗")
+            self.status_card.status_label.setText(f"Error: {result.error or command.error}")
 
     def clear_package_progress(self):
         for widget_dict in self.package_widgets.values():
@@ -1060,31 +1987,18 @@ class UpdateAppWindow(QMainWindow):
         layout.setContentsMargins(10, 8, 10, 8)
         
         label = QLabel(package_name)
-        label.setStyleSheet("font-weight: bold; font-size: 13px;")
+        label.setObjectName("packageName")
         layout.addWidget(label, 1)
         
         progress = QProgressBar()
         progress.setRange(0, 0)
         progress.setTextVisible(True)
         progress.setFixedHeight(25)
-        progress.setStyleSheet("""
-            QProgressBar {
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                border-radius: 4px;
-                background: rgba(0, 0, 0, 0.2);
-                text-align: center;
-                font-size: 11px;
-            }
-            QProgressBar::chunk {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #4CAF50, stop:1 #45a049);
-                border-radius: 3px;
-            }
-        """)
+        progress.setObjectName("packageProgress")
         layout.addWidget(progress, 2)
         
         status_label = QLabel("Waiting...")
-        status_label.setStyleSheet("font-size: 12px; color: rgba(255, 255, 255, 0.8);")
+        status_label.setObjectName("packageStatus")
         layout.addWidget(status_label)
         
         insert_pos = self.package_progress_layout.count() - 1
@@ -1115,14 +2029,32 @@ class UpdateAppWindow(QMainWindow):
         if status_text is not None:
             widget_dict['status'].setText(status_text)
 
+    def complete_current_package(self):
+        pkg_name = self.current_package
+        self.update_package_progress(pkg_name, 100, "✓ Complete")
+        if pkg_name in self.package_started:
+            started = self.package_started.pop(pkg_name)
+            finished = time.monotonic()
+            self.package_durations[pkg_name] = finished - started
+            if self.profile is not None:
+                self.profile.add(pkg_name, "package", started, finished)
+
     def set_buttons_enabled(self, enabled):
         self.check_button.setEnabled(enabled)
+        # The buttons are disabled exactly while a check or update runs
+        self.cancel_button.setVisible(not enabled)
+        self.cancel_button.setEnabled(not enabled)
+        if enabled:
+            self.cancel_requested = None
+            self.cancel_deferred = False
         has_pending_updates = bool(self.pending_pacman or self.pending_aur)
         self.update_button.setEnabled(enabled and has_pending_updates and self.authenticated)
     
     def check_for_updates(self):
         self.set_buttons_enabled(False)
         self.authenticated = False
+        self.profile = RunProfile("check")
+        self.profile_begin("authentication")
         
         self.status_card.status_icon.setText("⌕")
         self.status_card.status_label.setText("Authentication required...")
@@ -1132,10 +2064,12 @@ class UpdateAppWindow(QMainWindow):
         auth_msg += "Requesting authentication...\n"
         self.update_log_content = auth_msg
         
-        try:
-            subprocess.Popen(['notify-send', 'Arch Update', 'Authentication required for update check...'])
-        except:
-            pass
+        self.notifier.notify("check", "Authentication required for update check...")
+        
+        if self.process_backend.replay:
+            self.update_log_content += "Replaying recorded transcripts, authentication skipped.\n"
+            QTimer.singleShot(0, lambda: self.on_auth_finished(True))
+            return
         
         zenity_available = os.path.exists(ZENITY_CMD)
         
@@ -1143,25 +2077,28 @@ class UpdateAppWindow(QMainWindow):
             self.status_card.status_label.setText("Enter password in dialog...")
             self.update_log_content += "Opening password dialog...\n"
             
-            self.auth_worker = AuthWorker(use_zenity=True)
-            self.auth_thread = Thread(target=self.auth_worker.run)
-            self.auth_worker.finished.connect(self.on_auth_finished)
-            self.auth_worker.error.connect(self.on_auth_error)
-            self.auth_thread.start()
+            self.auth_job = self.jobs.submit("authentication", lambda job: zenity_authenticate(job.cancel_event),
+                                             self.handle_authentication)
         else:
             self.status_card.status_icon.setText("✗")
             self.status_card.status_label.setText("Zenity not found!")
             self.update_log_content += "ERROR: Zenity not found\n"
             self.update_log_content += "Install with: sudo pacman -S zenity\n"
             self.set_buttons_enabled(True)
-            try:
-                subprocess.Popen(['notify-send', '-u', 'critical', 'Arch Update', 
-                                'Zenity required! Install: sudo pacman -S zenity'])
-            except:
-                pass
+            self.finish_profile("Failed")
+            self.finish_scheduled_check(True)
+            self.notifier.notify("error", "Zenity required! Install: sudo pacman -S zenity", URGENCY_CRITICAL)
+
+    def handle_authentication(self, result):
+        self.auth_job = None
+        error = result.error or result.value
+        if error:
+            self.on_auth_error(error)
+        self.on_auth_finished(not error)
 
     def on_auth_finished(self, success):
         """Called when authentication completes"""
+        self.profile_end("authentication")
         if success:
             self.authenticated = True
             self.status_card.status_icon.setText("◉")
@@ -1174,16 +2111,394 @@ class UpdateAppWindow(QMainWindow):
             
             self.pending_pacman = []
             self.pending_aur = []
+            self.dependency_graph = None
+            self.graph_generation += 1
             
-            try:
-                subprocess.Popen(['notify-send', 'Arch Update', 'Checking for updates...'])
-            except:
-                pass
-            
+            self.notifier.notify("check", "Checking for updates...")
+            self.start_database_sync()
+            self.refresh_news()
+        else:
+            self.set_buttons_enabled(True)
+            self.finish_profile("Cancelled")
+            # Declined authentication is not retried before the next interval
+            self.finish_scheduled_check(True)
+
+    def start_database_sync(self):
+        """Refresh the shared database copy off the GUI thread, then run checkupdates on it"""
+        if self.process_backend.replay:
             self.current_process = "checkupdates"
+            self.profile_begin("checkupdates")
             self.process.start(CHECKUPDATES_CMD, [])
+            return
+        self.status_card.status_label.setText("Refreshing package databases...")
+        self.profile_begin("database sync")
+        tracker = self.start_transfer_tracking()
+        self.sync_job = self.jobs.submit("database sync",
+                                         lambda job: sync_databases(tracker=tracker, cancel=job.cancel_event),
+                                         lambda result: self.handle_database_sync(result.value, result.error))
+
+    def handle_database_sync(self, report, error=None):
+        self.sync_job = None
+        if self.cancel_requested:
+            self.stop_transfer_tracking()
+            self.profile_end("database sync")
+            self.run_cleanup(cleanup_interrupted_check)
+            self.finish_cancelled("check")
+            return
+        if error:
+            msg = f"Database sync failed, checkupdates will sync itself: {error}\n"
         else:
-            self.set_buttons_enabled(True)
+            msg = f"Databases: {describe_sync(report)}\n"
+            for repo, repo_error in report.errors.items():
+                msg += f"  {repo}: {repo_error}\n"
+        self.update_log_content += msg
+        self.last_sync_report = report
+        self.stop_transfer_tracking()
+        self.profile_end("database sync")
+        self.status_card.status_label.setText("Checking official packages...")
+
+        self.current_process = "checkupdates"
+        self.profile_begin("checkupdates")
+        nosync = report is not None and sync_complete(report)
+        self.process.start(CHECKUPDATES_CMD, ['--nosync'] if nosync else [])
+
+    def start_snapshot(self):
+        """Snapshot stage: take a read-only snapshot off the GUI thread
+
+        Skipped when disabled, when no backend is found and when the
+        measured creations of the backend exceed the time budget.
+        """
+        self.profile_end("lock wait")
+        if self.process_backend.replay or not self.settings.value("snapshot_before_update", True, type=bool):
+            self.stage_done("snapshot")
+            return
+        backend = detect_backend()
+        if backend is None:
+            self.stage_done("snapshot")
+            return
+        budget = self.settings.value("snapshot_budget", SNAPSHOT_BUDGET, type=int)
+        take, estimate = should_snapshot(backend, self.history.snapshot_durations(backend.name), budget)
+        if not take:
+            self.update_log_content += (f"Skipping the {backend.name} snapshot: it takes about "
+                                        f"{format_duration(estimate)}, over the {budget}s budget\n")
+            self.stage_done("snapshot")
+            return
+
+        self.status_card.status_label.setText(f"Creating {backend.name} snapshot...")
+        self.profile_begin("snapshot")
+        keep = self.settings.value("snapshot_keep", SNAPSHOT_KEEP, type=int)
+
+        def run_snapshot(job):
+            """(Snapshot, deleted ids, pruning error); only a failed creation raises"""
+            snapshot = create_snapshot(backend)
+            try:
+                return snapshot, prune_snapshots(backend, keep), None
+            except SnapshotError as e:
+                return snapshot, [], str(e)
+
+        self.jobs.submit("snapshot", run_snapshot, self.handle_snapshot)
+
+    def handle_snapshot(self, result):
+        self.profile_end("snapshot")
+        if result.error:
+            self.update_log_content += f"Snapshot failed, updating without one: {result.error}\n"
+            self.stage_done("snapshot")
+            return
+        snapshot, pruned, prune_error = result.value
+        self.update_snapshot = snapshot
+        backend = backend_for(snapshot.backend)
+        self.update_log_content += f"Created snapshot {backend.describe(snapshot.id)} in {snapshot.duration:.1f}s\n"
+        for snapshot_id in pruned:
+            self.update_log_content += f"Deleted old snapshot {backend.describe(snapshot_id)}\n"
+        try:
+            self.history.forget_snapshots(snapshot.backend, pruned)
+        except Exception as e:
+            print(f"Failed to update history for deleted snapshots: {e}")
+        if prune_error:
+            self.update_log_content += f"Could not delete old snapshots: {prune_error}\n"
+        self.stage_done("snapshot", snapshot=snapshot._asdict())
+
+    def cancel_run(self):
+        """Stop the running check or update now if that is safe, otherwise once it is"""
+        if self.cancel_requested or self.cancel_deferred:
+            return
+        process_name = self.current_process
+        if self.sync_job is not None:
+            self.cancel_requested = "check"
+            self.sync_job.cancel()
+        elif self.peer_job is not None:
+            self.cancel_requested = "update"
+            self.peer_job.cancel()
+        elif process_name in ("checkupdates", "yay_check"):
+            self.cancel_requested = "check"
+            self.stop_process(cleanup_interrupted_check)
+        elif process_name == "pacman_update":
+            phase = self.transaction_timer.phase if self.transaction_timer else None
+            if phase not in SAFE_PHASES:
+                self.defer_cancel(f"pacman is past the point where it can be stopped ({PHASE_LABELS[phase].lower()})")
+                return
+            self.cancel_requested = "update"
+            # pacman releases its lock on SIGINT, but also interrupts a committing transaction
+            # between packages; its output lags, so the log is checked right before signalling
+            offset = self.update_log_offset
+            self.stop_process(cleanup_interrupted_transaction, signal.SIGINT, escalate=False,
+                              guard=lambda: transaction_started(offset))
+        elif self.yay_process is not None:
+            if installing(self.yay_process.pid):
+                self.status_bar.showMessage("yay is installing packages; cancel again once it is done")
+                self.update_log_content += "Cancel refused: yay is installing packages.\n"
+                return
+            self.cancel_requested = "update"
+            pid = self.yay_process.pid
+            self.jobs.submit("stop yay", lambda job: kill_tree(pid))
+        elif self.profile is not None and self.profile.kind == "update":
+            # Waiting for the database lock or a snapshot, or replaying yay; the next step stops
+            self.cancel_requested = "update"
+        else:
+            self.status_bar.showMessage("Close the password dialog to cancel")
+            return
+        self.cancel_button.setEnabled(False)
+        self.status_card.status_label.setText("Cancelling...")
+        self.status_bar.showMessage("Cancelling...")
+        self.update_log_content += f"Cancel requested: {datetime.now().strftime('%H:%M:%S')}\n"
+
+    def defer_cancel(self, reason):
+        self.cancel_deferred = True
+        self.cancel_button.setEnabled(False)
+        msg = f"Cancel deferred: {reason}. The update stops after the transaction."
+        self.status_bar.showMessage(msg)
+        self.update_log_content += msg + "\n"
+
+    def stop_process(self, cleanup, sig=signal.SIGTERM, escalate=True, guard=None):
+        """Signal the process tree off the GUI thread, then clean up what it left
+
+        A guard returning True just before signalling defers the cancel instead.
+        """
+        pid = self.process.processId()
+        if pid <= 0:
+            self.process.kill()
+            return
+
+        def run_stop(job):
+            if guard is not None and guard():
+                return None
+            alive = kill_tree(pid, sig, escalate=escalate)
+            removed = cleanup()
+            message = "".join(f"Removed {path}\n" for path in removed)
+            if alive:
+                message += f"Still running after cancel: {', '.join(map(str, alive))}\n"
+            return message
+
+        self.jobs.submit("stop process", run_stop, self.handle_stopped)
+
+    def handle_stopped(self, result):
+        if result.value is None and result.error is None:
+            # Still running: the commit is under way, let it finish (if it already exited, it was cancelled)
+            if self.current_process == "pacman_update":
+                self.cancel_requested = None
+                self.defer_cancel("pacman has started the transaction")
+            return
+        self.log_cleanup(result)
+
+    def run_cleanup(self, cleanup):
+        self.jobs.submit("cleanup", lambda job: "".join(f"Removed {path}\n" for path in cleanup()), self.log_cleanup)
+
+    def log_cleanup(self, result):
+        self.update_log_content += result.value if result.value is not None else f"Cleanup failed: {result.error}\n"
+
+    def finish_cancelled(self, kind):
+        self.current_process = None
+        if self.transfer_tracker is not None:
+            self.stop_transfer_tracking()
+        label = "Update cancelled." if kind == "update" else "Check cancelled."
+        self.status_card.status_icon.setText("■")
+        self.status_card.status_label.setText(label)
+        self.status_card.progress_bar.setVisible(False)
+        self.status_bar.showMessage(label)
+        self.update_log_content += label + "\n"
+        if kind == "update":
+            self.record_update_history(self.update_type(), "Cancelled", self.session_packages())
+        else:
+            self.package_card.stats_label.setText("Check cancelled")
+            self.authenticated = False
+            self.finish_profile("Cancelled")
+            self.finish_scheduled_check(True)
+        self.set_buttons_enabled(True)
+        self.notifier.notify(kind, label)
+
+    def start_transfer_tracking(self, tracker=None):
+        """Render tracker, or a new TransferTracker, into the status card every REFRESH_INTERVAL"""
+        self.transfer_tracker = tracker or TransferTracker()
+        self.transfer_tracker.start()
+        self.status_card.transfer_label.setText("Waiting for downloads...")
+        self.status_card.transfer_label.setVisible(True)
+        self.transfer_timer.start()
+        return self.transfer_tracker
+
+    def watch_partial_downloads(self, tracker):
+        """Feed tracker from the files pacman downloads into; piped pacman prints no byte counts"""
+        if self.process_backend.replay:
+            return
+        files = self.download_files()
+        directories = cache_dirs()
+        self.download_file_count = len(files) or None
+        self.downloads_per_file = False
+
+        def run_watch(job):
+            PartialDownloads(tracker, directories, files, on_unreadable=job.report).watch(job.cancel_event)
+
+        self.download_watch = self.jobs.submit("download watch", run_watch, on_progress=self.downloads_unreadable)
+
+    def downloads_unreadable(self, directory):
+        """pacman 7 downloads into a directory only its download user can read; count files instead of bytes"""
+        if self.downloads_per_file:
+            return
+        self.downloads_per_file = True
+        self.update_log_content += (f"Cannot read {directory} (owned by pacman's download user); "
+                                    f"download progress is shown per file, without byte counts or time left\n")
+
+    def stop_transfer_tracking(self, summary=False):
+        if self.download_watch is not None:
+            self.download_watch.cancel()
+            self.download_watch = None
+        tracker = self.transfer_tracker
+        self.transfer_tracker = None
+        self.transfer_timer.stop()
+        self.status_card.transfer_label.setVisible(False)
+        self.status_card.progress_bar.setRange(0, 0)
+        if tracker is None:
+            return
+        # Counted before finish(), which fills in files a cancel cut short
+        done, elapsed = tracker.done(), tracker.elapsed()
+        tracker.finish()
+        self.render_package_transfers(tracker)
+        if summary and done:
+            self.update_log_content += (f"Downloaded {format_size(done)} in {format_duration(elapsed)}"
+                                        f" ({format_size(done / elapsed if elapsed else done)}/s)\n")
+
+    def refresh_transfers(self):
+        """Render the download totals; runs on a timer, however fast pacman prints"""
+        tracker = self.transfer_tracker
+        if tracker is None:
+            return
+        snapshot = tracker.snapshot()
+        if self.downloads_per_file:
+            files = self.download_file_count or snapshot.active + snapshot.finished
+            self.status_card.transfer_label.setText(describe_file_progress(snapshot, self.download_file_count))
+            self.status_card.progress_bar.setRange(0, files)
+            self.status_card.progress_bar.setValue(min(files, snapshot.finished))
+            self.render_package_transfers(tracker)
+            return
+        self.status_card.transfer_label.setText(describe_transfer(snapshot))
+        if snapshot.total:
+            self.status_card.progress_bar.setRange(0, 1000)
+            self.status_card.progress_bar.setValue(min(1000, snapshot.done * 1000 // snapshot.total))
+        self.render_package_transfers(tracker)
+
+    def render_package_transfers(self, tracker):
+        for file_name, (done, total) in tracker.take_changed().items():
+            pkg_name = package_name_from_file(file_name)
+            if pkg_name not in self.package_widgets:
+                continue
+            if total:
+                percent = min(100, done * 100 // total)
+                status = "✓ Downloaded" if done >= total else f"Downloading {percent}% of {format_size(total)}"
+                self.update_package_progress(pkg_name, percent, status)
+            else:
+                self.update_package_progress(pkg_name, -1, "Downloading...")
+
+    def update_package_names(self):
+        """Official packages the running update installs"""
+        if self.update_targets is None:
+            return [parse_pending_line(line)[0] for line in self.pending_pacman]
+        return self.update_targets
+
+    def expected_download_size(self):
+        """Sum of the compressed sizes pacman will fetch, None without a dependency graph"""
+        if self.dependency_graph is None:
+            return None
+        fetched = self.peer_report.fetched if self.peer_report else {}
+        sizes = [self.dependency_graph.packages[name].csize for name in self.update_package_names()
+                 if name in self.dependency_graph.packages
+                 and self.dependency_graph.packages[name].filename not in fetched]
+        return sum(sizes) or None
+
+    def download_files(self):
+        """{label: (file name, compressed size)} of what pacman will fetch, empty without a dependency graph"""
+        if self.dependency_graph is None:
+            return {}
+        fetched = self.peer_report.fetched if self.peer_report else {}
+        files = {}
+        for name in self.update_package_names():
+            sync_pkg = self.dependency_graph.packages.get(name)
+            if sync_pkg is not None and sync_pkg.filename and sync_pkg.filename not in fetched:
+                files[download_label(sync_pkg.filename)] = (sync_pkg.filename, sync_pkg.csize)
+        return files
+
+    def refresh_news(self):
+        """Fetch the Arch news in the background so run_updates can check it offline"""
+        self.jobs.submit("news", lambda job: fetch_news(),
+                         lambda result: self.handle_news(*result.value) if result.value else self.handle_news([], result.error))
+
+    def handle_news(self, items, error=None):
+        if error:
+            self.update_log_content += f"Could not refresh Arch news, using {len(items)} cached items: {error}\n"
+        else:
+            self.update_log_content += f"Arch news: {len(items)} items\n"
+
+    def confirm_news(self):
+        """Block on news asking for manual intervention, warn about other news on pending packages"""
+        if self.update_targets is None:
+            names = [parse_pending_line(line)[0] for line in self.pending_pacman]
+        else:
+            names = self.update_targets
+        matches = relevant_news(names)
+        if not matches:
+            return True
+
+        for match in matches:
+            marker = "manual intervention" if match.intervention else "news"
+            self.update_log_content += f"Arch {marker} for {', '.join(match.packages)}: {match.item.title} ({match.item.link})\n"
+
+        interventions = [match for match in matches if match.intervention]
+        box = QMessageBox(self)
+        box.setWindowTitle("Arch News")
+        box.setText("Recent Arch news mentions packages in this update:\n\n" + "\n".join(
+            f"{'⚠ ' if match.intervention else ''}{match.item.title} ({', '.join(match.packages)})"
+            for match in matches
+        ))
+        box.setDetailedText("\n\n".join(f"{match.item.title}\n{match.item.link}\n\n{match.item.text}" for match in matches))
+        cancel = box.addButton(QMessageBox.Cancel)
+        if interventions:
+            box.setIcon(QMessageBox.Critical)
+            box.setInformativeText("Some of them require manual intervention. Follow the instructions before updating.")
+            proceed = box.addButton("Update Anyway", QMessageBox.DestructiveRole)
+            box.setDefaultButton(cancel)
+        else:
+            box.setIcon(QMessageBox.Information)
+            proceed = box.addButton("Continue", QMessageBox.AcceptRole)
+            box.setDefaultButton(proceed)
+        box.exec()
+        if box.clickedButton() is not proceed:
+            return False
+        acknowledge_news(matches)
+        return True
+
+    @staticmethod
+    def install_synced_databases(job):
+        """Job: install the databases the check used; (True if pacman can skip -y, log message)"""
+        paths = reusable_databases()
+        if paths is None:
+            return False, ""
+        if paths:
+            error = command_failed(run_command(install_databases_command(paths), timeout=30, cancel=job.cancel_event))
+            if error:
+                return False, f"Could not reuse checked databases: {error}\n"
+        saved = sum(os.path.getsize(path) for path in paths if path.endswith(".db"))
+        return True, (
+            f"Reusing the databases from the last check, skipping the refresh "
+            f"({format_size(saved)} not downloaded again, {format_size(total_saved())} saved in total)\n"
+        )
 
     def on_auth_error(self, error_msg):
         """Called when authentication has an error"""
@@ -1191,11 +2506,7 @@ class UpdateAppWindow(QMainWindow):
         self.status_card.status_label.setText(f"Authentication failed: {error_msg}")
         self.status_bar.showMessage(f"Authentication failed: {error_msg}")
         self.update_log_content += f"Authentication failed: {error_msg}\n"
-        try:
-            subprocess.Popen(['notify-send', '-u', 'critical', 'Arch Update', 
-                            f'Authentication failed: {error_msg}'])
-        except:
-            pass
+        self.notifier.notify("error", f"Authentication failed: {error_msg}", URGENCY_CRITICAL)
 
     def run_updates(self):
         if not self.authenticated:
@@ -1203,6 +2514,35 @@ class UpdateAppWindow(QMainWindow):
                               "Please check for updates first to authenticate.")
             return
         
+        self.update_targets = self.selected_pacman_targets()
+        self.selected_aur = self.selected_packages("aur")
+        if self.update_targets == [] and not self.selected_aur:
+            QMessageBox.information(self, "Nothing Selected", "Select at least one package to update.")
+            return
+        if not self.confirm_partial_upgrade():
+            return
+        if not self.confirm_news():
+            return
+        if self.process.state() != QProcess.NotRunning:
+            QMessageBox.warning(self, "Process Running", "A process is already running!")
+            return
+        
+        self.update_snapshot = None
+        self.peer_report = None
+        # Replayed runs are not real updates and never offered for resuming
+        self.pipeline = UpdatePipeline(None if self.process_backend.replay else PIPELINE_STATE_FILE)
+        self.pipeline.complete("check", pending_pacman=self.pending_pacman, pending_aur=self.pending_aur)
+        self.begin_update_run(time.time())
+        self.pipeline.complete("plan", targets=self.update_targets, aur=self.selected_aur, started=self.start_timestamp)
+        if self.update_targets == []:
+            self.pipeline.skip("download")
+            self.pipeline.skip("install")
+        if not self.selected_aur:
+            self.pipeline.skip("aur")
+        self.start_pipeline()
+
+    def begin_update_run(self, started, resumed=False):
+        """Status, progress panel, profile and log of an update run, new or resumed"""
         self.set_buttons_enabled(False)
         
         self.status_card.status_icon.setText("▶")
@@ -1211,49 +2551,201 @@ class UpdateAppWindow(QMainWindow):
         self.status_card.progress_bar.setRange(0, 0)
         
         self.clear_package_progress()
+        self.package_started.clear()
+        self.package_durations.clear()
+        self.transaction_timer = None
+        self.profile = RunProfile("update")
         
-        for pkg_line in self.pending_pacman:
-            pkg_name = pkg_line.split()[0] if pkg_line else "unknown"
-            self.add_package_progress(pkg_name)
+        if self.update_targets is None:
+            for pkg_line in self.pending_pacman:
+                pkg_name = pkg_line.split()[0] if pkg_line else "unknown"
+                self.add_package_progress(pkg_name)
+        else:
+            for pkg_name in self.update_targets:
+                self.add_package_progress(pkg_name)
         
-        start_msg = f"\nUpdate run started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        start_msg = f"\nUpdate run {'resumed' if resumed else 'started'}: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         self.update_log_content += start_msg
         try:
             self.log_textview.insertPlainText(start_msg)
             self.log_textview.ensureCursorVisible()
         except Exception:
             pass
-        self.start_timestamp = time.time()
+        self.start_timestamp = started
 
-        try:
-            subprocess.Popen(['notify-send', 'Arch Update', 'Starting system update...'])
-        except:
-            pass
+        self.notifier.notify("update", "Resuming system update..." if resumed else "Starting system update...")
 
-        if self.process.state() != QProcess.NotRunning:
-            QMessageBox.warning(self, "Process Running", "A process is already running!")
+    # --- Update Pipeline ---
+    def start_pipeline(self):
+        """Clear a stale database lock when pacman is still to run, then start the next stage"""
+        if self.pipeline.status("install") in (DONE, SKIPPED):
+            self.advance()
             return
+        self.profile_begin("lock wait")
+        if self.process_backend.replay:
+            QTimer.singleShot(0, self.advance)
+            return
+        self.jobs.submit("lock check", self.clear_stale_lock, self.wait_for_lock)
 
-        lock_file = "/var/lib/pacman/db.lck"
-        if os.path.exists(lock_file):
-            try:
-                result = subprocess.run(['pgrep', '-x', 'pacman|checkupdates'], 
-                                      capture_output=True, shell=True)
-                if result.returncode != 0:
-                    remove_result = subprocess.run([SUDO_CMD, 'rm', '-f', lock_file],
-                                                  capture_output=True, timeout=5)
-                    if remove_result.returncode == 0:
-                        self.update_log_content += "Removed stale database lock\n"
-                        self.status_card.status_label.setText("Removed stale lock, preparing update...")
-            except Exception as e:
-                self.update_log_content += f"Could not check/remove lock: {str(e)}\n"
+    def advance(self):
+        """Start the first stage of the pipeline that is neither done nor skipped"""
+        if self.cancel_requested:
+            self.profile_end("lock wait")
+            self.finish_cancelled("update")
+            return
+        stage = self.pipeline.next_stage()
+        self.pipeline.begin(stage)
+        getattr(self, self.STAGE_STEPS[stage])()
+
+    def stage_done(self, stage, **data):
+        self.pipeline.complete(stage, **data)
+        self.advance()
+
+    def end_pipeline(self, resumable=False):
+        """Forget the running pipeline; a resumable one stays on disk for offer_resume"""
+        if self.pipeline is not None and not resumable:
+            self.pipeline.discard()
+        self.pipeline = None
+
+    def offer_resume(self, startup=False):
+        """Ask whether to continue an interrupted update from the stage it stopped in"""
+        if self.pipeline is not None or self.current_process is not None or self.process_backend.replay:
+            return
+        pipeline = load_pipeline()
+        if pipeline is None:
+            if not startup:
+                QMessageBox.information(self, "Resume Update", "No interrupted update to resume.")
+            return
+        stage = pipeline.next_stage()
+        started = datetime.fromtimestamp(pipeline.data.get("started") or pipeline.created)
+        box = QMessageBox(self)
+        box.setWindowTitle("Interrupted Update")
+        box.setIcon(QMessageBox.Warning)
+        box.setText(f"The update started {started.strftime('%Y-%m-%d %H:%M')} was interrupted "
+                    f"({STAGE_LABELS[stage].lower()}).")
+        box.setInformativeText("Resume it from there? Completed stages are not repeated and the packages "
+                               "planned then are updated, without checking again.")
+        box.setDetailedText("\n".join(describe_pipeline(pipeline)))
+        resume = box.addButton("Resume", QMessageBox.AcceptRole)
+        discard = box.addButton("Discard", QMessageBox.DestructiveRole)
+        box.addButton("Later", QMessageBox.RejectRole)
+        box.setDefaultButton(resume)
+        box.exec()
+        if box.clickedButton() is resume:
+            self.resume_update(pipeline)
+        elif box.clickedButton() is discard:
+            pipeline.discard()
+
+    def resume_update(self, pipeline):
+        """Restore the plan of an interrupted run, authenticate, then run its remaining stages"""
+        data = pipeline.data
+        self.pipeline = pipeline
+        self.pending_pacman = list(data.get("pending_pacman", []))
+        self.pending_aur = list(data.get("pending_aur", []))
+        self.update_targets = data.get("targets")
+        self.selected_aur = list(data.get("aur", []))
+        self.update_snapshot = Snapshot(**data["snapshot"]) if data.get("snapshot") else None
+        self.peer_report = None
+        self.dependency_graph = None
+        self.graph_generation += 1
+        self.populate_package_list()
+        if self.pending_pacman:
+            self.index_pending_dependencies()
+        
+        self.begin_update_run(data.get("started") or pipeline.created, resumed=True)
+        self.update_log_content += "\n".join(describe_pipeline(pipeline)) + "\n"
+        self.profile_begin("authentication")
+        self.status_card.status_label.setText("Enter password in dialog...")
+        self.auth_job = self.jobs.submit("authentication", lambda job: zenity_authenticate(job.cancel_event),
+                                         self.handle_resume_authentication)
 
+    def handle_resume_authentication(self, result):
+        self.auth_job = None
+        self.profile_end("authentication")
+        error = result.error or result.value
+        if error:
+            self.on_auth_error(error)
+            # Still on disk, to be resumed later
+            self.end_pipeline(resumable=True)
+            self.finish_profile("Cancelled")
+            self.set_buttons_enabled(True)
+            return
+        self.authenticated = True
+        self.update_log_content += "Authentication successful.\n"
+        self.start_pipeline()
+
+    @staticmethod
+    def clear_stale_lock(job):
+        """Job: remove the database lock when no pacman or checkupdates holds it; returns a log message"""
+        if not os.path.exists(DB_LOCK_FILE) or running(("pacman", "checkupdates")):
+            return ""
+        error = command_failed(run_command([SUDO_CMD, 'rm', '-f', DB_LOCK_FILE], timeout=5, cancel=job.cancel_event))
+        return f"Could not check/remove lock: {error}\n" if error else "Removed stale database lock\n"
+
+    def wait_for_lock(self, result):
+        if result.error:
+            self.update_log_content += f"Could not check/remove lock: {result.error}\n"
+        else:
+            self.update_log_content += result.value
         self.status_card.status_label.setText("Waiting for database lock to clear...")
         self.update_log_content += "Waiting for database lock to clear...\n"
-        QTimer.singleShot(3000, self.start_pacman_update)
+        QTimer.singleShot(3000, self.advance)
+
+    def start_peer_fetch(self):
+        """Download stage: put what LAN peers have of the update into pacman's cache, then start pacman
+
+        Every file is verified against the checked sync database; whatever
+        the peers lack or fail to deliver pacman downloads from the mirrors.
+        """
+        peers = self.settings.value("cache_peers", " ".join(CACHE_PEERS)).split()
+        if not peers or self.process_backend.replay or self.dependency_graph is None or self.cancel_requested:
+            self.start_pacman_update()
+            return
+        packages = [self.dependency_graph.packages[name] for name in self.update_package_names()
+                    if name in self.dependency_graph.packages]
+        self.status_card.status_label.setText("Fetching packages from LAN peers...")
+        self.profile_begin("peer fetch")
+        tracker = self.start_transfer_tracking(TransferTracker(self.expected_download_size()))
+
+        def run_fetch(job):
+            staging = tempfile.mkdtemp(prefix="arch-update-peers-")
+            try:
+                report = fetch_from_peers(packages, peers, staging, tracker=tracker, cancel=job.cancel_event)
+                if report.fetched:
+                    paths = [os.path.join(staging, file_name) for file_name in report.fetched]
+                    error = command_failed(run_command(install_packages_command(paths), timeout=60,
+                                                       cancel=job.cancel_event))
+                    if error:
+                        raise OSError(f"copying into the package cache failed: {error}")
+                return report
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+        self.peer_job = self.jobs.submit("peer fetch", run_fetch,
+                                         lambda result: self.handle_peer_fetch(result.value, result.error))
+
+    def handle_peer_fetch(self, report, error=None):
+        self.peer_job = None
+        self.stop_transfer_tracking()
+        self.profile_end("peer fetch")
+        if error:
+            self.update_log_content += f"LAN peers not used: {error}\n"
+        else:
+            self.peer_report = report
+            msg = f"LAN peers: {describe_peers(report)}\n"
+            for peer, peer_error in report.errors.items():
+                msg += f"  Failed to reach {peer}: {peer_error}\n"
+            for file_name, reason in report.rejected.items():
+                msg += f"  Rejected {file_name}: {reason}\n"
+            self.update_log_content += msg
+        self.start_pacman_update()
 
     def start_pacman_update(self):
         """Start the actual pacman update after ensuring database is unlocked"""
+        if self.cancel_requested:
+            self.profile_end("lock wait")
+            self.finish_cancelled("update")
+            return
         self.status_card.status_label.setText("Starting Pacman update...")
         auth_msg = "Running update with cached authentication...\n"
         self.update_log_content += auth_msg
@@ -1263,57 +2755,166 @@ class UpdateAppWindow(QMainWindow):
         except:
             pass
         
+        self.profile_end("lock wait")
+        sync_flag = self.pipeline.data.get("sync_flag")
+        if sync_flag is not None:
+            # Resumed after pacman ran: the databases it used (refreshed by its -y, if any) are
+            # installed already, and refreshing again would resolve against newer ones than the plan
+            self.start_pacman('')
+            return
+        # The checked databases are what the user reviewed; without them pacman refreshes
+        self.profile_begin("database reuse")
+        if self.process_backend.replay:
+            # Nothing to reuse in a replay, but a selective run still never refreshes
+            reused = self.update_targets is not None
+            self.launch_pacman_update(JobResult("database reuse", (reused, ""), None, False, False, 0.0))
+            return
+        self.jobs.submit("database reuse", self.install_synced_databases, self.launch_pacman_update, timeout=60)
+
+    def launch_pacman_update(self, result):
+        reused, message = result.value or (False, f"Could not reuse checked databases: {result.error}\n")
+        self.update_log_content += message
+        self.profile_end("database reuse")
+        if self.cancel_requested:
+            self.finish_cancelled("update")
+            return
+        if not reused and self.update_targets is not None and not self.confirm_full_upgrade():
+            self.abort_selective_update()
+            return
+        self.start_pacman('' if reused else 'y')
+
+    def confirm_full_upgrade(self):
+        """Without the checked databases a selection cannot be installed; offer -Syu instead"""
+        reply = QMessageBox.question(
+            self,
+            "Checked Databases Unavailable",
+            "The package databases of the last check could not be reused. Refreshing them and "
+            "installing only the selected packages would be a partial upgrade.\n\n"
+            "Update the whole system (pacman -Syu) instead?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return False
+        self.update_targets = None
+        self.pipeline.note(targets=None)
+        self.clear_package_progress()
+        for pkg_line in self.pending_pacman:
+            self.add_package_progress(pkg_line.split()[0] if pkg_line else "unknown")
+        self.update_log_content += "Selection dropped: updating the whole system.\n"
+        return True
+
+    def abort_selective_update(self):
+        msg = "Selective update aborted: the checked databases could not be reused. Check for updates again."
+        self.status_card.status_icon.setText("■")
+        self.status_card.status_label.setText("Update aborted.")
+        self.status_card.progress_bar.setVisible(False)
+        self.status_bar.showMessage(msg)
+        self.update_log_content += msg + "\n"
+        self.record_update_history(self.update_type(), "Cancelled", self.session_packages())
+        self.authenticated = False
+        self.set_buttons_enabled(True)
+
+    def resume_install(self):
+        """Install stage of a resumed run, whose packages are all downloaded: pacman without -y"""
+        self.profile_end("lock wait")
+        self.status_card.status_label.setText("Resuming Pacman update...")
+        self.start_pacman('')
+
+    def start_pacman(self, sync_flag):
+        """Run pacman on the planned targets; sync_flag 'y' refreshes the databases first
+
+        Targets are never combined with 'y': they were resolved against the
+        checked databases, and installing them from newer ones is a partial
+        upgrade.
+        """
+        if self.update_targets is not None:
+            sync_flag = ''
+        self.pipeline.note(sync_flag=sync_flag)
         # Start pacman update with QProcess (non-blocking)
         self.current_process = "pacman_update"
-        self.process.start(SUDO_CMD, [PACMAN_CMD, '-Syu', '--noconfirm'])
+        self.transaction_timer = TransactionTimer()
+        # Fed from the start so it sees pacman's 'Total Download Size'; shown once downloads begin
+        self.transfer_tracker = TransferTracker(self.expected_download_size())
+        self.profile_begin("pacman")
+        self.update_log_offset = log_offset()
+        if self.update_targets is None:
+            self.process.start(SUDO_CMD, [PACMAN_CMD, f'-S{sync_flag}u', '--noconfirm'])
+        else:
+            # One targeted transaction over the resolved dependency closure, on the checked databases
+            self.process.start(SUDO_CMD, [PACMAN_CMD, '-S', '--needed', '--noconfirm'] + self.update_targets)
 
     def run_yay_update(self):
         self.status_card.status_label.setText("Starting AUR update in terminal...")
+        self.profile_begin("AUR build")
         self.update_log_content += "\nStarting AUR update (in external terminal)...\n"
         
-        for pkg_line in self.pending_aur:
+        for pkg_line in self.selected_aur:
             pkg_name = pkg_line.split()[0] if pkg_line else "unknown"
             self.add_package_progress(pkg_name)
         
-        # Run yay in a thread to prevent freezing
-        def run_yay():
-            try:
-                if TERMINAL_EXEC_FLAG:
-                    terminal_cmd = [TERMINAL_CMD, TERMINAL_EXEC_FLAG, YAY_CMD, "-Sua"]
-                else:
-                    terminal_cmd = [TERMINAL_CMD, YAY_CMD, "-Sua"]
-                
-                result = subprocess.run(terminal_cmd, timeout=600)
-                
-                # Update UI from main thread
-                QApplication.instance().postEvent(self, YayFinishedEvent(result.returncode))
-                
-            except Exception as e:
-                QApplication.instance().postEvent(self, YayFinishedEvent(-1, str(e)))
+        if len(self.selected_aur) == len(self.pending_aur):
+            yay_args = ["-Sua"]
+        else:
+            yay_args = ["-S", "--needed"] + [pkg_line.split()[0] for pkg_line in self.selected_aur]
+        
+        if self.process_backend.replay:
+            self.replay_yay_update(yay_args)
+            return
+        
+        if TERMINAL_EXEC_FLAG:
+            terminal_cmd = [TERMINAL_CMD, TERMINAL_EXEC_FLAG, YAY_CMD] + yay_args
+        else:
+            terminal_cmd = [TERMINAL_CMD, YAY_CMD] + yay_args
         
-        yay_thread = Thread(target=run_yay)
-        yay_thread.daemon = True
-        yay_thread.start()
+        def run_yay(job):
+            # Popen so cancel_run can reach yay and its build processes
+            self.yay_process = subprocess.Popen(terminal_cmd)
+            while True:
+                try:
+                    return self.yay_process.wait(timeout=CANCEL_POLL)
+                except subprocess.TimeoutExpired:
+                    if job.cancelled:
+                        kill_tree(self.yay_process.pid)
+                        raise Cancelled(YAY_CMD)
+        
+        self.jobs.submit("yay", run_yay, self.handle_yay_job, timeout=YAY_TIMEOUT)
 
-    def event(self, e):
-        if isinstance(e, YayFinishedEvent):
-            self.handle_yay_finished(e.returncode, e.error)
-            return True
-        elif isinstance(e, SearchCompleteEvent):
-            self.handle_search_complete(e.packages)
-            return True
-        return super().event(e)
+    def handle_yay_job(self, result):
+        if result.error:
+            self.handle_yay_finished(-1, result.error)
+        else:
+            self.handle_yay_finished(result.value)
+
+    def replay_yay_update(self, yay_args):
+        """Stand in for the terminal yay run: wait out the recording, report its exit code"""
+        backend = self.process_backend
+        recording = backend.library.find(YAY_CMD, yay_args)
+        
+        def run_replay(job):
+            if recording is None:
+                raise LookupError(f"No recording for yay {' '.join(yay_args)}")
+            if backend.speed:
+                job.cancel_event.wait(recording.duration / backend.speed)
+            return recording.exit_code
+        
+        self.jobs.submit("yay", run_replay, self.handle_yay_job)
 
     def handle_yay_finished(self, returncode, error=None):
+        self.profile_end("AUR build")
+        self.yay_process = None
+        if self.cancel_requested:
+            self.finish_cancelled("update")
+            return
         if returncode == 0:
             self.update_log_content += "AUR update process finished.\n"
             
-            for pkg_line in self.pending_aur:
+            for pkg_line in self.selected_aur:
                 pkg_name = pkg_line.split()[0] if pkg_line else "unknown"
                 if pkg_name in self.package_widgets:
                     self.update_package_progress(pkg_name, 100, "✓ Complete")
             
-            self.finalize_update()
+            self.stage_done("aur")
         else:
             if error:
                 self.status_card.status_icon.setText("✗")
@@ -1323,13 +2924,29 @@ class UpdateAppWindow(QMainWindow):
                 self.status_card.status_icon.setText("✗")
                 self.status_card.status_label.setText(f"AUR Update failed (Code: {returncode}).")
                 self.update_log_content += f"AUR update failed (Code: {returncode}).\n"
+            self.record_update_history(self.update_type(), "Failed", self.session_packages())
             self.set_buttons_enabled(True)
 
-    def handle_search_complete(self, packages):
-        self.search_results_list.clear()
-        for name, version, repo, desc in packages:
-            item = QTreeWidgetItem([name, version, repo, desc])
-            self.search_results_list.addTopLevelItem(item)
+    def start_verify(self):
+        """Verify stage: compare the local database with the planned versions, off the GUI thread"""
+        if self.process_backend.replay:
+            # Replayed transcripts changed nothing to compare with
+            self.stage_done("verify", unverified=[])
+            return
+        planned = self.planned_pacman_lines() + self.selected_aur
+        self.status_card.status_label.setText("Verifying installed versions...")
+        self.profile_begin("verify")
+        self.jobs.submit("verify", lambda job: verify_versions(planned), self.handle_verify)
+
+    def handle_verify(self, result):
+        self.profile_end("verify")
+        if result.error:
+            self.update_log_content += f"Could not verify installed versions: {result.error}\n"
+            self.stage_done("verify", unverified=[])
+            return
+        for name, planned, installed in result.value:
+            self.update_log_content += f"⚠ {name} is at {installed or 'not installed'}, planned {planned}\n"
+        self.stage_done("verify", unverified=[name for name, _, _ in result.value])
 
     def handle_stdout(self):
         data = self.process.readAllStandardOutput().data().decode()
@@ -1341,53 +2958,72 @@ class UpdateAppWindow(QMainWindow):
             pass
 
         if self.current_process == "checkupdates":
-            lines = data.strip().split('\n')
-            for line in lines:
-                if line:
-                    self.pending_pacman.append(line.strip())
+            self.pending_pacman.extend(parse_update_lines(data))
         elif self.current_process == "yay_check":
-            lines = data.strip().split('\n')
-            for line in lines:
-                if line:
-                    self.pending_aur.append(line.strip())
+            self.pending_aur.extend(parse_update_lines(data))
         elif self.current_process == "pacman_update":
+            if self.transfer_tracker is not None:
+                # Only parsed here; refresh_transfers renders at a fixed rate
+                self.transfer_tracker.feed(data)
+            # Hooks print no package progress, so phases and hooks drive the status while they run
+            for kind, name, detail in self.transaction_timer.feed(data):
+                if kind == "phase":
+                    if (name not in SAFE_PHASES and self.pipeline is not None
+                            and self.pipeline.status("download") == RUNNING):
+                        # Everything is in the cache once pacman starts changing the system
+                        self.pipeline.complete("download")
+                        self.pipeline.begin("install")
+                    if self.current_package and name != "packages":
+                        self.complete_current_package()
+                        self.current_package = None
+                    if name == "download" and self.transfer_tracker is not None:
+                        self.watch_partial_downloads(self.start_transfer_tracking(self.transfer_tracker))
+                    elif self.transfer_timer.isActive():
+                        self.stop_transfer_tracking(summary=True)
+                    self.status_card.status_label.setText(f"{detail}...")
+                    self.status_bar.showMessage(f"{detail}...")
+                else:
+                    self.status_card.status_label.setText(f"Running hook {detail}: {name}...")
+                    self.status_bar.showMessage(f"Running hook {detail}: {name}...")
+            if self.transaction_timer.phase in HOOK_PHASES:
+                return
+
             lines = data.split('\n')
             for line in lines:
+                if parse_progress_line(line):
+                    continue
                 upgrade_match = re.search(r'upgrading\s+([^\s]+)', line, re.IGNORECASE)
                 install_match = re.search(r'installing\s+([^\s]+)', line, re.IGNORECASE)
                 
                 if upgrade_match:
-                    pkg_name = upgrade_match.group(1)
+                    # Piped pacman prints 'upgrading linux...'
+                    pkg_name = upgrade_match.group(1).rstrip('.')
                     if self.current_package != pkg_name:
                         if self.current_package:
-                            self.update_package_progress(self.current_package, 100, "✓ Complete")
+                            self.complete_current_package()
                         self.current_package = pkg_name
+                        self.package_started[pkg_name] = time.monotonic()
                         self.update_package_progress(pkg_name, -1, "Upgrading...")
                     self.status_card.status_label.setText(f"Upgrading {pkg_name}...")
                     self.status_bar.showMessage(f"Upgrading {pkg_name}...")
                 
                 elif install_match:
-                    pkg_name = install_match.group(1)
+                    pkg_name = install_match.group(1).rstrip('.')
                     if self.current_package != pkg_name:
                         if self.current_package:
-                            self.update_package_progress(self.current_package, 100, "✓ Complete")
+                            self.complete_current_package()
                         self.current_package = pkg_name
+                        self.package_started[pkg_name] = time.monotonic()
                         self.update_package_progress(pkg_name, -1, "Installing...")
                     self.status_card.status_label.setText(f"Installing {pkg_name}...")
                     self.status_bar.showMessage(f"Installing {pkg_name}...")
                 
-                download_match = re.search(r'downloading\s+([^\s]+)', line, re.IGNORECASE)
-                if download_match and self.current_package:
-                    self.update_package_progress(self.current_package, -1, "Downloading...")
-                
                 percent_match = re.search(r'(\d+)%', line)
                 if percent_match and self.current_package:
                     percent = int(percent_match.group(1))
                     self.update_package_progress(self.current_package, percent, f"{percent}%")
             
-            if "downloading" in data.lower():
-                self.status_card.status_label.setText("Downloading packages...")
-            elif "checking" in data.lower():
+            if "checking" in data.lower():
                 self.status_card.status_label.setText("Checking packages...")
             elif "resolving" in data.lower():
                 self.status_card.status_label.setText("Resolving dependencies...")
@@ -1421,10 +3057,20 @@ class UpdateAppWindow(QMainWindow):
         self.current_process = None
 
         if process_name == "pacman_update" and self.current_package:
-            self.update_package_progress(self.current_package, 100, "✓ Complete")
+            self.complete_current_package()
             self.current_package = None
+        if process_name == "pacman_update" and self.transfer_tracker is not None:
+            self.stop_transfer_tracking(summary=self.transfer_timer.isActive())
+        if process_name == "pacman_update" and self.transaction_timer:
+            self.transaction_timer.finish()
+            for line in self.transaction_timer.summary():
+                self.update_log_content += line + "\n"
+            self.profile_transaction()
+        if process_name in ("checkupdates", "yay_check", "pacman_update"):
+            self.profile_end({"yay_check": "yay -Qua", "pacman_update": "pacman"}.get(process_name, process_name))
 
         finish_msg = f"Process finished: {process_name} (code={exitCode}, status={exitStatus})\n"
+        finish_msg += self.process_backend.describe(self.process)
         self.update_log_content += finish_msg
         try:
             self.log_textview.insertPlainText(finish_msg)
@@ -1432,18 +3078,31 @@ class UpdateAppWindow(QMainWindow):
         except Exception:
             pass
 
+        if self.cancel_requested or (self.cancel_deferred and process_name == "pacman_update" and exitCode == 0):
+            if process_name == "pacman_update" and exitCode == 0:
+                self.update_log_content += "Pacman completed its transaction; the remaining steps are skipped.\n"
+                self.status_card.progress_bar.setRange(0, 100)
+            self.finish_cancelled("check" if process_name in ("checkupdates", "yay_check") else "update")
+            return
+
         if exitStatus == QProcess.CrashExit:
             self.status_card.status_icon.setText("✗")
             self.status_card.status_label.setText(f"Process crashed: {process_name}")
             self.status_bar.showMessage(f"Process crashed: {process_name}")
+            if process_name == "pacman_update":
+                self.update_log_content += "Tools → Resume Interrupted Update continues this update.\n"
+                self.end_pipeline(resumable=True)
             self.set_buttons_enabled(True)
+            self.finish_profile("Crashed")
+            self.finish_scheduled_check(False)
             return
 
         if process_name == "checkupdates":
-            if exitCode == 0:
+            if not check_failed("pacman", exitCode):
                 self.status_card.status_label.setText("Checking AUR packages...")
                 self.status_bar.showMessage("Checking AUR packages...")
                 self.current_process = "yay_check"
+                self.profile_begin("yay -Qua")
                 self.process.start(YAY_CMD, ["-Qua"])
             else:
                 self.status_card.status_icon.setText("✗")
@@ -1451,28 +3110,17 @@ class UpdateAppWindow(QMainWindow):
                 self.status_bar.showMessage("Failed to check official updates.")
                 self.set_buttons_enabled(True)
                 self.authenticated = False
+                self.finish_profile("Failed")
+                self.finish_scheduled_check(False)
 
         elif process_name == "yay_check":
-            if exitCode == 0:
-                self.package_card.package_list.clear()
-                
+            if not check_failed("aur", exitCode):
                 self.filter_ignored_packages()
-                
+                self.cache_check_result()
+                self.finish_scheduled_check(True)
+                self.populate_package_list()
                 if self.pending_pacman:
-                    self.package_card.package_list.addItem("━━━ Official Packages ━━━")
-                    for pkg in self.pending_pacman:
-                        item = QListWidgetItem(f"📦 {pkg}")
-                        item.setToolTip("Official repository package")
-                        self.package_card.package_list.addItem(item)
-                
-                if self.pending_aur:
-                    if self.pending_pacman:
-                        self.package_card.package_list.addItem("")
-                    self.package_card.package_list.addItem("━━━ AUR Packages ━━━")
-                    for pkg in self.pending_aur:
-                        item = QListWidgetItem(f"🎯 {pkg}")
-                        item.setToolTip("AUR package")
-                        self.package_card.package_list.addItem(item)
+                    self.index_pending_dependencies()
 
                 if not self.pending_pacman and not self.pending_aur:
                     self.status_card.status_icon.setText("✓")
@@ -1480,39 +3128,21 @@ class UpdateAppWindow(QMainWindow):
                     self.package_card.stats_label.setText("0 updates available")
                     self.status_bar.showMessage("System is up to date!")
                     self.authenticated = False
-                    try:
-                        subprocess.Popen(['notify-send', 'Arch Update', 'System is up to date!'])
-                    except:
-                        pass
-                    
-                    self.tray_icon.showMessage(
-                        "Arch Update",
-                        "System is up to date!",
-                        QSystemTrayIcon.Information,
-                        3000
-                    )
+                    self.notifier.notify("check", "System is up to date!", timeout=3000)
                 else:
                     count = len(self.pending_pacman) + len(self.pending_aur)
                     self.status_card.status_icon.setText("▣")
                     self.status_card.status_label.setText(f"{count} update(s) available!")
                     self.package_card.stats_label.setText(f"{count} updates available")
                     self.status_bar.showMessage(f"{count} updates available!")
-                    try:
-                        subprocess.Popen(['notify-send', 'Arch Update', f'{count} updates available!'])
-                    except:
-                        pass
-                    
-                    self.tray_icon.showMessage(
-                        "Arch Update",
-                        f"{count} updates available!",
-                        QSystemTrayIcon.Information,
-                        5000
-                    )
+                    self.notifier.notify("check", f"{count} updates available!")
             else:
                 self.status_card.status_icon.setText("✗")
                 self.status_card.status_label.setText("Failed to check AUR updates.")
                 self.status_bar.showMessage("Failed to check AUR updates.")
+                self.finish_scheduled_check(False)
 
+            self.finish_profile("Failed" if check_failed("aur", exitCode) else "Success")
             self.set_buttons_enabled(True)
 
         elif process_name == "pacman_update":
@@ -1521,16 +3151,17 @@ class UpdateAppWindow(QMainWindow):
                 self.status_card.progress_bar.setRange(0, 100)
                 self.status_card.progress_bar.setValue(100)
                 self.update_log_content += "Pacman update successful.\n"
-                if self.pending_aur:
-                    self.run_yay_update()
-                else:
-                    self.finalize_update()
+                if self.pipeline.status("download") != DONE:
+                    # Nothing was left to download or install
+                    self.pipeline.complete("download")
+                self.stage_done("install")
             else:
                 if exitStatus != QProcess.CrashExit:
                     self.status_card.status_icon.setText("✗")
                     self.status_card.status_label.setText("Pacman update failed. Check log.")
                     self.status_bar.showMessage("Pacman update failed.")
                 self.update_log_content += f"Pacman update failed (Code: {exitCode}).\n"
+                self.record_update_history(self.update_type(), "Failed", self.session_packages())
                 self.status_card.progress_bar.setVisible(False)
                 self.set_buttons_enabled(True)
                 self.authenticated = False
@@ -1570,6 +3201,37 @@ def parse_pacman_log(start_epoch):
 # Make parse_pacman_log a method of UpdateAppWindow
 UpdateAppWindow.parse_pacman_log = lambda self, start_epoch: parse_pacman_log(start_epoch)
 
+# --- Theme Preview ---
+class ThemePreview(QWidget):
+    """Paints a theme swatch directly, so previewing never touches stylesheets"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.theme = THEME_PRESETS["Dark Professional"]
+    
+    def set_theme(self, theme):
+        self.theme = theme
+        self.update()
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = QRectF(self.rect()).adjusted(1, 1, -1, -1)
+        
+        gradient = QLinearGradient(0, 0, 0, self.height())
+        gradient.setColorAt(0, QColor(self.theme["window_bg"]))
+        gradient.setColorAt(1, QColor(self.theme["secondary_bg"]))
+        painter.setBrush(QBrush(gradient))
+        painter.setPen(QPen(QColor(self.theme["accent"]), 2))
+        painter.drawRoundedRect(rect, 6, 6)
+        
+        painter.setPen(QColor(self.theme["text_fg"]))
+        painter.drawText(rect.adjusted(12, 0, 0, 0), Qt.AlignLeft | Qt.AlignVCenter, "Aa  Sample text")
+        for i, key in enumerate(("accent", "success", "warning", "error")):
+            swatch = QRectF(rect.right() - 30 * (4 - i) - 8, rect.center().y() - 10, 20, 20)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(self.theme[key]))
+            painter.drawRoundedRect(swatch, 4, 4)
+
 # --- Beautiful Settings Dialog ---
 class BeautifulSettingsDialog(QDialog):
     def __init__(self, settings, parent=None):
@@ -1578,85 +3240,7 @@ class BeautifulSettingsDialog(QDialog):
         self.setWindowTitle("Settings")
         self.setMinimumSize(800, 650)
         
-        # Get current theme for styling
-        theme_name = self.settings.value("current_theme", "Dark Professional")
-        current_theme = theme_name  # Define it here before use
-        if theme_name in THEME_PRESETS:
-            theme = THEME_PRESETS[theme_name]
-        else:
-            theme = THEME_PRESETS["Dark Professional"]
-        
-        self.setStyleSheet(f"""
-            QDialog {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                    stop:0 {theme["window_bg"]}, stop:1 {theme["secondary_bg"]});
-                color: {theme["text_fg"]};
-            }}
-            QLabel {{ color: {theme["text_fg"]}; }}
-            QTabWidget::pane {{
-                border: 1px solid {theme["border"]};
-                border-radius: 8px;
-                background: rgba(0, 0, 0, 0.2);
-            }}
-            QTabBar::tab {{
-                background: rgba(255, 255, 255, 0.1);
-                border: 1px solid {theme["border"]};
-                border-radius: 6px;
-                padding: 8px 16px;
-                margin-right: 2px;
-                color: {theme["text_fg"]};
-            }}
-            QTabBar::tab:selected {{
-                background: {theme["accent"]};
-                color: {theme["window_bg"]};
-            }}
-            QGroupBox {{
-                font-weight: bold;
-                border: 2px solid {theme["border"]};
-                border-radius: 8px;
-                margin-top: 10px;
-                padding-top: 10px;
-                color: {theme["text_fg"]};
-            }}
-            QGroupBox::title {{
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px 0 5px;
-            }}
-            QComboBox {{
-                background: rgba(255, 255, 255, 0.1);
-                border: 1px solid {theme["border"]};
-                border-radius: 4px;
-                padding: 5px;
-                color: {theme["text_fg"]};
-            }}
-            QComboBox QAbstractItemView {{
-                background: {theme["list_bg"]};
-                color: {theme["text_fg"]};
-                selection-background-color: {theme["accent"]};
-            }}
-            QSpinBox, QLineEdit {{
-                background: rgba(255, 255, 255, 0.1);
-                border: 1px solid {theme["border"]};
-                border-radius: 4px;
-                padding: 5px;
-                color: {theme["text_fg"]};
-            }}
-            QCheckBox {{
-                color: {theme["text_fg"]};
-            }}
-            QCheckBox::indicator {{
-                width: 18px;
-                height: 18px;
-                border-radius: 3px;
-                border: 2px solid {theme["border"]};
-                background: rgba(255, 255, 255, 0.1);
-            }}
-            QCheckBox::indicator:checked {{
-                background: {theme["accent"]};
-                border-color: {theme["accent"]};
-            }}
-        """)
+        current_theme = self.settings.value("current_theme", "Dark Professional")
         
         layout = QVBoxLayout(self)
         layout.setContentsMargins(20, 20, 20, 20)
@@ -1686,7 +3270,7 @@ class BeautifulSettingsDialog(QDialog):
         preview_label.setStyleSheet("font-weight: bold; margin-top: 10px;")
         theme_layout.addWidget(preview_label)
         
-        self.preview_frame = QFrame()
+        self.preview_frame = ThemePreview()
         self.preview_frame.setFixedHeight(80)
         theme_layout.addWidget(self.preview_frame)
         
@@ -1725,6 +3309,8 @@ class BeautifulSettingsDialog(QDialog):
         auto_layout.addWidget(self.check_startup)
         
         self.scheduled_check = QCheckBox("Enable scheduled update checks")
+        self.scheduled_check.setToolTip("Runs as a systemd user timer when available, so checks "
+                                        "happen even while the application is closed")
         self.scheduled_check.setChecked(self.settings.value("auto_check_enabled", False, type=bool))
         auto_layout.addWidget(self.scheduled_check)
         
@@ -1756,6 +3342,29 @@ class BeautifulSettingsDialog(QDialog):
         self.confirm_updates.setChecked(self.settings.value("confirm_updates", False, type=bool))
         behavior_layout.addWidget(self.confirm_updates)
         
+        self.snapshot_before_update = QCheckBox("Take a snapshot before updating (snapper, timeshift or btrfs)")
+        self.snapshot_before_update.setChecked(self.settings.value("snapshot_before_update", True, type=bool))
+        behavior_layout.addWidget(self.snapshot_before_update)
+        
+        budget_layout = QHBoxLayout()
+        budget_layout.addWidget(QLabel("Skip the snapshot when it takes longer than:"))
+        self.snapshot_budget = QSpinBox()
+        self.snapshot_budget.setRange(1, 600)
+        self.snapshot_budget.setValue(self.settings.value("snapshot_budget", SNAPSHOT_BUDGET, type=int))
+        budget_layout.addWidget(self.snapshot_budget)
+        budget_layout.addWidget(QLabel("seconds"))
+        budget_layout.addStretch()
+        behavior_layout.addLayout(budget_layout)
+        
+        keep_layout = QHBoxLayout()
+        keep_layout.addWidget(QLabel("Btrfs snapshots to keep (older ones are deleted):"))
+        self.snapshot_keep = QSpinBox()
+        self.snapshot_keep.setRange(1, 100)
+        self.snapshot_keep.setValue(self.settings.value("snapshot_keep", SNAPSHOT_KEEP, type=int))
+        keep_layout.addWidget(self.snapshot_keep)
+        keep_layout.addStretch()
+        behavior_layout.addLayout(keep_layout)
+        
         behavior_group.setLayout(behavior_layout)
         updates_layout.addWidget(behavior_group)
         
@@ -1783,6 +3392,18 @@ class BeautifulSettingsDialog(QDialog):
         terminal_group.setLayout(terminal_layout)
         advanced_layout.addWidget(terminal_group)
         
+        peers_group = QGroupBox("LAN Package Cache")
+        peers_layout = QFormLayout()
+        
+        self.cache_peers = QLineEdit()
+        self.cache_peers.setText(self.settings.value("cache_peers", " ".join(CACHE_PEERS)))
+        self.cache_peers.setPlaceholderText("e.g., http://builder.lan:7878 nas.lan")
+        self.cache_peers.setToolTip("Hosts running 'python -m archupdate --serve-cache', tried before the mirrors")
+        peers_layout.addRow("Peers:", self.cache_peers)
+        
+        peers_group.setLayout(peers_layout)
+        advanced_layout.addWidget(peers_group)
+        
         performance_group = QGroupBox("Performance")
         performance_layout = QVBoxLayout()
         
@@ -1822,17 +3443,11 @@ class BeautifulSettingsDialog(QDialog):
     
     def preview_theme(self, theme_name):
         if theme_name in THEME_PRESETS:
-            theme = THEME_PRESETS[theme_name]
-            self.preview_frame.setStyleSheet(f"""
-                QFrame {{
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                        stop:0 {theme["window_bg"]}, stop:1 {theme["secondary_bg"]});
-                    border: 2px solid {theme["accent"]};
-                    border-radius: 6px;
-                }}
-            """)
+            self.preview_frame.set_theme(THEME_PRESETS[theme_name])
     
     def apply_settings(self):
+        schedule = (self.settings.value("auto_check_enabled", False, type=bool),
+                    self.settings.value("auto_check_interval", 6, type=int))
         self.settings.setValue("current_theme", self.theme_combo.currentText())
         self.settings.setValue("font_family", self.font_family.currentFont().family())
         self.settings.setValue("font_size", self.font_size.value())
@@ -1842,13 +3457,18 @@ class BeautifulSettingsDialog(QDialog):
         self.settings.setValue("minimize_to_tray", self.minimize_tray.isChecked())
         self.settings.setValue("show_notifications", self.show_notifications.isChecked())
         self.settings.setValue("confirm_updates", self.confirm_updates.isChecked())
+        self.settings.setValue("snapshot_before_update", self.snapshot_before_update.isChecked())
+        self.settings.setValue("snapshot_budget", self.snapshot_budget.value())
+        self.settings.setValue("snapshot_keep", self.snapshot_keep.value())
         self.settings.setValue("terminal_cmd", self.terminal_cmd.text())
         self.settings.setValue("terminal_flag", self.terminal_flag.text())
+        self.settings.setValue("cache_peers", self.cache_peers.text().strip())
         self.settings.setValue("animations_enabled", self.animations_enabled.isChecked())
         self.settings.setValue("high_dpi", self.high_dpi.isChecked())
         
         self.parent().apply_styles()
-        self.parent().setup_auto_check_timer()
+        if schedule != (self.scheduled_check.isChecked(), self.check_interval.value()):
+            self.parent().setup_auto_check_timer()
         
         QMessageBox.information(self, "Settings Applied", "Settings applied successfully!")
         self.accept()
@@ -1867,8 +3487,12 @@ class BeautifulSettingsDialog(QDialog):
             self.minimize_tray.setChecked(True)
             self.show_notifications.setChecked(True)
             self.confirm_updates.setChecked(False)
+            self.snapshot_before_update.setChecked(True)
+            self.snapshot_budget.setValue(SNAPSHOT_BUDGET)
+            self.snapshot_keep.setValue(SNAPSHOT_KEEP)
             self.terminal_cmd.setText(TERMINAL_CMD)
             self.terminal_flag.setText(TERMINAL_EXEC_FLAG)
+            self.cache_peers.setText(" ".join(CACHE_PEERS))
 
 # --- Package Search Dialog ---
 class PackageSearchDialog(QDialog):
@@ -1877,32 +3501,6 @@ class PackageSearchDialog(QDialog):
         self.setWindowTitle("Search Packages")
         self.setMinimumSize(700, 500)
         
-        settings = QSettings("MyOrg", "ArchUpdateGUI")
-        theme_name = settings.value("current_theme", "Dark Professional")
-        theme = THEME_PRESETS.get(theme_name, THEME_PRESETS["Dark Professional"])
-        
-        self.setStyleSheet(f"""
-            QDialog {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                    stop:0 {theme["window_bg"]}, stop:1 {theme["secondary_bg"]});
-                color: {theme["text_fg"]};
-            }}
-            QLabel {{ color: {theme["text_fg"]}; }}
-            QLineEdit {{
-                padding: 10px;
-                border: 2px solid {theme["border"]};
-                border-radius: 8px;
-                background: rgba(0, 0, 0, 0.3);
-                color: {theme["text_fg"]};
-            }}
-            QTreeWidget {{
-                border: 2px solid {theme["border"]};
-                border-radius: 8px;
-                background: rgba(0, 0, 0, 0.2);
-                color: {theme["text_fg"]};
-            }}
-        """)
-        
         layout = QVBoxLayout(self)
         layout.setContentsMargins(20, 20, 20, 20)
         
@@ -1924,6 +3522,9 @@ class PackageSearchDialog(QDialog):
         close_btn = ActionButton("Close", "✕")
         close_btn.clicked.connect(self.accept)
         layout.addWidget(close_btn)
+        
+        self.jobs = JobRunner(self)
+        self.search_job = None
     
     def search_packages(self):
         query = self.search_input.text().strip()
@@ -1933,33 +3534,293 @@ class PackageSearchDialog(QDialog):
         self.results_list.clear()
         self.results_list.addTopLevelItem(QTreeWidgetItem(["Searching...", "", "", ""]))
         
-        def do_search():
-            try:
-                result = subprocess.run(['pacman', '-Ss', query], capture_output=True, text=True, timeout=10)
-                lines = result.stdout.split('\n')
-                packages = []
-                
-                for i in range(0, len(lines)-1, 2):
-                    if lines[i].strip():
-                        match = re.match(r'(\S+)/(\S+)\s+(\S+)', lines[i])
-                        if match:
-                            repo, name, version = match.groups()
-                            desc = lines[i+1].strip() if i+1 < len(lines) else ""
-                            packages.append((name, version, repo, desc))
-                
-                QApplication.instance().postEvent(self, SearchCompleteEvent(packages))
-            except:
-                pass
+        # A new query replaces the one still running
+        if self.search_job is not None:
+            self.search_job.cancel()
+        self.search_job = self.jobs.command("search", ['pacman', '-Ss', query], self.show_results, timeout=10)
+    
+    def show_results(self, result):
+        if result.value is None or result.value.error == "cancelled":
+            return
+        self.search_job = None
+        self.results_list.clear()
+        lines = result.value.stdout.split('\n')
+        for i in range(0, len(lines)-1, 2):
+            if lines[i].strip():
+                match = re.match(r'(\S+)/(\S+)\s+(\S+)', lines[i])
+                if match:
+                    repo, name, version = match.groups()
+                    desc = lines[i+1].strip() if i+1 < len(lines) else ""
+                    self.results_list.addTopLevelItem(QTreeWidgetItem([name, version, repo, desc]))
+    
+    def done(self, result):
+        self.jobs.cancel_all()
+        super().done(result)
+
+# --- Bar Chart Widget ---
+class BarChart(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.bars = []
+        self.color = QColor("#89b4fa")
+        self.setMinimumHeight(180)
+    
+    def set_bars(self, bars, color=None):
+        """bars is a list of (label, value)"""
+        self.bars = list(bars)
+        if color:
+            self.color = QColor(color)
+        self.update()
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.palette().color(QPalette.WindowText))
+        
+        if not self.bars:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No data")
+            return
+        
+        label_height = 20
+        chart_height = self.height() - label_height * 2
+        bar_width = self.width() / len(self.bars)
+        max_value = max(value for _, value in self.bars) or 1
+        # Skip labels that would overlap on narrow bars
+        label_step = max(1, int(70 / bar_width) + 1)
+        
+        for i, (label, value) in enumerate(self.bars):
+            bar_height = chart_height * value / max_value
+            x = i * bar_width
+            painter.fillRect(QRectF(x + 2, label_height + chart_height - bar_height,
+                                    max(bar_width - 4, 1), bar_height), self.color)
+            if i % label_step == 0:
+                painter.drawText(QRectF(x - bar_width, label_height + chart_height, bar_width * 3, label_height),
+                                 Qt.AlignCenter, label)
+        
+        painter.drawText(QRectF(0, 0, self.width(), label_height), Qt.AlignLeft | Qt.AlignVCenter,
+                         f"max {max_value:g}")
+
+# --- Update Statistics Dialog ---
+class UpdateStatisticsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Update Statistics")
+        self.setMinimumSize(800, 550)
         
-        Thread(target=do_search, daemon=True).start()
+        settings = QSettings("MyOrg", "ArchUpdateGUI")
+        theme = THEME_PRESETS.get(settings.value("current_theme", "Dark Professional"),
+                                  THEME_PRESETS["Dark Professional"])
+        self.accent = theme["accent"]
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        self.summary_label = QLabel("Reading pacman log...")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+        
+        tabs = QTabWidget()
+        
+        self.monthly_chart = BarChart()
+        tabs.addTab(self.monthly_chart, "Packages per Month")
+        
+        self.duration_chart = BarChart()
+        tabs.addTab(self.duration_chart, "Upgrade Durations")
+        
+        self.repo_chart = BarChart()
+        tabs.addTab(self.repo_chart, "Churn per Repository")
+        
+        self.package_tree = QTreeWidget()
+        self.package_tree.setHeaderLabels(["Package", "Upgrades", "Days Between Upgrades"])
+        tabs.addTab(self.package_tree, "Most Upgraded")
+        
+        self.hook_tree = QTreeWidget()
+        self.hook_tree.setHeaderLabels(["Hook", "Phase", "Runs", "Average", "Longest", "Total"])
+        tabs.addTab(self.hook_tree, "Hook Times")
+        self.show_hook_times()
+        
+        layout.addWidget(tabs)
+        
+        close_btn = ActionButton("Close", "✕")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
+        
+        # The first run streams the whole log, so keep it off the GUI thread
+        self.jobs = JobRunner(self)
+        self.jobs.submit("analytics", lambda job: load_analytics(), self.analytics_loaded)
     
-    def event(self, e):
-        if isinstance(e, SearchCompleteEvent):
-            self.results_list.clear()
-            for name, version, repo, desc in e.packages:
-                self.results_list.addTopLevelItem(QTreeWidgetItem([name, version, repo, desc]))
+    def analytics_loaded(self, result):
+        if result.error:
+            self.summary_label.setText(f"Could not read pacman log: {result.error}")
+        else:
+            self.show_analytics(result.value)
+    
+    def show_hook_times(self):
+        """Hooks that dominate update time, from the timings recorded in history"""
+        store = HistoryStore()
+        try:
+            rows = store.timing_statistics("hook")
+        except Exception as e:
+            print(f"Failed to load hook timings: {e}")
+            rows = []
+        finally:
+            store.close()
+        for row in rows:
+            self.hook_tree.addTopLevelItem(QTreeWidgetItem([
+                row['name'], row['phase'], str(row['runs']), format_duration(row['average']),
+                format_duration(row['longest']), format_duration(row['total'])
+            ]))
+    
+    def show_analytics(self, analytics):
+        monthly = analytics.monthly()
+        self.monthly_chart.set_bars([(month[2:], upgraded) for month, _, _, upgraded in monthly], self.accent)
+        
+        recent = analytics.durations['recent'][-60:]
+        self.duration_chart.set_bars(
+            [(datetime.fromtimestamp(started).strftime('%m-%d'), duration) for started, duration in recent],
+            self.accent
+        )
+        
+        churn = sorted(analytics.repo_churn.items(), key=lambda item: item[1], reverse=True)
+        self.repo_chart.set_bars(churn, self.accent)
+        
+        self.package_tree.clear()
+        for name, upgrades, interval in analytics.top_packages(100):
+            self.package_tree.addTopLevelItem(QTreeWidgetItem([
+                name, str(upgrades), f"{interval:.1f}" if interval is not None else ""
+            ]))
+        
+        total_upgrades = sum(stats[0] for stats in analytics.packages.values())
+        upgrades = analytics.durations['count']
+        summary = f"{upgrades} full system upgrades, {total_upgrades} package upgrades"
+        if upgrades:
+            summary += (f" · average upgrade {format_duration(analytics.average_duration())},"
+                        f" longest {format_duration(analytics.durations['max'])}")
+        self.summary_label.setText(summary)
+
+# --- Update History Model ---
+class HistoryModel(QAbstractItemModel):
+    """Sessions fetched page by page, package rows fetched when a session is expanded"""
+    PAGE_SIZE = 200
+    COLUMNS = ["Date", "Type", "Count", "Status", "Duration", "Download", "Snapshot"]
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.filters = {}
+        self.sessions = []
+        self.packages = {}
+        self.exhausted = False
+    
+    def set_filters(self, **filters):
+        self.beginResetModel()
+        self.filters = {key: value for key, value in filters.items() if value}
+        self.sessions = []
+        self.packages = {}
+        self.exhausted = False
+        self.endResetModel()
+    
+    def refresh(self):
+        self.set_filters(**self.filters)
+    
+    # Session rows carry internalId 0, package rows the session row + 1
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, 0)
+        return self.createIndex(row, column, parent.row() + 1)
+    
+    def parent(self, index=None):
+        if index is None:
+            return QObject.parent(self)
+        if not index.isValid() or index.internalId() == 0:
+            return QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, 0)
+    
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self.sessions)
+        if parent.internalId() == 0:
+            return len(self.packages.get(parent.row(), ()))
+        return 0
+    
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.COLUMNS)
+    
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
             return True
-        return super().event(e)
+        if parent.internalId() == 0:
+            return self.sessions[parent.row()]['package_count'] > 0
+        return False
+    
+    def canFetchMore(self, parent):
+        if not parent.isValid():
+            return not self.exhausted
+        if parent.internalId() == 0:
+            return parent.row() not in self.packages
+        return False
+    
+    def fetchMore(self, parent):
+        if not parent.isValid():
+            before_id = self.sessions[-1]['id'] if self.sessions else None
+            rows = self.store.sessions(limit=self.PAGE_SIZE, before_id=before_id, **self.filters)
+            if len(rows) < self.PAGE_SIZE:
+                self.exhausted = True
+            if rows:
+                self.beginInsertRows(QModelIndex(), len(self.sessions), len(self.sessions) + len(rows) - 1)
+                self.sessions.extend(rows)
+                self.endInsertRows()
+        elif parent.internalId() == 0:
+            rows = self.store.session_packages(self.sessions[parent.row()]['id'])
+            if rows:
+                self.beginInsertRows(parent, 0, len(rows) - 1)
+                self.packages[parent.row()] = rows
+                self.endInsertRows()
+            else:
+                self.packages[parent.row()] = []
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        
+        column = index.column()
+        if index.internalId() == 0:
+            entry = self.sessions[index.row()]
+            status = {'Success': "✓", 'Cancelled': "■"}.get(entry['status'], "✗")
+            return [
+                entry['date'],
+                entry['type'],
+                str(entry['package_count']),
+                f"{status} {entry['status']}",
+                format_duration(entry['duration']),
+                format_size(entry['download_size']),
+                snapshot_label(entry)
+            ][column]
+        
+        pkg = self.packages[index.internalId() - 1][index.row()]
+        versions = f"{pkg['old_version'] or '?'} → {pkg['new_version'] or '?'}"
+        return [
+            pkg['name'],
+            versions,
+            pkg['source'] or "",
+            "",
+            format_duration(pkg['duration']),
+            format_size(pkg['download_size']),
+            ""
+        ][column]
+
+def snapshot_label(session):
+    if not session['snapshot_id']:
+        return ""
+    backend = backend_for(session['snapshot_backend'])
+    return backend.describe(session['snapshot_id']) if backend else session['snapshot_id']
 
 # --- Update History Dialog ---
 class UpdateHistoryDialog(QDialog):
@@ -1971,16 +3832,53 @@ class UpdateHistoryDialog(QDialog):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(20, 20, 20, 20)
         
-        self.history_tree = QTreeWidget()
-        self.history_tree.setHeaderLabels(["Date", "Type", "Count", "Status"])
+        # Filters are applied by the history store, not by the view
+        filter_layout = QHBoxLayout()
+        self.package_filter = QLineEdit()
+        self.package_filter.setPlaceholderText("Package name...")
+        filter_layout.addWidget(self.package_filter, 2)
+        
+        self.status_filter = QComboBox()
+        self.status_filter.addItems(["All", "Success", "Failed", "Cancelled"])
+        filter_layout.addWidget(self.status_filter)
+        
+        filter_layout.addWidget(QLabel("From:"))
+        self.date_from = self.make_date_edit()
+        filter_layout.addWidget(self.date_from)
+        filter_layout.addWidget(QLabel("To:"))
+        self.date_to = self.make_date_edit()
+        filter_layout.addWidget(self.date_to)
+        layout.addLayout(filter_layout)
+        
+        store = parent.history if parent is not None else HistoryStore()
+        self.model = HistoryModel(store, self)
+        
+        self.history_tree = QTreeView()
+        self.history_tree.setUniformRowHeights(True)
+        self.history_tree.setModel(self.model)
         layout.addWidget(self.history_tree)
         
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(250)
+        self.filter_timer.timeout.connect(self.load_history)
+        self.package_filter.textChanged.connect(self.filter_timer.start)
+        self.status_filter.currentTextChanged.connect(self.filter_timer.start)
+        self.date_from.dateChanged.connect(self.filter_timer.start)
+        self.date_to.dateChanged.connect(self.filter_timer.start)
+        
         self.load_history()
         
         btn_layout = QHBoxLayout()
         refresh_btn = ActionButton("Refresh", "↻")
         refresh_btn.clicked.connect(self.load_history)
         btn_layout.addWidget(refresh_btn)
+        
+        self.restore_btn = ActionButton("Restore Snapshot", "⟲")
+        self.restore_btn.setEnabled(False)
+        self.restore_btn.clicked.connect(self.restore_snapshot)
+        self.history_tree.selectionModel().currentChanged.connect(self.update_restore_button)
+        btn_layout.addWidget(self.restore_btn)
         btn_layout.addStretch()
         
         close_btn = ActionButton("Close", "✕")
@@ -1988,17 +3886,484 @@ class UpdateHistoryDialog(QDialog):
         btn_layout.addWidget(close_btn)
         layout.addLayout(btn_layout)
     
+    def selected_session(self):
+        index = self.history_tree.currentIndex()
+        if not index.isValid():
+            return None
+        if index.internalId() != 0:
+            index = index.parent()
+        return self.model.sessions[index.row()]
+    
+    def update_restore_button(self, *args):
+        session = self.selected_session()
+        self.restore_btn.setEnabled(bool(session and session['snapshot_id']) and isinstance(self.parent(), UpdateAppWindow))
+    
+    def restore_snapshot(self):
+        session = self.selected_session()
+        if session and session['snapshot_id']:
+            self.parent().rollback_to_snapshot(session)
+    
+    def make_date_edit(self):
+        date_edit = QDateEdit()
+        date_edit.setCalendarPopup(True)
+        date_edit.setDisplayFormat("yyyy-MM-dd")
+        date_edit.setMinimumDate(QDate(2000, 1, 1))
+        date_edit.setSpecialValueText("Any")
+        date_edit.setDate(date_edit.minimumDate())
+        return date_edit
+    
+    def date_filter(self, date_edit):
+        if date_edit.date() == date_edit.minimumDate():
+            return None
+        return date_edit.date().toString("yyyy-MM-dd")
+    
     def load_history(self):
-        history = load_update_history()
-        self.history_tree.clear()
-        for entry in reversed(history):
-            status = "✓" if entry.get('status') == 'Success' else "✗"
-            self.history_tree.addTopLevelItem(QTreeWidgetItem([
-                entry.get('date', ''),
-                entry.get('type', ''),
-                str(entry.get('package_count', 0)),
-                f"{status} {entry.get('status', '')}"
-            ]))
+        status = self.status_filter.currentText()
+        self.model.set_filters(
+            package=self.package_filter.text().strip(),
+            status=status if status != "All" else None,
+            date_from=self.date_filter(self.date_from),
+            date_to=self.date_filter(self.date_to)
+        )
+
+# --- Mirror Benchmark Dialog ---
+class MirrorBenchmarkDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Benchmark Mirrors")
+        self.setMinimumSize(750, 500)
+        self.results = []
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        try:
+            with open(MIRRORLIST, 'r') as f:
+                self.mirrorlist = f.read()
+        except OSError as e:
+            self.mirrorlist = ""
+            print(f"Failed to read mirrorlist: {e}")
+        self.servers = parse_mirrorlist(self.mirrorlist)
+        
+        self.summary_label = QLabel(f"{len(self.servers)} active mirrors in {MIRRORLIST}")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+        
+        self.mirror_tree = QTreeWidget()
+        self.mirror_tree.setHeaderLabels(["#", "Mirror", "First Byte", "Throughput", "Status"])
+        self.mirror_tree.setRootIsDecorated(False)
+        self.mirror_tree.setColumnWidth(0, 40)
+        self.mirror_tree.setColumnWidth(1, 340)
+        layout.addWidget(self.mirror_tree)
+        
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 0)
+        self.progress.setVisible(False)
+        layout.addWidget(self.progress)
+        
+        btn_layout = QHBoxLayout()
+        self.run_btn = ActionButton("Run Benchmark", "▶", primary=True)
+        self.run_btn.clicked.connect(self.run_benchmark)
+        self.run_btn.setEnabled(bool(self.servers))
+        btn_layout.addWidget(self.run_btn)
+        
+        self.write_btn = ActionButton("Write Mirrorlist", "✎")
+        self.write_btn.clicked.connect(self.write_ranked_mirrorlist)
+        self.write_btn.setEnabled(False)
+        btn_layout.addWidget(self.write_btn)
+        
+        close_btn = ActionButton("Close", "✕")
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+        
+        self.jobs = JobRunner(self)
+        
+        cached = load_benchmark(self.servers)
+        if cached:
+            stamp, results = cached
+            self.show_results(results)
+            self.summary_label.setText(
+                f"{len(self.servers)} active mirrors, results from "
+                f"{datetime.fromtimestamp(stamp).strftime('%Y-%m-%d %H:%M')}"
+            )
+    
+    def run_benchmark(self):
+        self.run_btn.setEnabled(False)
+        self.write_btn.setEnabled(False)
+        self.progress.setVisible(True)
+        self.summary_label.setText(f"Probing {len(self.servers)} mirrors...")
+        servers = list(self.servers)
+        
+        def probe(job):
+            results = benchmark_mirrors(servers)
+            save_benchmark(results)
+            return results
+        
+        self.jobs.submit("mirror benchmark", probe, self.benchmark_done)
+    
+    def benchmark_done(self, result):
+        self.progress.setVisible(False)
+        self.run_btn.setEnabled(True)
+        if result.error:
+            self.summary_label.setText(f"Benchmark failed: {result.error}")
+        else:
+            self.show_results(result.value)
+            reachable = sum(1 for r in result.value if not r.error)
+            self.summary_label.setText(f"{reachable} of {len(result.value)} mirrors reachable")
+    
+    def show_results(self, results):
+        self.results = results
+        self.mirror_tree.clear()
+        for rank, result in enumerate(results, 1):
+            if result.error:
+                item = QTreeWidgetItem(["-", result.server, "-", "-", result.error])
+            else:
+                item = QTreeWidgetItem([
+                    str(rank), result.server, f"{result.ttfb * 1000:.0f} ms",
+                    f"{format_size(result.throughput)}/s", f"~{estimated_time(result):.1f} s per 2 MiB"
+                ])
+            self.mirror_tree.addTopLevelItem(item)
+        self.write_btn.setEnabled(any(not r.error for r in results))
+    
+    def write_ranked_mirrorlist(self):
+        ranked = [r.server for r in self.results if not r.error]
+        reply = QMessageBox.question(
+            self, "Write Mirrorlist",
+            f"Reorder {MIRRORLIST} with the fastest mirror first?\n"
+            f"Unreachable mirrors are moved to the end; the old file is kept as mirrorlist.bak.",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        error = write_mirrorlist(reorder_mirrorlist(self.mirrorlist, ranked))
+        if error:
+            QMessageBox.warning(self, "Error", f"Failed to write mirrorlist: {error}")
+            return
+        with open(MIRRORLIST, 'r') as f:
+            self.mirrorlist = f.read()
+        QMessageBox.information(self, "Mirrorlist Updated", "Mirrorlist reordered by speed.")
+
+# --- Fleet Dialog ---
+class FleetDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Fleet")
+        self.setMinimumSize(750, 600)
+        self.hosts = load_inventory()
+        self.results = {}
+        self.pool = SSHPool()
+        self.jobs = JobRunner(self)
+        # The running check or rollout, for Stop
+        self.job = None
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        self.summary_label = QLabel()
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+        
+        self.host_tree = QTreeWidget()
+        self.host_tree.setHeaderLabels(["Host", "Stage", "Updates", "Status"])
+        self.host_tree.setRootIsDecorated(False)
+        self.host_tree.setColumnWidth(0, 220)
+        self.host_items = {}
+        for host in self.hosts:
+            item = QTreeWidgetItem([host.name, host.stage, "", "Not checked"])
+            self.host_items[host.name] = item
+            self.host_tree.addTopLevelItem(item)
+        layout.addWidget(self.host_tree)
+        
+        self.package_tree = QTreeWidget()
+        self.package_tree.setHeaderLabels(["Package", "New Version", "Hosts"])
+        self.package_tree.setRootIsDecorated(False)
+        self.package_tree.setColumnWidth(0, 220)
+        layout.addWidget(self.package_tree)
+        
+        self.progress = QProgressBar()
+        self.progress.setVisible(False)
+        layout.addWidget(self.progress)
+        
+        btn_layout = QHBoxLayout()
+        self.check_btn = ActionButton("Check Hosts", "↻", primary=True)
+        self.check_btn.clicked.connect(self.check_hosts)
+        btn_layout.addWidget(self.check_btn)
+        
+        self.update_btn = ActionButton("Update Hosts", "⬆")
+        self.update_btn.clicked.connect(self.update_hosts)
+        self.update_btn.setEnabled(False)
+        btn_layout.addWidget(self.update_btn)
+        
+        self.stop_btn = ActionButton("Stop", "■")
+        self.stop_btn.clicked.connect(self.stop)
+        self.stop_btn.setEnabled(False)
+        btn_layout.addWidget(self.stop_btn)
+        
+        close_btn = ActionButton("Close", "✕")
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+        
+        if self.hosts:
+            self.summary_label.setText(f"{len(self.hosts)} hosts in {len(stages(self.hosts))} stages from {FLEET_INVENTORY}")
+        else:
+            self.summary_label.setText(f"No hosts in {FLEET_INVENTORY}. List one host ([user@]host[:port]) per line; "
+                                       f"'[stage]' lines group the hosts that follow into rollout stages.")
+            self.check_btn.setEnabled(False)
+    
+    def set_running(self, running, total=0):
+        self.check_btn.setEnabled(not running and bool(self.hosts))
+        self.update_btn.setEnabled(not running and self.pending_hosts() != [])
+        self.stop_btn.setEnabled(running)
+        self.progress.setVisible(running)
+        self.progress.setRange(0, total)
+        self.progress.setValue(0)
+    
+    def check_hosts(self):
+        self.results = {}
+        self.package_tree.clear()
+        for item in self.host_items.values():
+            item.setText(2, "")
+            item.setText(3, "Checking...")
+        self.set_running(True, len(self.hosts))
+        hosts, pool = list(self.hosts), self.pool
+        
+        def run_check(job):
+            results = check_fleet(hosts, pool, FLEET_WORKERS, on_result=lambda result: job.report(("checked", result)),
+                                  cancel=job.cancel_event)
+            return describe_check(results)
+        
+        self.job = self.jobs.submit("fleet check", run_check, self.finished, on_progress=self.progressed)
+    
+    def pending_hosts(self):
+        """Hosts whose last check found updates, in inventory order"""
+        return [host for host in self.hosts
+                if host.name in self.results and (self.results[host.name].pending or self.results[host.name].aur)]
+    
+    def update_hosts(self):
+        hosts = self.pending_hosts()
+        plan = "\n".join(f"{stage}: {', '.join(host.name for host in stage_hosts)}"
+                         for stage, stage_hosts in stages(hosts).items())
+        reply = QMessageBox.question(
+            self, "Update Hosts",
+            f"Run 'pacman -Syu' on {len(hosts)} hosts, one stage after the other?\n\n{plan}\n\n"
+            "A stage with a failed host stops the rollout. Later stages may only install the versions "
+            "the first stage installed; a host whose mirrors offer newer ones fails untouched.",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        for host in hosts:
+            self.host_items[host.name].setText(3, "Waiting for its stage")
+        self.set_running(True, len(hosts))
+        pool = self.pool
+        
+        def run_rollout(job):
+            report = rollout(hosts, pool, FLEET_WORKERS, cancel=job.cancel_event,
+                             on_stage=lambda stage, stage_hosts: job.report(("stage", stage_hosts)),
+                             on_result=lambda result: job.report(("updated", result)))
+            if report.halted:
+                return (f"Rollout stopped at stage {report.halted}; "
+                        f"completed: {', '.join(report.completed) or 'none'}")
+            return f"Rollout completed: {', '.join(report.completed)}"
+        
+        self.job = self.jobs.submit("fleet rollout", run_rollout, self.finished, on_progress=self.progressed)
+    
+    def stop(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.stop_btn.setEnabled(False)
+            self.summary_label.setText("Stopping after the hosts already started...")
+    
+    def progressed(self, payload):
+        """('checked', HostResult), ('stage', [Host]) or ('updated', UpdateResult)"""
+        kind, value = payload
+        if kind == "checked":
+            self.results[value.host.name] = value
+            item = self.host_items[value.host.name]
+            if value.error:
+                item.setText(2, "")
+                item.setText(3, f"✗ {value.error}")
+            else:
+                item.setText(2, str(len(value.pending) + len(value.aur)))
+                item.setText(3, f"✓ Checked in {value.duration:.1f}s")
+            self.progress.setValue(self.progress.value() + 1)
+        elif kind == "stage":
+            for host in value:
+                self.host_items[host.name].setText(3, "Updating...")
+        elif kind == "updated":
+            item = self.host_items[value.host.name]
+            if value.error:
+                item.setText(3, f"✗ {value.error}")
+            elif value.returncode is None:
+                item.setText(3, f"✓ {value.output}")
+            else:
+                item.setText(3, f"✓ Updated in {format_duration(value.duration)}")
+            item.setToolTip(3, value.output)
+            if not value.error:
+                self.results.pop(value.host.name, None)
+                item.setText(2, "")
+            self.progress.setValue(self.progress.value() + 1)
+    
+    def finished(self, result):
+        self.job = None
+        summary = result.value if result.value is not None else f"Fleet run failed: {result.error}"
+        for item in self.host_items.values():
+            if item.text(3) == "Waiting for its stage":
+                item.setText(3, "Skipped")
+        self.set_running(False)
+        self.summary_label.setText(summary)
+        self.show_packages()
+        parent = self.parent()
+        if parent is not None and hasattr(parent, 'update_log_content'):
+            parent.update_log_content += f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: Fleet: {summary}\n"
+    
+    def show_packages(self):
+        """Pending updates of all checked hosts, one row per package version"""
+        self.package_tree.clear()
+        for package in aggregate_pending(self.results.values()):
+            item = QTreeWidgetItem([package.name, package.version, f"{len(package.hosts)} of {len(self.hosts)}"])
+            item.setToolTip(2, "\n".join(f"{host}: {installed}" for host, installed in sorted(package.hosts.items())))
+            self.package_tree.addTopLevelItem(item)
+    
+    def done(self, result):
+        self.jobs.cancel_all()
+        hosts, pool = list(self.hosts), self.pool
+        self.jobs.submit("close connections", lambda job: pool.close(hosts))
+        super().done(result)
+
+# --- Package Cache Dialog ---
+class PackageCacheDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Package Cache")
+        self.setMinimumSize(650, 420)
+        self.report = None
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        self.summary_label = QLabel("Analyzing package cache...")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+        
+        self.category_tree = QTreeWidget()
+        self.category_tree.setHeaderLabels(["Category", "Files", "Size", "Reclaimable"])
+        self.category_tree.setColumnWidth(0, 260)
+        self.category_tree.itemChanged.connect(self.update_remove_button)
+        layout.addWidget(self.category_tree)
+        
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 0)
+        layout.addWidget(self.progress)
+        
+        btn_layout = QHBoxLayout()
+        self.analyze_btn = ActionButton("Analyze", "↻")
+        self.analyze_btn.clicked.connect(self.analyze)
+        btn_layout.addWidget(self.analyze_btn)
+        
+        self.remove_btn = ActionButton("Remove Selected", "⌫", primary=True)
+        self.remove_btn.clicked.connect(self.remove_selected)
+        self.remove_btn.setEnabled(False)
+        btn_layout.addWidget(self.remove_btn)
+        
+        close_btn = ActionButton("Close", "✕")
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+        
+        self.jobs = JobRunner(self)
+        self.analyze()
+    
+    def analyze(self):
+        self.analyze_btn.setEnabled(False)
+        self.remove_btn.setEnabled(False)
+        self.progress.setVisible(True)
+        self.jobs.submit("cache analysis", lambda job: analyze_cache(), self.analyzed)
+    
+    def analyzed(self, result):
+        self.progress.setVisible(False)
+        self.analyze_btn.setEnabled(True)
+        if result.error:
+            self.summary_label.setText(f"Analysis failed: {result.error}")
+        else:
+            self.show_report(result.value)
+    
+    def show_report(self, report):
+        self.report = report
+        self.category_tree.blockSignals(True)
+        self.category_tree.clear()
+        for category in CATEGORIES:
+            files = report.removable[category]
+            item = QTreeWidgetItem([
+                CATEGORY_LABELS[category], str(len(files)),
+                format_size(sum(cache_file.disk for cache_file in files)), format_size(report.reclaimable[category])
+            ])
+            item.setData(0, Qt.UserRole, category)
+            if files:
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(0, Qt.Checked)
+                for cache_file in files[:200]:
+                    item.addChild(QTreeWidgetItem([os.path.basename(cache_file.path), "", format_size(cache_file.disk)]))
+            else:
+                item.setFlags(item.flags() & ~Qt.ItemIsEnabled)
+            self.category_tree.addTopLevelItem(item)
+        self.category_tree.blockSignals(False)
+        
+        hardlinked = f", {format_size(report.hardlinked)} hardlinked" if report.hardlinked else ""
+        self.summary_label.setText(
+            f"{report.files} files in {', '.join(report.directories)}: {format_size(report.disk)} on disk{hardlinked}. "
+            f"Analyzed in {report.elapsed * 1000:.0f} ms."
+        )
+        self.update_remove_button()
+    
+    def selected_categories(self):
+        selected = []
+        for index in range(self.category_tree.topLevelItemCount()):
+            item = self.category_tree.topLevelItem(index)
+            if item.flags() & Qt.ItemIsUserCheckable and item.checkState(0) == Qt.Checked:
+                selected.append(item.data(0, Qt.UserRole))
+        return selected
+    
+    def update_remove_button(self, *args):
+        self.remove_btn.setEnabled(self.report is not None and bool(self.selected_categories()))
+    
+    def remove_selected(self):
+        categories = self.selected_categories()
+        files = [cache_file for category in categories for cache_file in self.report.removable[category]]
+        paths = [cache_file.path for cache_file in files]
+        # Together the categories can free more than each alone, when links of one inode are split between them
+        freed = reclaimable_bytes(files)
+        reply = QMessageBox.question(
+            self, "Remove Cache Files",
+            f"Remove {len(paths)} files from the package cache, freeing {format_size(freed)}?\n"
+            "Old versions are no longer available for downgrades afterwards.",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        self.analyze_btn.setEnabled(False)
+        self.remove_btn.setEnabled(False)
+        self.progress.setVisible(True)
+        self.summary_label.setText(f"Removing {len(paths)} files...")
+        # pkexec waits for the password, so remove_files' own timeout applies, not a job timeout
+        self.jobs.submit("cache removal", lambda job: remove_files(paths, cancel=job.cancel_event),
+                         lambda result: self.removed(len(paths), result.value or result.error))
+    
+    def removed(self, count, error):
+        if error:
+            QMessageBox.warning(self, "Error", f"Failed to remove cache files: {error}")
+        else:
+            parent = self.parent()
+            if parent is not None and hasattr(parent, 'update_log_content'):
+                parent.update_log_content += (f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: Removed "
+                                              f"{count} cache files\n" + "\n".join(describe_report(self.report)) + "\n")
+        self.analyze()
+    
+    def done(self, result):
+        self.jobs.cancel_all()
+        super().done(result)
 
 # --- Ignored Packages Dialog ---
 class IgnoredPackagesDialog(QDialog):
@@ -2020,7 +4385,7 @@ class IgnoredPackagesDialog(QDialog):
         
         btn_layout = QHBoxLayout()
         self.add_input = QLineEdit()
-        self.add_input.setPlaceholderText("Package name...")
+        self.add_input.setPlaceholderText("Package name or glob (e.g. linux-*)...")
         btn_layout.addWidget(self.add_input)
         
         add_btn = ActionButton("Add", "+", primary=True)
@@ -2041,6 +4406,14 @@ class IgnoredPackagesDialog(QDialog):
         self.ignored_list.clear()
         for pkg in packages:
             self.ignored_list.addItem(f"▪ {pkg}")
+        
+        # Entries from pacman.conf are applied too but edited there
+        conf_patterns, conf_groups = parse_pacman_conf_ignores()
+        for entry, kind in [(p, "IgnorePkg") for p in conf_patterns] + [(g, "IgnoreGroup") for g in conf_groups]:
+            item = QListWidgetItem(f"▫ {entry}  ({kind}, pacman.conf)")
+            item.setFlags(item.flags() & ~Qt.ItemIsSelectable)
+            item.setToolTip("Set in /etc/pacman.conf")
+            self.ignored_list.addItem(item)
     
     def add_package(self):
         pkg = self.add_input.text().strip()
@@ -2052,7 +4425,7 @@ class IgnoredPackagesDialog(QDialog):
             return
         packages.append(pkg)
         save_ignored_packages(packages)
-        self.ignored_list.addItem(f"▪ {pkg}")
+        self.ignored_list.insertItem(len(packages) - 1, f"▪ {pkg}")
         self.add_input.clear()
     
     def remove_package(self):